@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FeishuSheet 离线性能压测：在本地模拟服务上测量读取、查询、写入和批量删除的耗时
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_feishu_sheet --records 5000 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from feishu_sheet import FeishuSheet
+from mock_bitable_server import MockBitableServer
+
+APP_TOKEN = "app_bench"
+TABLE_ID = "tbl_bench"
+
+
+def make_fields(i):
+    """
+    构造与线上表格字段结构相近的测试数据
+    """
+    return {
+        "handle": f"user{i % 200}",
+        "video_id": str(7300000000000000000 + i),
+        "video_create_time": str(1700000000 + i),
+        "video_title": f"video {i} " + "#tiktokshop " * 10,
+        "product_id": str(1729000000000000000 + i % 1000),
+        "product_title": f"product {i % 1000}",
+        "product_source_imgs": "" if i % 3 == 0 else "\n".join(f"https://cdn.example.com/{i}/{j}.jpg" for j in range(6)),
+    }
+
+
+def measure(name, func, ops=1):
+    """
+    执行 func 并返回耗时统计，FeishuSheet 的调试输出被丢弃
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    return {"name": name, "seconds": round(elapsed, 4), "ops": ops, "ops_per_sec": round(ops / elapsed, 2) if elapsed else None}, result
+
+
+def run(records=2000, writes=200, latency=0.0, page_size=500):
+    mock = MockBitableServer(latency=latency)
+    mock.start()
+    try:
+        mock.add_records(APP_TOKEN, TABLE_ID, [make_fields(i) for i in range(records)])
+        feishu = FeishuSheet("cli_bench", "secret_bench", base_url=mock.base_url)
+        feishu.ensure_token()
+        results = []
+
+        mock.reset_stats()
+        stats, _ = measure("get_sheet_data(get_all)", lambda: feishu.get_sheet_data(APP_TOKEN, TABLE_ID, page_size=page_size, get_all=True), records)
+        stats.update(mock.stats())
+        results.append(stats)
+
+        mock.reset_stats()
+        empty_filter = {"conjunction": "and", "conditions": [{"field_name": "product_source_imgs", "operator": "isEmpty", "value": []}]}
+        stats, _ = measure("get_records_by_filter(isEmpty)", lambda: feishu.get_records_by_filter(APP_TOKEN, TABLE_ID, empty_filter, page_size=page_size, get_all=True), records)
+        stats.update(mock.stats())
+        results.append(stats)
+
+        mock.reset_stats()
+        stats, created = measure("create_record", lambda: [feishu.create_record(APP_TOKEN, TABLE_ID, make_fields(i)) for i in range(writes)], writes)
+        stats.update(mock.stats())
+        results.append(stats)
+
+        record_ids = [r["data"]["record"]["record_id"] for r in created if r]
+        mock.reset_stats()
+        stats, _ = measure("update_record", lambda: [feishu.update_record(APP_TOKEN, TABLE_ID, rid, {"product_desc": "desc"}) for rid in record_ids], len(record_ids))
+        stats.update(mock.stats())
+        results.append(stats)
+
+        mock.reset_stats()
+        stats, _ = measure("batch_delete_records", lambda: feishu.batch_delete_records(APP_TOKEN, TABLE_ID, record_ids), len(record_ids))
+        stats.update(mock.stats())
+        results.append(stats)
+        return results
+    finally:
+        mock.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FeishuSheet 离线性能压测")
+    parser.add_argument("--records", type=int, default=2000, help="预置记录数")
+    parser.add_argument("--writes", type=int, default=200, help="逐条写入/更新的记录数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = run(args.records, args.writes, args.latency, args.page_size)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'操作':<34}{'耗时(秒)':>10}{'条数':>8}{'条/秒':>12}{'请求数':>8}{'下行字节':>12}")
+    for r in results:
+        print(f"{r['name']:<34}{r['seconds']:>10}{r['ops']:>8}{r['ops_per_sec'] or 0:>12}{sum(r['calls'].values()):>8}{r['bytes_out']:>12}")
+
+
+if __name__ == "__main__":
+    main()
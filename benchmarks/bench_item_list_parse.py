@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+item_list 解析压测：比较原来的标准库三层解析与各 JSON 后端的解析耗时
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_item_list_parse --items 30 --rounds 2000
+    python -m benchmarks.bench_item_list_parse --file captured_item_list.json   # 使用抓取到的响应
+"""
+
+import argparse
+import json
+import time
+
+import fast_json
+from item_list import parse_item_list
+from tiktok_fixtures import TikTokFixtures
+
+
+def legacy_parse(body):
+    """
+    原 get_response_body 的解析方式：整体 decode + json.loads，逐项再解析两层 extra
+    """
+    json_body = json.loads(body.decode("utf-8", errors="ignore"))
+    videos = []
+    for item in json_body.get("itemList", []):
+        if item.get("anchors") and isinstance(item["anchors"][0].get("extra"), str):
+            extra_json = json.loads(item["anchors"][0]["extra"])[0]
+            if "extra" not in extra_json:
+                continue
+            for field in ["icon", "actions", "component_key", "anchor_strong"]:
+                extra_json.pop(field, None)
+            inner_extra = json.loads(extra_json["extra"])
+            for field in ["product_id", "title", "img"]:
+                if field in inner_extra:
+                    extra_json[field] = inner_extra[field]
+            videos.append({
+                "handle": item.get("author", {}).get("uniqueId", ""),
+                "video_id": item.get("id", ""),
+                "video_create_time": str(item.get("createTime", "")),
+                "video_title": item.get("desc", ""),
+                "product_id": extra_json.get("id", ""),
+                "product_title": extra_json.get("title", ""),
+                "product_keyword": extra_json.get("keyword", ""),
+                "product_imgs": str(extra_json.get("img", "")) if isinstance(extra_json.get("img"), list) else extra_json.get("img", ""),
+            })
+    return videos
+
+
+def measure(func, body, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(body)
+    elapsed = time.perf_counter() - start
+    return {"us_per_payload": round(elapsed / rounds * 1e6, 1), "payloads_per_sec": round(rounds / elapsed)}
+
+
+def run(items=30, rounds=2000, file=None):
+    if file:
+        with open(file, "rb") as f:
+            body = f.read()
+    else:
+        fixtures = TikTokFixtures(videos_per_account=items)
+        body = json.dumps(fixtures.item_list("shopdemo"), ensure_ascii=False).encode("utf-8")
+
+    expected = legacy_parse(body)
+    results = {"payload_bytes": len(body), "videos": len(expected), "legacy_json": measure(legacy_parse, body, rounds)}
+    for backend in fast_json.available_backends():
+        # 结果必须与原解析方式一致
+        assert [v.to_feishu_fields() for v in parse_item_list(body, backend=backend)[1]] == expected, backend
+        results[backend] = measure(lambda b: parse_item_list(b, backend=backend), body, rounds)
+        results[backend]["speedup"] = round(results["legacy_json"]["us_per_payload"] / results[backend]["us_per_payload"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="item_list 解析压测")
+    parser.add_argument("--items", type=int, default=30, help="每个响应包含的视频数（使用回放样本时）")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--file", help="抓取到的 item_list 响应文件")
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.rounds, args.file), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端流水线压测：在本地模拟的飞书和 TikTok 上运行 监控任务 → 产品任务，
+记录耗时、峰值内存、API 调用次数和流量，并与保存的基线比较
+每个规模在单独的进程中运行，峰值内存不会继承上一个规模的结果；安装 psutil 时按进程树采样内存，
+浏览器的多个子进程合计计算
+
+用法（在仓库根目录，需安装 playwright 和 chromium，建议安装 psutil）:
+    python -m benchmarks.bench_pipeline --scales 10,100,1000                # 与基线比较，回退时退出码为 1；没有基线的规模以本次结果写入基线
+    python -m benchmarks.bench_pipeline --scales 10,100 --update-baseline   # 用本次结果覆盖基线
+    python -m benchmarks.bench_pipeline --scales 10 --compare-slow-mo 100   # 实测 slow_mo=100ms 与不设置时的耗时差
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from feishu_sheet import FeishuSheet
+from metrics import PLAYWRIGHT_PHASE
+from mock_bitable_server import MockBitableServer
+from tiktok_account_monitor import update_titkok_video
+from tiktok_fixtures import TikTokFixtures, TikTokFixtureServer, install_routes, install_routes_async
+from tiktok_pid_to_product import TikTokProductScraperPlaywright, main_process_empty_product_source_imgs
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+APP_TOKEN = "app_pipeline"
+HANDLE_TABLE = "tbl_handles"
+VIDEO_TABLE = "tbl_videos"
+BASELINE_PATH = Path(__file__).parent / "baselines.json"
+
+# 各指标允许相对基线增加的比例
+DEFAULT_THRESHOLDS = {
+    "wall_seconds": 0.25,
+    "peak_rss_mb": 0.25,
+    "api_calls": 0.10,
+    "bytes_total": 0.10,
+}
+
+
+class RssSampler:
+    """
+    后台线程定时采样本进程和全部子进程（浏览器）的常驻内存，记录峰值，子进程按合计计算
+    未安装 psutil 时退回 ru_maxrss：本进程的峰值仍然准确（每个规模在单独的进程中运行），
+    子进程只能得到其中最大的单个进程
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.self_peak = 0
+        self.children_peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        proc = psutil.Process()
+        children = 0
+        for child in proc.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.Error:
+                # 采样期间退出的子进程
+                pass
+        self.self_peak = max(self.self_peak, proc.memory_info().rss)
+        self.children_peak = max(self.children_peak, children)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        if psutil is not None:
+            self.sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.sample()
+
+    def peak_mb(self):
+        """
+        返回 (本进程峰值, 子进程峰值)，单位 MB
+        """
+        if psutil is not None:
+            return round(self.self_peak / 1024 / 1024, 1), round(self.children_peak / 1024 / 1024, 1)
+        # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+        children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+        return round(self_rss, 1), round(children_rss, 1)
+
+
+def build_config(capture_wait):
+    credentials = {"app_id": "cli_pipeline", "app_secret": "secret_pipeline"}
+    no_pacing = {"min_interval": 0, "jitter": 0}
+    return {
+        "feishu": credentials,
+        "feishu_r": credentials,
+        "bitable": {"app_token": APP_TOKEN, "table_id": VIDEO_TABLE},
+        "bitable_r": {"app_token": APP_TOKEN, "table_id": HANDLE_TABLE},
+        "pacing": {"monitor": no_pacing, "product": no_pacing},
+        "monitor": {"capture_wait": capture_wait},
+    }
+
+
+async def run_monitor(config, fixtures, mock, slow_mo=0):
+    feishu = FeishuSheet(config["feishu"]["app_id"], config["feishu"]["app_secret"], base_url=mock.base_url)
+    feishu_r = FeishuSheet(config["feishu_r"]["app_id"], config["feishu_r"]["app_secret"], base_url=mock.base_url)
+    async with async_playwright() as p:
+        # slow_mo 只用于对比移除前后的耗时，正式任务不再设置
+        browser = await p.chromium.launch(headless=True, slow_mo=slow_mo)
+        context = await browser.new_context()
+        await install_routes_async(context, fixtures)
+        try:
+            await update_titkok_video(config=config, feishu_sheet=feishu, feishu_sheet_r=feishu_r, context=context)
+        finally:
+            await browser.close()
+
+
+def run_product(config, fixtures, mock, tabs, settle_ms):
+    feishu = FeishuSheet(config["feishu"]["app_id"], config["feishu"]["app_secret"], base_url=mock.base_url)
+    scraper = TikTokProductScraperPlaywright(headless=True, max_tabs=tabs,
+                                             page_setup=lambda page: install_routes(page, fixtures),
+                                             settle_ms=settle_ms, security_wait_ms=settle_ms)
+    try:
+        main_process_empty_product_source_imgs(config=config, feishu_sheet=feishu, scraper=scraper)
+    finally:
+        scraper.close()
+
+
+def run_scale(scale, tabs=5, capture_wait=0.5, settle_ms=200, videos_per_account=1, slow_mo=0):
+    """
+    以 scale 个账号运行一次完整流水线，产品ID取值范围为账号数的 10 倍
+    slow_mo: 监控任务浏览器的 slow_mo（毫秒），用于测量移除前的耗时
+    """
+    config = build_config(capture_wait)
+    fixtures = TikTokFixtures(videos_per_account=videos_per_account, product_pool=max(scale * 10, 1))
+    phases = {}
+    with TikTokFixtureServer(fixtures), MockBitableServer() as mock, RssSampler() as rss:
+        mock.add_records(APP_TOKEN, HANDLE_TABLE, [{"handle": f"fixture_user_{i}"} for i in range(scale)])
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            phase_start = time.perf_counter()
+            asyncio.run(run_monitor(config, fixtures, mock, slow_mo))
+            phases["monitor_seconds"] = round(time.perf_counter() - phase_start, 3)
+            phase_start = time.perf_counter()
+            run_product(config, fixtures, mock, tabs, settle_ms)
+            phases["product_seconds"] = round(time.perf_counter() - phase_start, 3)
+        wall = time.perf_counter() - start
+        stats = mock.stats()
+        rows = mock.records(APP_TOKEN, VIDEO_TABLE)
+    self_rss, children_rss = rss.peak_mb()
+    # 每个成功账号的抓取耗时，run_scale 在单独的进程中运行，指标只包含本次
+    accounts = PLAYWRIGHT_PHASE.get_count(job="monitor", phase="account")
+    account_seconds = PLAYWRIGHT_PHASE.get_sum(job="monitor", phase="account") / accounts if accounts else None
+    return {
+        "scale": scale,
+        "slow_mo_ms": slow_mo,
+        "wall_seconds": round(wall, 3),
+        **phases,
+        "account_seconds_mean": round(account_seconds, 3) if account_seconds is not None else None,
+        "peak_rss_mb": self_rss,
+        "peak_child_rss_mb": children_rss,
+        "rss_source": "psutil" if psutil is not None else "ru_maxrss",
+        "api_calls": sum(stats["calls"].values()),
+        "api_calls_by_endpoint": stats["calls"],
+        "bytes_total": stats["bytes_in"] + stats["bytes_out"],
+        "accounts_crawled": fixtures.hits["account"],
+        "products_scraped": fixtures.hits["pdp"],
+        "rows": len(rows),
+        "rows_with_images": sum(1 for r in rows if r["fields"].get("product_source_imgs")),
+    }
+
+
+def run_scale_isolated(scale, **kwargs):
+    """
+    在新启动的进程中运行 run_scale，内存峰值只包含这一个规模
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_scale, scale, **kwargs).result()
+
+
+def compare(result, baseline, thresholds):
+    """
+    返回超过阈值的指标列表
+    """
+    regressions = []
+    for metric, tolerance in thresholds.items():
+        old = baseline.get(metric)
+        new = result.get(metric)
+        if old is None or new is None:
+            continue
+        limit = old * (1 + tolerance)
+        if new > limit:
+            regressions.append(f"{metric}: {new} > {round(limit, 3)}（基线 {old}，允许 +{int(tolerance * 100)}%）")
+    return regressions
+
+
+def _saved(before, after):
+    if before is None or after is None:
+        return None
+    return round(before - after, 3)
+
+
+def compare_slow_mo(scale, slow_mo, tabs, capture_wait, settle_ms):
+    """
+    同一规模分别以 slow_mo 和不设置 slow_mo 运行，返回每个账号、监控阶段和整体的实测耗时对比
+    per_account_seconds.before 可填入 config.json 的 monitor.slow_mo_account_seconds，监控任务运行时按账号输出节省的时间
+    """
+    before = run_scale_isolated(scale, tabs=tabs, capture_wait=capture_wait, settle_ms=settle_ms, slow_mo=slow_mo)
+    after = run_scale_isolated(scale, tabs=tabs, capture_wait=capture_wait, settle_ms=settle_ms)
+    return {
+        "scale": scale,
+        "slow_mo_ms": slow_mo,
+        "per_account_seconds": {"before": before["account_seconds_mean"], "after": after["account_seconds_mean"],
+                                "saved": _saved(before["account_seconds_mean"], after["account_seconds_mean"])},
+        "monitor_seconds": {"before": before["monitor_seconds"], "after": after["monitor_seconds"],
+                            "saved": round(before["monitor_seconds"] - after["monitor_seconds"], 3)},
+        "wall_seconds": {"before": before["wall_seconds"], "after": after["wall_seconds"],
+                         "saved": round(before["wall_seconds"] - after["wall_seconds"], 3)},
+        "accounts_crawled": after["accounts_crawled"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线压测")
+    parser.add_argument("--scales", default="10,100", help="账号数量，逗号分隔，如 10,100,1000")
+    parser.add_argument("--tabs", type=int, default=5)
+    parser.add_argument("--capture-wait", type=float, default=0.5)
+    parser.add_argument("--settle-ms", type=int, default=200)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    parser.add_argument("--compare-slow-mo", type=int, default=0, metavar="MS",
+                        help="分别以 slow_mo=MS 和不设置 slow_mo 运行，输出实测耗时对比，不与基线比较")
+    args = parser.parse_args()
+
+    if args.compare_slow_mo:
+        for scale in [int(s) for s in args.scales.split(",") if s]:
+            result = compare_slow_mo(scale, args.compare_slow_mo, args.tabs, args.capture_wait, args.settle_ms)
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    thresholds = dict(DEFAULT_THRESHOLDS, **baselines.get("thresholds", {}))
+
+    failed = False
+    results = {}
+    missing = {}
+    for scale in [int(s) for s in args.scales.split(",") if s]:
+        result = run_scale_isolated(scale, tabs=args.tabs, capture_wait=args.capture_wait, settle_ms=args.settle_ms)
+        results[str(scale)] = result
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if result["accounts_crawled"] != scale:
+            failed = True
+            print(f"规模 {scale}: 只爬取了 {result['accounts_crawled']} 个账号")
+        baseline = baselines.get("scales", {}).get(str(scale))
+        if baseline is None:
+            missing[str(scale)] = result
+            print(f"规模 {scale}: 没有基线，以本次结果作为基线")
+            continue
+        regressions = compare(result, baseline, thresholds)
+        if regressions:
+            failed = True
+            print(f"规模 {scale}: 性能回退")
+            for line in regressions:
+                print(f"  - {line}")
+        else:
+            print(f"规模 {scale}: 未超过基线阈值")
+
+    if args.update_baseline or missing:
+        baselines.setdefault("scales", {}).update(results if args.update_baseline else missing)
+        baselines.setdefault("thresholds", DEFAULT_THRESHOLDS)
+        baseline_path.write_text(json.dumps(baselines, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已写入 {baseline_path}")
+    if args.update_baseline:
+        return
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
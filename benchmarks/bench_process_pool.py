@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程抓取的扩展性压测：同一批产品分别以 1、2、4... 个进程抓取并写回本地模拟的多维表格，
+比较吞吐量随进程数（CPU 核数）的变化。1 个进程时使用原来的单进程线程池
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_process_pool --products 200 --processes 1,2,4 --tabs 8   # 需安装 playwright 和 chromium
+    python -m benchmarks.bench_process_pool --products 2000 --processes 1,2,4 --no-browser
+--no-browser 不启动浏览器，每个产品在 Python 中解析回放的产品页 HTML（--parse-rounds 次），
+只衡量结果解析、进程间传递和批量写入这部分受 GIL 限制的工作能否随核数扩展
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from html.parser import HTMLParser
+
+from feishu_sheet import FeishuSheet
+from mock_bitable_server import MockBitableServer
+from models import ImageRef, ProductRecord
+from tiktok_fixtures import TikTokFixtures, install_routes
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+APP_TOKEN = "app_bench"
+TABLE_ID = "tbl_bench"
+
+
+class FixtureRoutes:
+    """
+    可以 pickle 的 page_setup：每个工作进程在第一次使用时创建自己的 TikTokFixtures
+    """
+
+    def __init__(self):
+        self.fixtures = None
+
+    def __getstate__(self):
+        return {"fixtures": None}
+
+    def __call__(self, page):
+        if self.fixtures is None:
+            self.fixtures = TikTokFixtures()
+        install_routes(page, self.fixtures)
+
+
+class _ImageParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.images = []
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "img":
+            src = dict(attrs).get("src")
+            if src:
+                self.images.append(src)
+        self._in_title = tag == "h1"
+
+    def handle_data(self, data):
+        if self._in_title and not self.title:
+            self.title = data.strip()
+
+
+class ParsingScraper(TikTokProductScraperPlaywright):
+    """
+    不启动浏览器，在 Python 中解析回放的产品页 HTML 得到产品信息
+    """
+    parse_rounds = 20
+    _fixtures = None
+
+    def open_browser(self):
+        pass
+
+    def create_page(self):
+        return None
+
+    def close(self):
+        pass
+
+    def _get_product_images_with_page(self, page, product_id):
+        if ParsingScraper._fixtures is None:
+            ParsingScraper._fixtures = TikTokFixtures()
+        html = ParsingScraper._fixtures.pdp_html(product_id)
+        for _ in range(self.parse_rounds):
+            parser = _ImageParser()
+            parser.feed(html)
+        return ProductRecord(product_id, parser.title, "", [ImageRef(src) for src in parser.images])
+
+
+def run_processes(scraper, product_ids, processes, batch_size):
+    """
+    以 processes 个进程抓取一次，每次使用新的模拟多维表格
+    """
+    with MockBitableServer() as mock:
+        feishu = FeishuSheet("cli_bench", "secret_bench", base_url=mock.base_url)
+        record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": pid} for pid in product_ids])
+        records = [{"product_id": pid, "record_id": rid} for pid, rid in zip(product_ids, record_ids)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = scraper.scrape_products(records, feishu, APP_TOKEN, TABLE_ID, batch_size=batch_size,
+                                              processes=processes)
+        elapsed = time.perf_counter() - start
+        writes = mock.stats()["calls"].get("batch_update", 0)
+    success = sum(1 for r in results if r.status == "success")
+    return {
+        "processes": processes,
+        "products": len(product_ids),
+        "success": success,
+        "seconds": round(elapsed, 3),
+        "products_per_sec": round(len(results) / elapsed, 2),
+        "batch_updates": writes,
+    }
+
+
+def run(products=200, process_counts=(1, 2, 4), tabs=8, settle_ms=200, batch_size=10, no_browser=False, parse_rounds=20):
+    product_ids = [str(1729000000000000000 + i) for i in range(products)]
+    if no_browser:
+        ParsingScraper.parse_rounds = parse_rounds
+        scraper = ParsingScraper(max_tabs=tabs)
+    else:
+        scraper = TikTokProductScraperPlaywright(headless=True, max_tabs=tabs, page_setup=FixtureRoutes(),
+                                                 settle_ms=settle_ms, security_wait_ms=settle_ms)
+    rows = []
+    for processes in process_counts:
+        row = run_processes(scraper, product_ids, processes, batch_size)
+        base = rows[0] if rows else row
+        # 相对第一个进程数的加速比和每个进程的效率
+        row["speedup"] = round(row["products_per_sec"] / base["products_per_sec"], 2)
+        row["efficiency"] = round(row["speedup"] / (processes / base["processes"]), 2)
+        rows.append(row)
+    return {"cpu_count": os.cpu_count(), "mode": "no-browser" if no_browser else "browser", "tabs": tabs, "results": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程抓取扩展性压测")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--processes", default="1,2,4", help="进程数，逗号分隔")
+    parser.add_argument("--tabs", type=int, default=8, help="所有进程合计的并发tab数")
+    parser.add_argument("--settle-ms", type=int, default=200, help="产品页面加载后的等待（毫秒）")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--no-browser", action="store_true", help="不启动浏览器，在 Python 中解析回放的产品页")
+    parser.add_argument("--parse-rounds", type=int, default=20, help="--no-browser 时每个产品解析页面的次数")
+    args = parser.parse_args()
+
+    process_counts = [int(p) for p in args.processes.split(",") if p]
+    result = run(args.products, process_counts, args.tabs, args.settle_ms, args.batch_size, args.no_browser, args.parse_rounds)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
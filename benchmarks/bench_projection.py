@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字段投影压测：比较读取全部字段与只读取需要的字段时的返回体大小、解析耗时和总耗时
+
+用法（在仓库根目录）:
+    python -m benchmarks.bench_projection --records 5000
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.bench_feishu_sheet import APP_TOKEN, TABLE_ID, make_fields, measure
+from feishu_sheet import FeishuSheet
+from mock_bitable_server import MockBitableServer
+
+EMPTY_IMGS_FILTER = {"conjunction": "and", "conditions": [{"field_name": "product_source_imgs", "operator": "isEmpty", "value": []}]}
+
+CASES = [
+    # (名称, 读取函数, 投影字段)
+    ("handle 列表（get_sheet_data）",
+     lambda feishu, page_size, field_names: feishu.get_sheet_data(APP_TOKEN, TABLE_ID, page_size=page_size, get_all=True, field_names=field_names),
+     ["handle"]),
+    ("待抓取产品（get_records_by_filter）",
+     lambda feishu, page_size, field_names: feishu.get_records_by_filter(APP_TOKEN, TABLE_ID, EMPTY_IMGS_FILTER, page_size=page_size, get_all=True, field_names=field_names),
+     ["product_id", "product_desc", "product_source_imgs"]),
+]
+
+
+def parse_seconds(result, rounds=20):
+    """
+    重新序列化后反复解析，估算客户端解析返回体的耗时
+    """
+    body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+    start = time.perf_counter()
+    for _ in range(rounds):
+        json.loads(body)
+    return round((time.perf_counter() - start) / rounds, 5)
+
+
+def run(records=5000, page_size=500, latency=0.0):
+    results = []
+    with MockBitableServer(latency=latency) as mock:
+        fields = [make_fields(i) for i in range(records)]
+        for row in fields:
+            row["product_desc"] = "long product description " * 40
+        mock.add_records(APP_TOKEN, TABLE_ID, fields)
+        feishu = FeishuSheet("cli_bench", "secret_bench", base_url=mock.base_url)
+        feishu.ensure_token()
+        for name, read, field_names in CASES:
+            for label, projection in (("全部字段", None), ("投影", field_names)):
+                mock.reset_stats()
+                stats, result = measure(f"{name} {label}", lambda: read(feishu, page_size, projection), records)
+                stats.update(mock.stats())
+                stats["parse_seconds"] = parse_seconds(result)
+                stats["items"] = len(result["data"]["items"])
+                results.append(stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段投影压测")
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = run(args.records, args.page_size, args.latency)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'读取':<40}{'耗时(秒)':>10}{'条数':>8}{'请求数':>8}{'下行字节':>12}{'解析(秒)':>10}")
+    for r in results:
+        print(f"{r['name']:<40}{r['seconds']:>10}{r['items']:>8}{sum(r['calls'].values()):>8}{r['bytes_out']:>12}{r['parse_seconds']:>10}")
+
+
+if __name__ == "__main__":
+    main()
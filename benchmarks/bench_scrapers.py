@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线回放压测两个爬虫：账号监控 (intercept_requests) 和产品详情 (TikTokProductScraperPlaywright)
+页面由 tiktok_fixtures 通过 Playwright 路由提供，多维表格写入使用本地模拟服务
+
+用法（在仓库根目录，需安装 playwright 和 chromium）:
+    python -m benchmarks.bench_scrapers --accounts 10 --products 20 --tabs 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+from playwright.async_api import async_playwright
+
+from benchmarks.common import latency_summary
+from feishu_sheet import FeishuSheet
+from mock_bitable_server import MockBitableServer
+from tiktok_account_monitor import intercept_requests
+from tiktok_fixtures import TikTokFixtures, TikTokFixtureServer, install_routes, install_routes_async
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+APP_TOKEN = "app_bench"
+TABLE_ID = "tbl_bench"
+
+
+async def bench_monitor(fixtures, feishu, mock, handles, capture_wait):
+    """
+    顺序访问账号主页，统计每页耗时和视频处理速度
+    """
+    latencies = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await install_routes_async(context, fixtures)
+        page = await context.new_page()
+        start = time.perf_counter()
+        for handle in handles:
+            page_start = time.perf_counter()
+            await intercept_requests(page, f"https://www.tiktok.com/@{handle}", feishu, APP_TOKEN, TABLE_ID,
+                                     capture_wait=capture_wait)
+            latencies.append(time.perf_counter() - page_start)
+        elapsed = time.perf_counter() - start
+        await browser.close()
+    videos = len(mock.records(APP_TOKEN, TABLE_ID))
+    return {
+        "scraper": "monitor",
+        "pages": len(handles),
+        "items": videos,
+        "seconds": round(elapsed, 3),
+        "items_per_sec": round(videos / elapsed, 2),
+        "page_latency": latency_summary(latencies),
+    }
+
+
+def bench_product_latency(fixtures, product_ids, settle_ms):
+    """
+    使用单个页面顺序访问产品详情页，统计每页耗时
+    """
+    scraper = TikTokProductScraperPlaywright(headless=True, page_setup=lambda page: install_routes(page, fixtures),
+                                             settle_ms=settle_ms, security_wait_ms=settle_ms)
+    latencies = []
+    try:
+        page = scraper.create_page()
+        for product_id in product_ids:
+            start = time.perf_counter()
+            scraper._get_product_images_with_page(page, product_id)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        scraper.close()
+    return latency_summary(latencies)
+
+
+def bench_product_throughput(fixtures, feishu, mock, product_ids, tabs, settle_ms):
+    """
+    并发抓取产品并写回多维表格，统计产品处理速度
+    """
+    record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": pid} for pid in product_ids])
+    records = [{"product_id": pid, "record_id": rid} for pid, rid in zip(product_ids, record_ids)]
+    scraper = TikTokProductScraperPlaywright(headless=True, max_tabs=tabs,
+                                             page_setup=lambda page: install_routes(page, fixtures),
+                                             settle_ms=settle_ms, security_wait_ms=settle_ms)
+    start = time.perf_counter()
+    results = scraper.scrape_products_concurrent(records, feishu, APP_TOKEN, TABLE_ID)
+    elapsed = time.perf_counter() - start
+    images = sum(r.count for r in results)
+    return {
+        "scraper": "product",
+        "pages": len(product_ids),
+        "items": len(results),
+        "images": images,
+        "tabs": tabs,
+        "seconds": round(elapsed, 3),
+        "items_per_sec": round(len(results) / elapsed, 2),
+    }
+
+
+def run(accounts=10, products=20, tabs=5, capture_wait=0.5, settle_ms=200, security_checks=0):
+    fixtures = TikTokFixtures()
+    handles = [f"fixture_user_{i}" for i in range(accounts)]
+    product_ids = [str(1729000000000000000 + i) for i in range(products)]
+    fixtures.security_checks = {pid: 1 for pid in product_ids[:security_checks]}
+    results = []
+    with TikTokFixtureServer(fixtures), MockBitableServer() as mock:
+        feishu = FeishuSheet("cli_bench", "secret_bench", base_url=mock.base_url)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(asyncio.run(bench_monitor(fixtures, feishu, mock, handles, capture_wait)))
+            latency = bench_product_latency(fixtures, product_ids[: min(10, products)], settle_ms)
+            throughput = bench_product_throughput(fixtures, feishu, mock, product_ids, tabs, settle_ms)
+        throughput["page_latency"] = latency
+        results.append(throughput)
+        for r in results:
+            r["fixture_hits"] = dict(fixtures.hits)
+            r["bitable"] = mock.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TikTok 爬虫离线回放压测")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--tabs", type=int, default=5, help="产品爬虫并发数")
+    parser.add_argument("--capture-wait", type=float, default=0.5, help="账号页面加载后的捕获等待（秒）")
+    parser.add_argument("--settle-ms", type=int, default=200, help="产品页面加载后的等待（毫秒）")
+    parser.add_argument("--security-checks", type=int, default=0, help="首次访问时返回安全验证页的产品数")
+    args = parser.parse_args()
+
+    results = run(args.accounts, args.products, args.tabs, args.capture_wait, args.settle_ms, args.security_checks)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压测脚本共用的统计工具
+"""
+
+import math
+
+
+def percentile(values, q):
+    """
+    计算百分位数（最近秩法），values 为空时返回 None
+    :param q: 0-100
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values):
+    """
+    汇总一组耗时（秒）
+    """
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 4) if values else None,
+        "p95": round(percentile(values, 95), 4) if values else None,
+        "max": round(max(values), 4) if values else None,
+        "mean": round(sum(values) / len(values), 4) if values else None,
+    }
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻浏览器服务：启动带登录 profile 的 Chrome 并开放 CDP 端口，
+监控任务和产品任务通过 connect_over_cdp 连接，无需每次重新启动浏览器
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+import requests
+
+from tiktok_account_monitor import get_chrome_profile
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
+
+
+class BrowserService:
+    def __init__(self, port=9222, headless=False, health_interval=10, startup_timeout=30,
+                 chrome_path=None, profile_path=None):
+        """
+        :param port: CDP 远程调试端口
+        :param headless: 是否以无头模式运行
+        :param health_interval: 健康检查间隔（秒）
+        :param startup_timeout: 等待 CDP 端口就绪的超时时间（秒）
+        :param chrome_path: Chrome 可执行文件路径，默认按操作系统查找
+        :param profile_path: 用户数据目录，默认与监控任务使用同一个 profile
+        """
+        self.port = port
+        self.headless = headless
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+        self.chrome_path = chrome_path
+        self.profile_path = profile_path
+        self.process = None
+        self.restarts = 0
+        self.last_health_check = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    @property
+    def endpoint(self):
+        """
+        CDP 连接地址，供 chromium.connect_over_cdp 使用
+        """
+        return f"http://127.0.0.1:{self.port}"
+
+    def _resolve_chrome(self):
+        profile_path, chrome_paths = get_chrome_profile()
+        chrome_exe = self.chrome_path
+        if not chrome_exe:
+            for path in chrome_paths:
+                if os.path.exists(path):
+                    chrome_exe = path
+                    break
+        if not chrome_exe:
+            raise Exception("未找到可用的 Chrome 浏览器")
+        return chrome_exe, self.profile_path or profile_path
+
+    def _launch(self):
+        chrome_exe, profile_path = self._resolve_chrome()
+        args = [
+            chrome_exe,
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={profile_path}",
+            f"--user-agent={USER_AGENT}",
+            "--window-size=1920,1080",
+            "--lang=en-US",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--disable-blink-features=AutomationControlled",
+            "--disable-features=IsolateOrigins,site-per-process",
+        ]
+        if self.headless:
+            args.append("--headless=new")
+        print(f"启动常驻浏览器: {chrome_exe}，CDP 端口 {self.port}")
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise Exception(f"浏览器进程启动后立即退出，退出码 {self.process.returncode}")
+            if self.is_healthy():
+                print("常驻浏览器已就绪")
+                return
+            time.sleep(0.5)
+        self._kill()
+        raise Exception(f"等待 CDP 端口 {self.port} 就绪超时")
+
+    def _kill(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def is_healthy(self):
+        """
+        检查浏览器进程存活且 CDP 端口可以响应
+        """
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            response = requests.get(f"{self.endpoint}/json/version", timeout=3)
+            self.last_health_check = time.time()
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def ensure_running(self):
+        """
+        浏览器未运行或不健康时重新启动
+        """
+        with self._lock:
+            if self.is_healthy():
+                return
+            if self.process is not None:
+                print("常驻浏览器无响应，正在重新启动...")
+                self._kill()
+                self.restarts += 1
+            self._launch()
+
+    def start(self):
+        """
+        启动浏览器和后台健康检查线程
+        """
+        self.ensure_running()
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="browser-service-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        while not self._stop_event.wait(self.health_interval):
+            try:
+                self.ensure_running()
+            except Exception as e:
+                print(f"重新启动常驻浏览器失败: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.health_interval + 5)
+            self._watchdog = None
+        with self._lock:
+            self._kill()
+        print("常驻浏览器已关闭")
+
+    def status(self):
+        return {
+            "endpoint": self.endpoint,
+            "running": self.process is not None and self.process.poll() is None,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "last_health_check": self.last_health_check,
+        }
+
+
+if __name__ == "__main__":
+    service = BrowserService()
+    service.start()
+    print(f"CDP 地址: {service.endpoint}，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
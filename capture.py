@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控任务的请求捕获统计：只保存请求方法、状态码计数和耗时样本等聚合数据，内存占用与账号数量无关
+需要排查问题时可开启有界环形缓冲区，保留最近的若干条请求/响应
+"""
+
+import random
+import threading
+from collections import Counter, deque
+
+from models import CapturedRequest, CapturedResponse
+
+# 耗时样本池大小，超过后使用蓄水池抽样，百分位为估计值
+LATENCY_RESERVOIR_SIZE = 1024
+
+
+class CaptureStats:
+    def __init__(self, buffer_size=0, reservoir_size=LATENCY_RESERVOIR_SIZE, seed=None):
+        """
+        :param buffer_size: 环形缓冲区保留的最近请求/响应条数，0 表示不保留
+        :param reservoir_size: 用于计算耗时百分位的样本数上限
+        """
+        self.requests = 0
+        self.responses = 0
+        self.failed = 0
+        self.methods = Counter()
+        self.statuses = Counter()
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buffer = deque(maxlen=buffer_size) if buffer_size else None
+        self._reservoir = []
+        self._reservoir_size = reservoir_size
+        self._random = random.Random(seed)
+        # 已发出但还没有响应的请求，key 为 Playwright 的 request 对象
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record_request(self, request, timestamp, post_data=None):
+        with self._lock:
+            self.requests += 1
+            self.methods[request.method] += 1
+            self._pending[request] = timestamp
+            if self.buffer is not None:
+                self.buffer.append(CapturedRequest(request.url, request.method, timestamp, post_data))
+
+    def record_response(self, response, timestamp, content_type=""):
+        with self._lock:
+            self.responses += 1
+            self.statuses[response.status] += 1
+            start = self._pending.pop(response.request, None)
+            if start is not None:
+                self._observe_latency(timestamp - start)
+            if self.buffer is not None:
+                self.buffer.append(CapturedResponse(response.url, response.status, response.status_text, content_type, timestamp))
+
+    def record_failure(self, request):
+        with self._lock:
+            if self._pending.pop(request, None) is not None:
+                self.failed += 1
+
+    def _observe_latency(self, latency):
+        self.latency_count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        if len(self._reservoir) < self._reservoir_size:
+            self._reservoir.append(latency)
+        else:
+            # 蓄水池抽样：每个样本被保留的概率相同
+            slot = self._random.randrange(self.latency_count)
+            if slot < self._reservoir_size:
+                self._reservoir[slot] = latency
+
+    def percentile(self, q):
+        """
+        耗时百分位（秒），q 为 0-100，没有样本时返回 None
+        """
+        with self._lock:
+            ordered = sorted(self._reservoir)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def forget_pending(self):
+        """
+        丢弃未收到响应的请求，账号处理结束后调用，避免悬挂请求累积
+        """
+        with self._lock:
+            self._pending.clear()
+
+    def summary(self):
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "responses": self.responses,
+                "failed": self.failed,
+                "methods": dict(self.methods),
+                "statuses": dict(self.statuses),
+                "latency": {
+                    "count": self.latency_count,
+                    "mean": round(self.latency_sum / self.latency_count, 4) if self.latency_count else None,
+                    "p50": round(p50, 4) if p50 is not None else None,
+                    "p95": round(p95, 4) if p95 is not None else None,
+                    "p99": round(p99, 4) if p99 is not None else None,
+                    "max": round(self.latency_max, 4),
+                },
+            }
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制（AIMD）：按页面耗时、超时率、安全验证率和多维表格写入错误率调整同时工作的页面数。
+每收集 window 个页面结果做一次决策：指标健康时并发数加 1，任一指标超过阈值时按比例减小，
+并记录每次决策和对应的吞吐量，长时间运行后可以从决策日志中看到最适合当前环境的并发数
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import CONCURRENCY_DECISIONS
+
+# 各任务的默认配置，可在 config.json 的 concurrency 中按任务覆盖
+DEFAULT_CONCURRENCY = {
+    "product": {
+        "initial": 3,
+        "min": 1,
+        "max": 8,
+        "window": 10,
+        "latency_target": 30.0,
+        "max_timeout_rate": 0.2,
+        "max_security_rate": 0.05,
+        "max_write_error_rate": 0.1,
+        "decrease_factor": 0.5,
+    },
+}
+
+
+class AdaptiveConcurrency:
+    def __init__(self, initial=3, min_limit=1, max_limit=8, window=10, latency_target=30.0, max_timeout_rate=0.2,
+                 max_security_rate=0.05, max_write_error_rate=0.1, decrease_factor=0.5, log_path=None, job="product"):
+        """
+        :param initial: 初始并发数
+        :param min_limit: 并发数下限
+        :param max_limit: 并发数上限，工作线程按上限创建，超出当前并发数的线程等待
+        :param window: 每收集多少个页面结果做一次决策
+        :param latency_target: 页面耗时中位数上限（秒），超过说明目标已经变慢
+        :param max_timeout_rate: 页面加载失败（超时、网络错误）比例上限
+        :param max_security_rate: 遇到安全验证的比例上限
+        :param max_write_error_rate: 多维表格写入失败比例上限
+        :param decrease_factor: 超过阈值时并发数乘以该系数
+        :param log_path: 决策日志 JSONL 文件路径，可选
+        :param job: 任务名称，用作指标标签
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.window = window
+        self.latency_target = latency_target
+        self.max_timeout_rate = max_timeout_rate
+        self.max_security_rate = max_security_rate
+        self.max_write_error_rate = max_write_error_rate
+        self.decrease_factor = decrease_factor
+        self.log_path = log_path
+        self.job = job
+        self.active = 0
+        self.decisions = []
+        self._condition = threading.Condition()
+        self._reset_window()
+
+    @classmethod
+    def from_config(cls, config, job):
+        """
+        根据 config.json 的 concurrency.<job> 创建控制器，未配置的项使用 DEFAULT_CONCURRENCY
+        """
+        cfg = dict(DEFAULT_CONCURRENCY.get(job, {}))
+        cfg.update((config or {}).get("concurrency", {}).get(job) or {})
+        return cls(
+            initial=cfg.get("initial", 3),
+            min_limit=cfg.get("min", 1),
+            max_limit=cfg.get("max", 8),
+            window=cfg.get("window", 10),
+            latency_target=cfg.get("latency_target", 30.0),
+            max_timeout_rate=cfg.get("max_timeout_rate", 0.2),
+            max_security_rate=cfg.get("max_security_rate", 0.05),
+            max_write_error_rate=cfg.get("max_write_error_rate", 0.1),
+            decrease_factor=cfg.get("decrease_factor", 0.5),
+            log_path=cfg.get("log_path"),
+            job=job,
+        )
+
+    def settings(self, processes=1):
+        """
+        创建参数，多进程模式下各工作进程按这些参数创建自己的控制器
+        :param processes: 工作进程数，初始并发数和上下限按进程数平均分配（每个进程至少 1）
+        """
+        return {
+            "initial": max(1, self.limit // processes),
+            "min_limit": max(1, self.min_limit // processes),
+            "max_limit": max(1, self.max_limit // processes),
+            "window": self.window,
+            "latency_target": self.latency_target,
+            "max_timeout_rate": self.max_timeout_rate,
+            "max_security_rate": self.max_security_rate,
+            "max_write_error_rate": self.max_write_error_rate,
+            "decrease_factor": self.decrease_factor,
+            "log_path": self.log_path,
+            "job": self.job,
+        }
+
+    def _reset_window(self):
+        self._latencies = []
+        self._timeouts = 0
+        self._security = 0
+        self._writes = 0
+        self._write_errors = 0
+        self._window_start = time.monotonic()
+
+    def acquire(self):
+        """
+        获取一个工作名额，当前并发数已满时等待
+        """
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_page(self, latency, failed=False, security=False):
+        """
+        记录一个页面的处理结果
+        :param latency: 页面处理耗时（秒）
+        :param failed: 页面加载失败（重试后仍超时或网络错误）
+        :param security: 是否遇到安全验证
+        """
+        with self._condition:
+            self._latencies.append(latency)
+            self._timeouts += 1 if failed else 0
+            self._security += 1 if security else 0
+            if len(self._latencies) >= self.window:
+                self._decide()
+
+    def record_writes(self, total, failed):
+        """
+        记录一次多维表格批量写入的结果
+        """
+        with self._condition:
+            self._writes += total
+            self._write_errors += failed
+
+    def _decide(self):
+        """
+        根据当前窗口的指标调整并发数，调用方持有锁
+        """
+        pages = len(self._latencies)
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        latencies = sorted(self._latencies)
+        median = latencies[pages // 2]
+        timeout_rate = self._timeouts / pages
+        security_rate = self._security / pages
+        write_error_rate = self._write_errors / self._writes if self._writes else 0.0
+
+        reason = None
+        if security_rate > self.max_security_rate:
+            reason = "security_check"
+        elif timeout_rate > self.max_timeout_rate:
+            reason = "timeout"
+        elif write_error_rate > self.max_write_error_rate:
+            reason = "bitable_errors"
+        elif median > self.latency_target:
+            reason = "latency"
+
+        old = self.limit
+        if reason:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            action = "decrease"
+        elif self.limit < self.max_limit:
+            self.limit += 1
+            action, reason = "increase", "healthy"
+        else:
+            action, reason = "hold", "at_max"
+        if self.limit == old and action == "decrease":
+            action = "hold"
+
+        decision = {
+            "time": int(time.time()),
+            "action": action,
+            "reason": reason,
+            "from": old,
+            "to": self.limit,
+            "pages": pages,
+            "throughput": round(pages / elapsed, 4),
+            "latency_p50": round(median, 3),
+            "timeout_rate": round(timeout_rate, 3),
+            "security_rate": round(security_rate, 3),
+            "write_error_rate": round(write_error_rate, 3),
+        }
+        self.decisions.append(decision)
+        CONCURRENCY_DECISIONS.inc(job=self.job, action=action)
+        print(f"[并发控制] {old} -> {self.limit}（{reason}）: 吞吐 {decision['throughput']}/秒，"
+              f"耗时中位数 {decision['latency_p50']} 秒，超时率 {decision['timeout_rate']}，"
+              f"安全验证率 {decision['security_rate']}，写入错误率 {decision['write_error_rate']}")
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"[并发控制] 写入决策日志失败: {e}")
+        self._reset_window()
+        # 并发数增加时唤醒等待的工作线程
+        self._condition.notify_all()
+
+    def best_limit(self):
+        """
+        按各并发数下窗口的平均吞吐量，返回吞吐最高的并发数，没有决策时返回当前并发数
+        """
+        with self._condition:
+            throughput = {}
+            for decision in self.decisions:
+                throughput.setdefault(decision["from"], []).append(decision["throughput"])
+        if not throughput:
+            return self.limit
+        return max(throughput, key=lambda limit: sum(throughput[limit]) / len(throughput[limit]))
+
+    def stats(self):
+        with self._condition:
+            actions = {}
+            for decision in self.decisions:
+                actions[decision["action"]] = actions.get(decision["action"], 0) + 1
+            limit, min_limit, max_limit = self.limit, self.min_limit, self.max_limit
+        return {"limit": limit, "min": min_limit, "max": max_limit, "decisions": actions, "best_limit": self.best_limit()}
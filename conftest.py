@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共用的夹具：本地模拟的飞书多维表格服务，以及不启动浏览器的产品页抓取
+"""
+
+import pytest
+
+from feishu_sheet import FeishuSheet
+from mock_bitable_server import MockBitableServer
+
+
+@pytest.fixture
+def mock():
+    with MockBitableServer(seed=1) as server:
+        yield server
+
+
+@pytest.fixture
+def feishu(mock):
+    return FeishuSheet("cli_mock", "secret_mock", base_url=mock.base_url)
+
+
+@pytest.fixture
+def fake_pages(monkeypatch):
+    """
+    替换 TikTokProductScraperPlaywright 的浏览器操作，不启动浏览器，也不等待 time.sleep
+    用法：loads = fake_pages(get_product)，get_product(scraper, page, product_id) 返回 ProductRecord 或 None，
+    loads 按顺序记录每次访问的 product_id
+    """
+    # 用到时才导入，不使用浏览器的测试收集时不加载 Playwright
+    from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+    def install(get_product):
+        loads = []
+
+        def fake_get(self, page, product_id):
+            loads.append(product_id)
+            return get_product(self, page, product_id)
+
+        monkeypatch.setattr(TikTokProductScraperPlaywright, "open_browser", lambda self: None)
+        monkeypatch.setattr(TikTokProductScraperPlaywright, "create_page", lambda self: None)
+        monkeypatch.setattr(TikTokProductScraperPlaywright, "close", lambda self: None)
+        monkeypatch.setattr(TikTokProductScraperPlaywright, "_get_product_images_with_page", fake_get)
+        monkeypatch.setattr("tiktok_pid_to_product.time.sleep", lambda seconds: None)
+        return loads
+
+    return install
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+死信队列：重试后仍失败的飞书表格写入追加保存到本地 JSONL 文件，之后用 replay 命令批量重新提交
+
+用法（在仓库根目录）:
+    python dead_letter.py              # 重新提交 config.json 中 feishu.dead_letter_path 指定的文件
+    python dead_letter.py --dry-run    # 只查看待重新提交的数量
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = "dead_letters.jsonl"
+
+
+class DeadLetterQueue:
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        :param path: JSONL 文件路径，每行一条失败的写入
+        """
+        self.path = path
+        # 重新提交期间使用的文件，中途退出时保留，下次 replay 时一起提交
+        self.replay_path = f"{path}.replaying"
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls((config or {}).get("feishu", {}).get("dead_letter_path", DEFAULT_PATH))
+
+    def add(self, op, app_token, table_id, error="", **entry):
+        """
+        追加一条失败的写入
+        op: create / batch_create / update
+        entry: create 为 fields 和 client_token，batch_create 为 records（字段字典列表）和 client_token，
+               update 为 record_id 和 fields
+        """
+        entry.update({"op": op, "app_token": app_token, "table_id": table_id, "error": error, "time": int(time.time())})
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def load(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with self._lock:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        print(f"跳过无法解析的死信记录: {line[:200]}")
+        return entries
+
+    def pending(self):
+        """
+        待重新提交的全部记录：上次重新提交中途退出留下的记录在前，之后新增的在后
+        """
+        return self.load(self.replay_path) + self.load()
+
+    def __len__(self):
+        return len(self.pending())
+
+    def replay(self, feishu_sheet, batch_size=500):
+        """
+        重新提交所有失败的写入，成功的从文件中移除，仍然失败的保留
+        创建使用原来的 client_token 重新提交，原请求实际已写入时不会产生重复记录；
+        更新本身可重复执行，按表合并后批量提交
+        :return: {"replayed": 成功条数, "failed": 仍失败条数}
+        """
+        # 先把文件移走，重新提交期间其他任务新增的失败写入追加到新文件
+        replay_path = self.replay_path
+        with self._lock:
+            if os.path.exists(self.path):
+                if os.path.exists(replay_path):
+                    # 上次重新提交中途退出留下的文件，合并后一起提交
+                    with open(self.path, "r", encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, replay_path)
+        entries = self.load(replay_path)
+        remaining = []
+        replayed = 0
+        # 重新提交期间的失败由这里记录，不再由 FeishuSheet 追加到文件
+        dead_letters, feishu_sheet.dead_letters = feishu_sheet.dead_letters, None
+        try:
+            updates = {}
+            for entry in entries:
+                op = entry.get("op")
+                if op == "create":
+                    result = feishu_sheet.create_record(entry["app_token"], entry["table_id"], entry["fields"],
+                                                        "死信重试", client_token=entry.get("client_token"))
+                    if result:
+                        replayed += 1
+                    else:
+                        remaining.append(entry)
+                elif op == "batch_create":
+                    created = feishu_sheet.batch_create_records(entry["app_token"], entry["table_id"], entry["records"],
+                                                                batch_size=len(entry["records"]),
+                                                                client_token=entry.get("client_token"))
+                    if created:
+                        replayed += len(entry["records"])
+                    else:
+                        remaining.append(entry)
+                elif op == "update":
+                    updates.setdefault((entry["app_token"], entry["table_id"]), []).append(entry)
+                else:
+                    print(f"未知的死信操作类型: {op}")
+                    remaining.append(entry)
+
+            for (app_token, table_id), items in updates.items():
+                # 同一条记录多次失败时按顺序合并字段，后面的覆盖前面的
+                merged = {}
+                for entry in items:
+                    merged.setdefault(entry["record_id"], {}).update(entry["fields"])
+                records = [{"record_id": record_id, "fields": fields} for record_id, fields in merged.items()]
+                updated = set(feishu_sheet.batch_update_records(app_token, table_id, records, batch_size))
+                replayed += len(updated)
+                remaining.extend(entry for entry in items if entry["record_id"] not in updated)
+        finally:
+            feishu_sheet.dead_letters = dead_letters
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for entry in remaining:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if os.path.exists(replay_path):
+                os.remove(replay_path)
+        print(f"死信重新提交完成: 成功 {replayed} 条，仍失败 {len(remaining)} 条")
+        return {"replayed": replayed, "failed": len(remaining)}
+
+
+def main():
+    from feishu_sheet import FeishuSheet
+
+    parser = argparse.ArgumentParser(description="重新提交死信队列中失败的飞书表格写入")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--path", default=None, help="死信文件路径，默认读取配置 feishu.dead_letter_path")
+    parser.add_argument("--batch-size", type=int, default=500, help="批量更新每批条数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不提交")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    queue = DeadLetterQueue(args.path) if args.path else DeadLetterQueue.from_config(config)
+    # 包括上次重新提交中途退出时留在 .replaying 文件中的记录
+    interrupted = queue.load(queue.replay_path)
+    entries = interrupted + queue.load()
+    counts = {}
+    for entry in entries:
+        counts[entry.get("op")] = counts.get(entry.get("op"), 0) + 1
+    print(f"死信文件 {queue.path} 共 {len(entries)} 条: {counts}")
+    if interrupted:
+        print(f"其中 {len(interrupted)} 条来自上次中途退出的重新提交 {queue.replay_path}")
+    if args.dry_run or not entries:
+        return
+    feishu_cfg = config.get("feishu", {})
+    feishu_sheet = FeishuSheet(feishu_cfg.get("app_id"), feishu_cfg.get("app_secret"))
+    queue.replay(feishu_sheet, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 解析后端：安装了 msgspec 或 orjson 时使用它们，否则回退到标准库 json
+可通过环境变量 FAST_JSON_BACKEND=orjson/msgspec/json 强制指定
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# msgspec 排在最前，item_list 可以使用它的类型化解码
+BACKENDS = ("msgspec", "orjson", "json")
+
+
+def available_backends():
+    """
+    当前环境可用的后端，按优先级排序
+    """
+    installed = {"msgspec": msgspec is not None, "orjson": orjson is not None, "json": True}
+    return [name for name in BACKENDS if installed[name]]
+
+
+def _select_backend():
+    forced = os.environ.get("FAST_JSON_BACKEND")
+    if forced in available_backends():
+        return forced
+    return available_backends()[0]
+
+
+BACKEND = _select_backend()
+
+
+def _stdlib_loads(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8", errors="ignore")
+    return json.loads(data)
+
+
+def make_loads(backend):
+    """
+    返回指定后端的 loads 函数，接受 bytes 或 str
+    非法 UTF-8 时回退到标准库并忽略错误字节，与原来的 decode(errors='ignore') 行为一致
+    """
+    if backend == "orjson":
+        def loads(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                return _stdlib_loads(data)
+        return loads
+    if backend == "msgspec":
+        decoder = msgspec.json.Decoder()
+
+        def loads(data):
+            try:
+                return decoder.decode(data)
+            except (msgspec.DecodeError, UnicodeDecodeError):
+                return _stdlib_loads(data)
+        return loads
+    return _stdlib_loads
+
+
+loads = make_loads(BACKEND)
@@ -1,31 +1,467 @@
 import requests
+import datetime
 import json
 import logging
+import threading
 import time
+import uuid
+from requests.adapters import HTTPAdapter
+
+from metrics import FEISHU_LATENCY, FEISHU_REQUESTS, FEISHU_RETRIES
+from pacing import PacingScheduler
+from resilience import CircuitBreaker, RetryBudget, RetryPolicy, is_retryable_status
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 飞书开放平台 API 根地址，测试和压测时可替换为本地模拟服务
+DEFAULT_BASE_URL = "https://open.feishu.cn/open-apis"
+
+# 写入可以重试的错误码：频率限制、服务端繁忙、写冲突、处理超时
+RETRYABLE_WRITE_CODES = {99991400, 1254290, 1254291, 1255040}
+
+def create_session(pool_size=10):
+    """
+    创建带连接池的 requests.Session，供多个 FeishuSheet 实例或线程复用
+    pool_size: 每个主机保持的最大连接数，应不小于并发线程数
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _parse_sort(sort):
+    """
+    sort: 字段名列表，字段名前加 "-" 表示降序，如 ["-video_create_time", "handle"]
+    返回 [(字段名, 是否降序)]
+    """
+    return [(name[1:], True) if name.startswith("-") else (name, False) for name in sort or []]
+
+
+def _list_params(page_size, page_token, field_names=None, sort=None):
+    """
+    列表接口的查询参数，field_names 和 sort 以 JSON 字符串传递
+    """
+    params = {
+        "page_size": page_size,
+        "page_token": page_token
+    }
+    if field_names:
+        params["field_names"] = json.dumps(list(field_names), ensure_ascii=False)
+    if sort:
+        params["sort"] = json.dumps([f"{name} {'DESC' if desc else 'ASC'}" for name, desc in _parse_sort(sort)], ensure_ascii=False)
+    return params
+
+
+# ---------- 查询条件 ----------
+# 用法：
+#   where = Field("product_source_imgs").is_empty() & Field("handle").in_(["a", "b"])
+#   feishu.get_records_by_filter(app_token, table_id, where, get_all=True)  # 下推到查询接口
+#   [item for item in items if where.evaluate(item["fields"])]              # 对已缓存的数据本地过滤
+
+def _cell_texts(value):
+    """
+    将单元格值统一转换为文本列表，兼容字符串、数字和 [{"text": ...}] 格式
+    """
+    if value is None or value == "" or value == []:
+        return []
+    if isinstance(value, list):
+        return [str(v.get("text", v.get("name", ""))) if isinstance(v, dict) else str(v) for v in value]
+    if isinstance(value, dict):
+        return [str(value.get("text", value.get("name", "")))]
+    return [str(value)]
+
+
+def _cell_number(value):
+    """
+    数字、日期（毫秒时间戳或 ["ExactDate", 毫秒]）转换为数值，无法转换时返回 None
+    """
+    if isinstance(value, list) and len(value) == 2 and value[0] == "ExactDate":
+        value = value[1]
+    elif isinstance(value, list) and value:
+        value = value[0]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_value(value):
+    """
+    datetime/date/数字 转换为毫秒时间戳字符串，其余原样返回
+    """
+    if isinstance(value, datetime.datetime):
+        return str(int(value.timestamp() * 1000))
+    if isinstance(value, datetime.date):
+        return str(int(datetime.datetime(value.year, value.month, value.day).timestamp() * 1000))
+    if isinstance(value, (int, float)):
+        return str(int(value))
+    return value
+
+
+class Condition:
+    COMPARISONS = {
+        "isGreater": lambda a, b: a > b,
+        "isGreaterEqual": lambda a, b: a >= b,
+        "isLess": lambda a, b: a < b,
+        "isLessEqual": lambda a, b: a <= b,
+    }
+
+    def __init__(self, field_name, operator, value=None):
+        """
+        单个过滤条件，operator 使用查询接口的操作符名称
+        value: 比较值列表，日期为 ["ExactDate", 毫秒时间戳]
+        """
+        self.field_name = field_name
+        self.operator = operator
+        self.value = list(value or [])
+
+    def __and__(self, other):
+        return and_(self, other)
+
+    def __or__(self, other):
+        return or_(self, other)
+
+    def __repr__(self):
+        return f"Condition({self.field_name!r}, {self.operator!r}, {self.value!r})"
+
+    def to_dict(self):
+        return {"field_name": self.field_name, "operator": self.operator, "value": self.value}
+
+    def compile(self):
+        return and_(self).compile()
+
+    def evaluate(self, fields):
+        """
+        在本地判断记录字段是否满足条件，语义与查询接口一致
+        """
+        cell = fields.get(self.field_name)
+        texts = _cell_texts(cell)
+        values = [str(v) for v in self.value]
+        if self.operator == "isEmpty":
+            return not texts
+        if self.operator == "isNotEmpty":
+            return bool(texts)
+        if self.operator == "is":
+            return bool(values) and " ".join(texts) == values[0]
+        if self.operator == "isNot":
+            return not values or " ".join(texts) != values[0]
+        if self.operator == "contains":
+            return any(v in t for v in values for t in texts)
+        if self.operator == "doesNotContain":
+            return not any(v in t for v in values for t in texts)
+        if self.operator in self.COMPARISONS:
+            left, right = _cell_number(cell), _cell_number(self.value)
+            return left is not None and right is not None and self.COMPARISONS[self.operator](left, right)
+        raise ValueError(f"不支持的操作符: {self.operator}")
+
+
+class Group:
+    def __init__(self, conjunction, items):
+        """
+        条件组，conjunction 为 and / or，items 为 Condition 或 Group
+        """
+        if conjunction not in ("and", "or"):
+            raise ValueError(f"不支持的连接方式: {conjunction}")
+        self.conjunction = conjunction
+        self.items = []
+        for item in items:
+            # 相同连接方式的嵌套组直接展开
+            if isinstance(item, Group) and (item.conjunction == conjunction or len(item.items) == 1):
+                self.items.extend(item.items)
+            else:
+                self.items.append(item)
+
+    def __and__(self, other):
+        return and_(self, other)
+
+    def __or__(self, other):
+        return or_(self, other)
+
+    def __repr__(self):
+        return f"Group({self.conjunction!r}, {self.items!r})"
+
+    def compile(self):
+        """
+        转换为查询接口的 filter：顶层 conditions 加一层 children，
+        接口不支持更深的嵌套，遇到时抛出 ValueError
+        空的 or 组不匹配任何记录，接口却会把空条件当作不过滤，同样抛出 ValueError
+        """
+        if self.conjunction == "or" and not self.items:
+            raise ValueError("or 条件组为空，不匹配任何记录，无法下推到查询接口")
+        conditions = [item.to_dict() for item in self.items if isinstance(item, Condition)]
+        children = []
+        for item in self.items:
+            if isinstance(item, Group):
+                if any(isinstance(child, Group) for child in item.items):
+                    raise ValueError(f"查询条件嵌套超过两层，无法下推到查询接口: {item!r}")
+                if item.conjunction == "or" and not item.items:
+                    raise ValueError("or 条件组为空，不匹配任何记录，无法下推到查询接口")
+                children.append({"conjunction": item.conjunction, "conditions": [c.to_dict() for c in item.items]})
+        result = {"conjunction": self.conjunction, "conditions": conditions}
+        if children:
+            result["children"] = children
+        return result
+
+    def evaluate(self, fields):
+        # 空的 and 组匹配所有记录，空的 or 组不匹配任何记录
+        results = (item.evaluate(fields) for item in self.items)
+        return any(results) if self.conjunction == "or" else all(results)
+
+
+def and_(*items):
+    return Group("and", items)
+
+
+def or_(*items):
+    return Group("or", items)
+
+
+class Field:
+    def __init__(self, name):
+        """
+        构造字段条件，如 Field("handle").eq("shopdemo")
+        """
+        self.name = name
+
+    def eq(self, value):
+        return Condition(self.name, "is", [value])
+
+    def ne(self, value):
+        return Condition(self.name, "isNot", [value])
+
+    def in_(self, values):
+        """
+        等于任意一个值，编译为 is 条件的 or 组；values 为空时抛出 ValueError，
+        否则空的 or 组会被查询接口当作不过滤，返回整张表
+        """
+        values = list(values)
+        if not values:
+            raise ValueError(f"字段 {self.name} 的 in_ 条件没有任何取值")
+        return or_(*(self.eq(v) for v in values))
+
+    def contains(self, value):
+        return Condition(self.name, "contains", [value])
+
+    def is_empty(self):
+        return Condition(self.name, "isEmpty", [])
+
+    def not_empty(self):
+        return Condition(self.name, "isNotEmpty", [])
+
+    def gt(self, value):
+        return Condition(self.name, "isGreater", [value])
+
+    def ge(self, value):
+        return Condition(self.name, "isGreaterEqual", [value])
+
+    def lt(self, value):
+        return Condition(self.name, "isLess", [value])
+
+    def le(self, value):
+        return Condition(self.name, "isLessEqual", [value])
+
+    def between(self, start, end):
+        """
+        日期字段在 [start, end] 之间，start/end 为 datetime、date 或毫秒时间戳
+        """
+        return and_(
+            Condition(self.name, "isGreaterEqual", ["ExactDate", _date_value(start)]),
+            Condition(self.name, "isLessEqual", ["ExactDate", _date_value(end)]),
+        )
+
+
+def filter_records(items, where):
+    """
+    在本地按查询条件过滤已读取的记录（get_sheet_data 等返回的 items）
+    """
+    return [item for item in items if where.evaluate(item.get("fields") or {})]
+
+
+def date_partitions(field_name, start, end, parts):
+    """
+    把日期字段按 [start, end) 等分为 parts 个互不重叠的区间，最后加一个分区覆盖空值和区间外的记录，
+    所有分区合起来正好是整张表
+    start/end: datetime、date 或毫秒时间戳
+    """
+    start_ms, end_ms = int(_date_value(start)), int(_date_value(end))
+    # 接口按天比较日期，分界点取整到整天，区间数可能少于 parts
+    day = 24 * 3600 * 1000
+    step = max(1, -(-(end_ms - start_ms) // (parts * day))) * day
+    bounds = list(range(start_ms, end_ms, step)) + [end_ms]
+    partitions = [
+        and_(Condition(field_name, "isGreaterEqual", ["ExactDate", str(lo)]),
+             Condition(field_name, "isLess", ["ExactDate", str(hi)]))
+        for lo, hi in zip(bounds, bounds[1:]) if hi > lo
+    ]
+    partitions.append(or_(
+        Field(field_name).is_empty(),
+        Condition(field_name, "isLess", ["ExactDate", str(start_ms)]),
+        Condition(field_name, "isGreaterEqual", ["ExactDate", str(end_ms)]),
+    ))
+    return partitions
+
+
+def value_partitions(field_name, values):
+    """
+    按分片字段的取值划分：每个值一个分区，最后一个分区覆盖其余值和空值
+    """
+    partitions = [Field(field_name).eq(v) for v in values]
+    partitions.append(and_(*(Field(field_name).ne(v) for v in values)))
+    return partitions
+
+
+def partitions_from_config(partition_config):
+    """
+    按配置生成分区条件，未配置时返回 None（顺序读取）
+    {"field": "handle", "values": ["a", "b"]} 按取值划分，见 value_partitions；
+    {"field": "创建日期", "start": "2024-01-01", "end": "2025-01-01", "parts": 8} 按日期划分，见 date_partitions
+    """
+    if not partition_config:
+        return None
+    field_name = partition_config.get("field")
+    if not field_name:
+        raise ValueError("分区配置缺少 field")
+    if "values" in partition_config:
+        return value_partitions(field_name, partition_config["values"])
+    if "start" in partition_config and "end" in partition_config:
+        start = datetime.date.fromisoformat(partition_config["start"])
+        end = datetime.date.fromisoformat(partition_config["end"])
+        return date_partitions(field_name, start, end, partition_config.get("parts", 4))
+    raise ValueError("分区配置需要 values 或 start/end")
+
+
+def compile_filter(filter_formula):
+    """
+    查询条件可以是 Condition/Group，也可以是手写的 filter 字典
+    """
+    if isinstance(filter_formula, (Condition, Group)):
+        return filter_formula.compile()
+    return filter_formula
+
+
+def _search_payload(filter_formula, field_names=None, sort=None):
+    """
+    查询接口的请求体
+    """
+    payload = {}
+    if filter_formula:
+        payload["filter"] = compile_filter(filter_formula)
+    if field_names:
+        payload["field_names"] = list(field_names)
+    if sort:
+        payload["sort"] = [{"field_name": name, "desc": desc} for name, desc in _parse_sort(sort)]
+    return payload
+
+
 class FeishuSheet:
-    def __init__(self, app_id, app_secret):
+    def __init__(self, app_id, app_secret, session=None, base_url=DEFAULT_BASE_URL, dead_letters=None, retries=2):
+        """
+        app_id / app_secret: 飞书应用凭证
+        session: 共享的 requests.Session，可选，为空时创建独立的连接池
+        base_url: API 根地址，默认为飞书开放平台
+        dead_letters: DeadLetterQueue 实例，可选，重试后仍失败的写入保存到这里
+        retries: 网络异常、HTTP 5xx/429 或可重试错误码时的重试次数，创建记录重试时使用同一个 client_token
+        """
         self.app_id = app_id
         self.app_secret = app_secret
+        self.base_url = base_url.rstrip("/")
         self.access_token = None
         self.token_expire = 0
         self.token_time = 0
+        self.session = session or create_session()
+        self.dead_letters = dead_letters
+        # 同一个实例的所有请求共用熔断器，飞书持续不可用时快速失败；重试预算由每个任务开始时重新创建
+        self.breaker = CircuitBreaker("feishu")
+        self.retry_policy = RetryPolicy("feishu", attempts=retries + 1, budget=RetryBudget(), breaker=self.breaker)
+        self._token_lock = threading.Lock()
+    
+    def reset_retry_budget(self):
+        """
+        换用新的重试预算，任务开始时调用。webhook 服务等长期共用一个实例时，
+        之前任务用完的预算不会让之后的任务不再重试
+        :return: 新的 RetryBudget
+        """
+        self.retry_policy.budget = RetryBudget()
+        return self.retry_policy.budget
+
+    @property
+    def retries(self):
+        return self.retry_policy.attempts - 1
+
+    @retries.setter
+    def retries(self, value):
+        self.retry_policy.attempts = value + 1
+
+    def _request(self, http_method, url, api, **kwargs):
+        """
+        发送 HTTP 请求，网络异常和 HTTP 5xx/429 按 retry_policy 退避重试，重试用完后返回最后一次的响应
+        http_method: GET / POST / PUT / DELETE
+        api: 调用方方法名，作为指标的 method 标签
+        """
+        return self.retry_policy.call(self._send, http_method, url, api,
+                                      retry_result=lambda response: is_retryable_status(response.status_code),
+                                      on_retry=lambda *_: FEISHU_RETRIES.inc(method=api), **kwargs)
+
+    def _send(self, http_method, url, api, **kwargs):
+        """
+        发送一次 HTTP 请求并记录耗时和状态码指标
+        """
+        start = time.perf_counter()
+        status = "exception"
+        try:
+            response = self.session.request(http_method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            FEISHU_LATENCY.observe(time.perf_counter() - start, method=api)
+            FEISHU_REQUESTS.inc(method=api, status=status)
     
+    def _write(self, http_method, url, api, payload, params=None):
+        """
+        发送写入请求，除 _request 的重试条件外，返回可重试错误码时也会重试
+        创建记录的 client_token 放在 params 中，每次重试保持不变，服务端不会重复创建
+        :return: (成功时的响应 JSON 或 None, 最后一次的错误信息)
+        """
+        def attempt():
+            token = self.ensure_token()
+            if not token:
+                return None, {"code": -1, "msg": "获取访问令牌失败"}
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+            response = self._send(http_method, url, api, headers=headers, params=params, json=payload)
+            try:
+                return response, response.json()
+            except ValueError:
+                return response, {"code": -1, "msg": f"响应不是有效的JSON，状态码 {response.status_code}"}
+
+        def retryable(outcome):
+            response, result = outcome
+            return response is not None and (is_retryable_status(response.status_code)
+                                             or result.get("code") in RETRYABLE_WRITE_CODES)
+
+        try:
+            _, result = self.retry_policy.call(attempt, retry_result=retryable,
+                                               on_retry=lambda *_: FEISHU_RETRIES.inc(method=api))
+        except Exception as e:
+            return None, str(e)
+        if result.get("code") == 0:
+            return result, ""
+        return None, result.get("msg") or f"code {result.get('code')}"
+
     def get_access_token(self):
         """
         获取飞书 API 访问令牌
         """
         try:
-            url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
+            url = f"{self.base_url}/auth/v3/tenant_access_token/internal/"
             headers = {"Content-Type": "application/json"}
             payload = {
                 "app_id": self.app_id,
                 "app_secret": self.app_secret
             }
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._request("POST", url, "get_access_token", headers=headers, json=payload)
             result = response.json()
             
             if result.get("code") == 0:
@@ -47,11 +483,14 @@ class FeishuSheet:
         """
         # 检查 token 是否存在且未过期
         if not self.access_token or time.time() - self.token_time > self.token_expire - 60:
-            # 提前 60 秒刷新 token，避免过期
-            return self.get_access_token()
+            # 实例可能被多个线程共享，加锁避免并发刷新
+            with self._token_lock:
+                if not self.access_token or time.time() - self.token_time > self.token_expire - 60:
+                    # 提前 60 秒刷新 token，避免过期
+                    return self.get_access_token()
         return self.access_token
     
-    def get_sheet_data(self, app_token, table_id, page_size=100, page_token="", get_all=False):
+    def get_sheet_data(self, app_token, table_id, page_size=100, page_token="", get_all=False, field_names=None, sort=None):
         """
         获取表格数据
         app_token: 应用 token
@@ -59,6 +498,8 @@ class FeishuSheet:
         page_size: 每页数据量
         page_token: 分页标记
         get_all: 是否获取所有数据
+        field_names: 只返回这些字段，为空时返回全部字段
+        sort: 排序字段列表，字段名前加 "-" 表示降序
         """
         try:
             token = self.ensure_token()
@@ -66,7 +507,7 @@ class FeishuSheet:
                 return None
             
             # 退回到v1版本API
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records"
+            url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records"
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
@@ -74,12 +515,9 @@ class FeishuSheet:
             
             if not get_all:
                 # 只获取一页数据
-                params = {
-                    "page_size": page_size,
-                    "page_token": page_token
-                }
+                params = _list_params(page_size, page_token, field_names, sort)
                 
-                response = requests.get(url, headers=headers, params=params)
+                response = self._request("GET", url, "get_sheet_data", headers=headers, params=params)
                 print(f"响应状态码: {response.status_code}")
                 print(f"响应内容: {response.text}")
                 
@@ -104,12 +542,9 @@ class FeishuSheet:
                 current_page_token = page_token
                 
                 while True:
-                    params = {
-                        "page_size": page_size,
-                        "page_token": current_page_token
-                    }
+                    params = _list_params(page_size, current_page_token, field_names, sort)
                     
-                    response = requests.get(url, headers=headers, params=params)
+                    response = self._request("GET", url, "get_sheet_data", headers=headers, params=params)
                     print(f"响应状态码: {response.status_code}")
                     print(f"响应内容: {response.text}")
                     
@@ -161,7 +596,7 @@ class FeishuSheet:
             logging.error(f"获取表格数据异常: {str(e)}")
             return None
     
-    def get_view_data(self, app_token, table_id, view_id, page_size=100, page_token="", get_all=False):
+    def get_view_data(self, app_token, table_id, view_id, page_size=100, page_token="", get_all=False, field_names=None, sort=None):
         """
         获取视图数据
         app_token: 应用 token
@@ -170,6 +605,8 @@ class FeishuSheet:
         page_size: 每页数据量
         page_token: 分页标记
         get_all: 是否获取所有数据
+        field_names: 只返回这些字段，为空时返回全部字段
+        sort: 排序字段列表，字段名前加 "-" 表示降序
         """
         try:
             token = self.ensure_token()
@@ -177,7 +614,7 @@ class FeishuSheet:
                 return None
             
             # 退回到v1版本API
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/views/{view_id}/records"
+            url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/views/{view_id}/records"
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
@@ -185,12 +622,9 @@ class FeishuSheet:
             
             if not get_all:
                 # 只获取一页数据
-                params = {
-                    "page_size": page_size,
-                    "page_token": page_token
-                }
+                params = _list_params(page_size, page_token, field_names, sort)
                 
-                response = requests.get(url, headers=headers, params=params)
+                response = self._request("GET", url, "get_view_data", headers=headers, params=params)
                 result = response.json()
                 
                 if result.get("code") == 0:
@@ -205,12 +639,9 @@ class FeishuSheet:
                 current_page_token = page_token
                 
                 while True:
-                    params = {
-                        "page_size": page_size,
-                        "page_token": current_page_token
-                    }
+                    params = _list_params(page_size, current_page_token, field_names, sort)
                     
-                    response = requests.get(url, headers=headers, params=params)
+                    response = self._request("GET", url, "get_view_data", headers=headers, params=params)
                     result = response.json()
                     
                     if result.get("code") == 0:
@@ -251,56 +682,25 @@ class FeishuSheet:
             logging.error(f"获取视图数据异常: {str(e)}")
             return None
     
-    def create_record(self, app_token, table_id, fields, note=""):
+    def create_record(self, app_token, table_id, fields, note="", client_token=None):
         """
         创建记录
         app_token: 应用 token
         table_id: 表格 ID
         fields: 字段数据，格式为 {"字段名": "值"}
         note: 备注，可选
+        client_token: 幂等键（uuid4），为空时自动生成；重试和死信重新提交时使用同一个值，不会重复创建
         """
-        try:
-            token = self.ensure_token()
-            if not token:
-                return None
-            
-            # 退回到v1版本API
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "fields": fields
-            }
-            
-            #print(f"请求URL: {url}")
-            #print(f"请求头: {headers}")
-            #print(f"请求体: {payload}")
-            
-            response = requests.post(url, headers=headers, json=payload)
-            #print(f"响应状态码: {response.status_code}")
-            #print(f"响应内容: {response.text}")
-            
-            # 尝试解析响应
-            try:
-                result = response.json()
-                #print(f"解析后的响应: {result}")
-                
-                if result.get("code") == 0:
-                    logging.info(f"创建记录成功，备注: {note}")
-                    return result
-                else:
-                    logging.error(f"创建记录失败: {result.get('msg')}，备注: {note}")
-                    return None
-            except json.JSONDecodeError as e:
-                print(f"JSON解析错误: {str(e)}")
-                logging.error(f"创建记录异常: 响应不是有效的JSON格式，备注: {note}")
-                return None
-        except Exception as e:
-            print(f"请求异常: {str(e)}")
-            logging.error(f"创建记录异常: {str(e)}")
-            return None
+        client_token = client_token or str(uuid.uuid4())
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records"
+        result, error = self._write("POST", url, "create_record", {"fields": fields}, params={"client_token": client_token})
+        if result:
+            logging.info(f"创建记录成功，备注: {note}")
+            return result
+        logging.error(f"创建记录失败: {error}，备注: {note}")
+        if self.dead_letters is not None:
+            self.dead_letters.add("create", app_token, table_id, error, fields=fields, client_token=client_token)
+        return None
     
     def update_record(self, app_token, table_id, record_id, fields):
         """
@@ -310,33 +710,15 @@ class FeishuSheet:
         record_id: 记录 ID
         fields: 字段数据，格式为 {"字段名": "值"}
         """
-        try:
-            token = self.ensure_token()
-            if not token:
-                return None
-            
-            # 退回到v1版本API
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/{record_id}"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "fields": fields
-            }
-            
-            response = requests.put(url, headers=headers, json=payload)
-            result = response.json()
-            
-            if result.get("code") == 0:
-                logging.info("更新记录成功")
-                return result
-            else:
-                logging.error(f"更新记录失败: {result.get('msg')}")
-                return None
-        except Exception as e:
-            logging.error(f"更新记录异常: {str(e)}")
-            return None
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/{record_id}"
+        result, error = self._write("PUT", url, "update_record", {"fields": fields})
+        if result:
+            logging.info("更新记录成功")
+            return result
+        logging.error(f"更新记录失败: {error}")
+        if self.dead_letters is not None:
+            self.dead_letters.add("update", app_token, table_id, error, record_id=record_id, fields=fields)
+        return None
     
     def delete_record(self, app_token, table_id, record_id):
         """
@@ -351,13 +733,13 @@ class FeishuSheet:
                 return None
             
             # 退回到v1版本API
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/{record_id}"
+            url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/{record_id}"
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
             }
             
-            response = requests.delete(url, headers=headers)
+            response = self._request("DELETE", url, "delete_record", headers=headers)
             result = response.json()
             
             if result.get("code") == 0:
@@ -370,15 +752,17 @@ class FeishuSheet:
             logging.error(f"删除记录异常: {str(e)}")
             return None
     
-    def get_records_by_filter(self, app_token, table_id, filter_formula, page_size=100, page_token="", get_all=False):
+    def get_records_by_filter(self, app_token, table_id, filter_formula, page_size=100, page_token="", get_all=False, field_names=None, sort=None):
         """
         根据条件查找记录
         app_token: 应用 token
         table_id: 表格 ID
-        filter_formula: 过滤公式，使用飞书表格的公式语法
+        filter_formula: 过滤条件，Condition/Group 或查询接口的 filter 字典
         page_size: 每页数据量
         page_token: 分页标记
         get_all: 是否获取所有数据
+        field_names: 只返回这些字段，为空时返回全部字段
+        sort: 排序字段列表，字段名前加 "-" 表示降序
         """
         try:
             token = self.ensure_token()
@@ -386,7 +770,7 @@ class FeishuSheet:
                 return None
             
             # 使用v1版本API进行条件查询
-            url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
+            url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
             headers = {
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
@@ -394,17 +778,13 @@ class FeishuSheet:
             
             if not get_all:
                 # 只获取一页数据
-                payload = {}
                 params = {
                     "page_size": page_size,
                     "page_token": page_token
                 }
+                payload = _search_payload(filter_formula, field_names, sort)
 
-                # 添加过滤条件
-                if filter_formula:
-                    payload["filter"] = filter_formula
-
-                response = requests.post(url, headers=headers, params=params, json=payload)
+                response = self._request("POST", url, "get_records_by_filter", headers=headers, params=params, json=payload)
                 print(f"响应状态码: {response.status_code}")
                 print(f"响应内容: {response.text}")
                 
@@ -433,13 +813,9 @@ class FeishuSheet:
                         "page_size": page_size,
                         "page_token": current_page_token
                     }
-                    payload = {}
-
-                    # 添加过滤条件
-                    if filter_formula:
-                        payload["filter"] = filter_formula
+                    payload = _search_payload(filter_formula, field_names, sort)
 
-                    response = requests.post(url, headers=headers, params=params, json=payload)
+                    response = self._request("POST", url, "get_records_by_filter", headers=headers, params=params, json=payload)
                     
                     # 尝试解析响应
                     try:
@@ -487,6 +863,83 @@ class FeishuSheet:
             logging.error(f"根据条件查找记录异常: {str(e)}")
             return None
 
+    def _search_all_pages(self, url, headers, payload, page_size, limiter):
+        """
+        顺序读取一个分区的所有页，返回 items 列表，失败时返回 None
+        """
+        items = []
+        page_token = ""
+        while True:
+            if limiter:
+                limiter.wait(url)
+            params = {"page_size": page_size, "page_token": page_token}
+            result = self._request("POST", url, "get_records_partitioned", headers=headers, params=params, json=payload).json()
+            if result.get("code") != 0:
+                logging.error(f"分区读取失败: {result.get('msg')}")
+                return None
+            data = result.get("data", {})
+            items.extend(data.get("items") or [])
+            page_token = data.get("page_token", "")
+            if not data.get("has_more") or not page_token:
+                return items
+
+    def get_records_partitioned(self, app_token, table_id, partitions, where=None, field_names=None, sort=None,
+                                page_size=500, max_workers=4, rate_limit=10):
+        """
+        把整表读取拆成多个互不重叠的分区并发读取，合并后返回与 get_all=True 相同结构的结果
+        partitions: 分区条件列表（Condition/Group），可用 date_partitions / value_partitions 生成，
+                    分区之间必须互不重叠且覆盖全部需要的记录
+        where: 额外的过滤条件，与每个分区条件组合后下推到查询接口
+        sort: 只在分区内有效，合并结果按分区顺序排列
+        max_workers: 同时读取的分区数
+        rate_limit: 所有分区合计每秒最多请求数，None 表示不限
+        任一分区读取失败时返回 None；过滤条件无法转换（如嵌套过深）时在开始读取前抛出 ValueError
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        # 先转换所有分区的查询条件，条件写错时直接报错，不会在部分分区已经读取后才中断
+        payloads = [_search_payload(and_(partition, where) if where is not None else partition, field_names, sort)
+                    for partition in partitions]
+
+        token = self.ensure_token()
+        if not token:
+            return None
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        limiter = PacingScheduler(min_interval=1.0 / rate_limit) if rate_limit else None
+
+        def fetch(payload):
+            try:
+                return self._search_all_pages(url, headers, payload, page_size, limiter)
+            except Exception as e:
+                logging.error(f"分区读取异常: {str(e)}")
+                return None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = list(executor.map(fetch, payloads))
+        if any(items is None for items in pages):
+            return None
+
+        # 分区条件写错导致重叠时按 record_id 去重
+        seen = set()
+        all_items = []
+        for items in pages:
+            for item in items:
+                if item.get("record_id") not in seen:
+                    seen.add(item.get("record_id"))
+                    all_items.append(item)
+        logging.info(f"分区读取完成，{len(partitions)} 个分区共 {len(all_items)} 条记录，耗时 {time.perf_counter() - start:.2f} 秒")
+        return {
+            "code": 0,
+            "data": {
+                "items": all_items,
+                "has_more": False,
+                "total": len(all_items)
+            },
+            "msg": "success"
+        }
+
     def batch_delete_records(self, app_token, table_id, record_ids):
         """
         批量删除记录，每次最多 500 条
@@ -496,12 +949,12 @@ class FeishuSheet:
         token = self.ensure_token()
         if not token:
             return 0
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_delete"
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_delete"
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         deleted = 0
         for i in range(0, len(record_ids), 500):
             batch = record_ids[i:i+500]
-            result = requests.post(url, headers=headers, json={"records": batch}).json()
+            result = self._request("POST", url, "batch_delete_records", headers=headers, json={"records": batch}).json()
             if result.get("code") == 0:
                 deleted += len(batch)
             else:
@@ -509,6 +962,50 @@ class FeishuSheet:
         logging.info(f"批量删除完成，共删除 {deleted} 条记录")
         return deleted
 
+    def batch_create_records(self, app_token, table_id, fields_list, batch_size=500, client_token=None):
+        """
+        批量创建记录，每次最多 batch_size 条（接口上限 1000）
+        fields_list: 字段字典列表，格式为 [{"字段名": "值"}]
+        client_token: 幂等键，只有一批时使用；为空或分多批时每批自动生成
+        返回成功创建的 record_id 列表，同一批内的记录要么全部成功要么全部失败
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create"
+        created = []
+        for i in range(0, len(fields_list), batch_size):
+            batch = fields_list[i:i+batch_size]
+            batch_token = client_token if client_token and len(fields_list) <= batch_size else str(uuid.uuid4())
+            result, error = self._write("POST", url, "batch_create_records", {"records": [{"fields": fields} for fields in batch]},
+                                        params={"client_token": batch_token})
+            if result:
+                created.extend(record["record_id"] for record in result.get("data", {}).get("records", []))
+            else:
+                logging.error(f"批量创建失败: {error}")
+                if self.dead_letters is not None:
+                    self.dead_letters.add("batch_create", app_token, table_id, error, records=batch, client_token=batch_token)
+        logging.info(f"批量创建完成，共创建 {len(created)} 条记录")
+        return created
+
+    def batch_update_records(self, app_token, table_id, records, batch_size=500):
+        """
+        批量更新记录，每次最多 batch_size 条（接口上限 1000）
+        records: [{"record_id": "...", "fields": {...}}]
+        返回成功更新的 record_id 列表
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_update"
+        updated = []
+        for i in range(0, len(records), batch_size):
+            batch = records[i:i+batch_size]
+            result, error = self._write("POST", url, "batch_update_records", {"records": batch})
+            if result:
+                updated.extend(record["record_id"] for record in batch)
+            else:
+                logging.error(f"批量更新失败: {error}")
+                if self.dead_letters is not None:
+                    for record in batch:
+                        self.dead_letters.add("update", app_token, table_id, error, record_id=record["record_id"], fields=record["fields"])
+        logging.info(f"批量更新完成，共更新 {len(updated)} 条记录")
+        return updated
+
     def delete_duplicate_records(self, app_token, table_id, duplicate_field="重复", duplicate_value="重复"):
         """
         删除重复字段值为指定值的所有记录
@@ -517,17 +1014,10 @@ class FeishuSheet:
         duplicate_field: 标记重复的字段名，默认为"重复"
         duplicate_value: 重复字段的值，默认为"重复"
         """
-        filter_formula = {
-            "conjunction": "and",
-            "conditions": [
-                {
-                    "field_name": duplicate_field,
-                    "operator": "is",
-                    "value": [duplicate_value]
-                }
-            ]
-        }
-        result = self.get_records_by_filter(app_token, table_id, filter_formula, get_all=True)
+        filter_formula = Field(duplicate_field).eq(duplicate_value)
+        # 只需要 record_id，只请求过滤用的字段
+        result = self.get_records_by_filter(app_token, table_id, filter_formula, page_size=500, get_all=True,
+                                            field_names=[duplicate_field])
         if not result:
             return 0
 
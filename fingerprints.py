@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入指纹：对写入飞书表格的字段做规范化后计算哈希，保存在本地 JSON 文件中，
+重跑或重试时字段没有变化的记录不再调用更新接口
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_PATH = "write_fingerprints.json"
+
+
+def normalize_value(value):
+    """
+    规范化单元格值：None 视为空字符串，字符串去掉首尾空白并统一换行符
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.replace("\r\n", "\n").strip()
+    if isinstance(value, list):
+        return [normalize_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: normalize_value(v) for k, v in value.items()}
+    return value
+
+
+def fingerprint(fields):
+    """
+    字段字典的指纹，与字段顺序无关
+    """
+    normalized = {k: normalize_value(v) for k, v in fields.items()}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        :param path: 指纹文件路径，为 None 时只保存在内存中
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._fingerprints = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取写入指纹文件失败，将重新记录: {e}")
+
+    @staticmethod
+    def key(app_token, table_id, record_id):
+        return f"{app_token}/{table_id}/{record_id}"
+
+    def is_unchanged(self, key, fields):
+        with self._lock:
+            return self._fingerprints.get(key) == fingerprint(fields)
+
+    def mark(self, key, fields):
+        with self._lock:
+            self._fingerprints[key] = fingerprint(fields)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._fingerprints)
+
+    def save(self):
+        """
+        先写临时文件再替换，避免中途退出时留下损坏的文件
+        """
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._fingerprints)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析 TikTok item_list 接口响应，只提取写入飞书表格的字段：
+author.uniqueId、id、createTime、desc，以及第一个 anchor 中的产品ID、标题、关键词和图片
+
+anchors[0].extra 是 JSON 字符串，其中的 extra 又是一层 JSON 字符串，
+安装了 msgspec 时按类型定义解码，跳过不需要的字段；否则使用 fast_json 的后端整体解析
+"""
+
+from typing import Any, List, Optional
+
+import fast_json
+from models import VideoRecord
+
+if fast_json.msgspec is not None:
+    import msgspec
+
+    class _Author(msgspec.Struct):
+        uniqueId: str = ""
+
+    class _Anchor(msgspec.Struct):
+        extra: Any = None
+
+    class _Item(msgspec.Struct):
+        id: Any = ""
+        createTime: Any = ""
+        desc: Any = ""
+        author: _Author = msgspec.field(default_factory=_Author)
+        anchors: List[_Anchor] = []
+
+    class _ItemList(msgspec.Struct):
+        itemList: Optional[List[_Item]] = None
+
+    class _AnchorExtra(msgspec.Struct):
+        id: Any = ""
+        keyword: Any = ""
+        title: Any = ""
+        img: Any = ""
+        extra: Any = None
+
+    class _InnerExtra(msgspec.Struct):
+        title: Any = msgspec.UNSET
+        img: Any = msgspec.UNSET
+
+    _item_list_decoder = msgspec.json.Decoder(_ItemList)
+    _anchor_decoder = msgspec.json.Decoder(List[_AnchorExtra])
+    _inner_decoder = msgspec.json.Decoder(_InnerExtra)
+
+
+def _video_record(handle, video_id, create_time, desc, product_id, title, keyword, img):
+    return VideoRecord(
+        handle=handle,
+        video_id=video_id,
+        video_create_time=str(create_time),
+        video_title=desc,
+        product_id=product_id,
+        product_title=title,
+        product_keyword=keyword,
+        product_imgs=str(img) if isinstance(img, list) else img,
+    )
+
+
+def _parse_with_dicts(body, loads):
+    data = loads(body)
+    if not isinstance(data, dict) or "itemList" not in data:
+        return None
+    item_list = data["itemList"]
+    videos = []
+    for item in item_list:
+        anchors = item.get("anchors")
+        if not isinstance(anchors, list) or not anchors:
+            continue
+        extra_str = anchors[0].get("extra")
+        if not isinstance(extra_str, str):
+            continue
+        try:
+            anchor = loads(extra_str)[0]
+        except ValueError as e:
+            print(f"解析失败: {str(e)}")
+            continue
+        if "extra" not in anchor:
+            continue
+        title = anchor.get("title", "")
+        img = anchor.get("img", "")
+        try:
+            inner = loads(anchor["extra"])
+            title = inner.get("title", title)
+            img = inner.get("img", img)
+        except (ValueError, TypeError) as e:
+            print(f"解析 inner extra 失败: {str(e)}")
+        author = item.get("author") or {}
+        videos.append(_video_record(author.get("uniqueId", ""), item.get("id", ""), item.get("createTime", ""),
+                                    item.get("desc", ""), anchor.get("id", ""), title,
+                                    anchor.get("keyword", ""), img))
+    return len(item_list), videos
+
+
+def _parse_with_structs(body):
+    try:
+        items = _item_list_decoder.decode(body).itemList
+    except (msgspec.DecodeError, UnicodeDecodeError):
+        # 字段类型与定义不符或包含非法 UTF-8 时回退到通用解析
+        return _parse_with_dicts(body, fast_json.loads)
+    if items is None:
+        return None
+    videos = []
+    for item in items:
+        if not item.anchors or not isinstance(item.anchors[0].extra, str):
+            continue
+        try:
+            anchor = _anchor_decoder.decode(item.anchors[0].extra)[0]
+        except (msgspec.DecodeError, IndexError) as e:
+            print(f"解析失败: {str(e)}")
+            continue
+        if anchor.extra is None:
+            continue
+        title, img = anchor.title, anchor.img
+        try:
+            inner = _inner_decoder.decode(anchor.extra)
+            if inner.title is not msgspec.UNSET:
+                title = inner.title
+            if inner.img is not msgspec.UNSET:
+                img = inner.img
+        except (msgspec.DecodeError, TypeError) as e:
+            print(f"解析 inner extra 失败: {str(e)}")
+        videos.append(_video_record(item.author.uniqueId, item.id, item.createTime, item.desc,
+                                    anchor.id, title, anchor.keyword, img))
+    return len(items), videos
+
+
+def parse_item_list(body, backend=None):
+    """
+    解析 item_list 响应体
+    :param body: 响应体 bytes 或 str
+    :param backend: 指定 fast_json 后端，默认使用 fast_json.BACKEND
+    :return: (itemList 项数, VideoRecord 列表)，响应中没有 itemList 时返回 None；响应体不是 JSON 时抛出 ValueError
+    """
+    backend = backend or fast_json.BACKEND
+    if backend == "msgspec":
+        return _parse_with_structs(body)
+    return _parse_with_dicts(body, fast_json.make_loads(backend))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务进度跟踪：为 webhook 触发的任务提供实时计数器
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class JobProgress:
+    def __init__(self, job, job_id=None):
+        """
+        单个任务的进度计数器（线程安全，可在线程池和事件循环中同时更新）
+        :param job: 任务名称，如 monitor / product
+        :param job_id: 任务ID，默认自动生成
+        """
+        self.job = job
+        self.job_id = job_id or uuid.uuid4().hex
+        self.status = "running"
+        self.phase = ""
+        self.error = None
+        self.total = 0  # 计划处理的条目数（handle 或产品）
+        self.processed = 0  # 已处理的条目数
+        self.items = 0  # 解析出的子项数量（如视频）
+        self.writes = 0  # 多维表格写入成功次数
+        self.failures = 0  # 失败次数（处理失败或写入失败）
+        self.skipped = 0  # 字段未变化而跳过的写入次数
+        self.requeued = 0  # 遇到安全验证后放回队列的次数
+        self.cache_hits = 0  # 命中产品缓存、未访问产品页的次数
+        self.started_at = time.time()
+        self.updated_at = self.started_at
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def set_phase(self, phase):
+        """
+        设置当前阶段，如 读取handle / 抓取 / 删除重复
+        """
+        with self._lock:
+            self.phase = phase
+            self.updated_at = time.time()
+
+    def add_total(self, n):
+        """
+        增加计划处理的条目数
+        """
+        with self._lock:
+            self.total += n
+            self.updated_at = time.time()
+
+    def incr(self, name, n=1):
+        """
+        增加指定计数器
+        :param name: processed / items / writes / failures / skipped / requeued / cache_hits
+        :param n: 增量
+        """
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+            self.updated_at = time.time()
+
+    def finish(self, status="success", error=None):
+        """
+        标记任务结束
+        """
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.updated_at = self.finished_at
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def snapshot(self):
+        """
+        返回当前进度快照，包含吞吐量（条目/秒）和预计剩余时间（秒）
+        """
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = max(end - self.started_at, 1e-6)
+            throughput = self.processed / elapsed
+            eta = None
+            if not self.done and self.total and throughput > 0:
+                eta = max(self.total - self.processed, 0) / throughput
+            return {
+                "job_id": self.job_id,
+                "job": self.job,
+                "status": self.status,
+                "phase": self.phase,
+                "error": self.error,
+                "total": self.total,
+                "processed": self.processed,
+                "items": self.items,
+                "writes": self.writes,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "requeued": self.requeued,
+                "cache_hits": self.cache_hits,
+                "elapsed": round(elapsed, 3),
+                "throughput": round(throughput, 4),
+                "eta": round(eta, 1) if eta is not None else None,
+                "started_at": self.started_at,
+                "updated_at": self.updated_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobRegistry:
+    def __init__(self, max_jobs=100):
+        """
+        保存最近的任务进度，超过上限时丢弃最早的任务
+        :param max_jobs: 保留的任务数量上限
+        """
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        progress = JobProgress(job)
+        with self._lock:
+            self._jobs[progress.job_id] = progress
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return progress
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级 Prometheus 指标：计数器、直方图和文本格式输出
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 页面导航、任务等耗时较长的操作使用的分桶
+SLOW_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+# 图片大小分桶（字节）
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    # 标签值按 Prometheus 文本格式转义反斜杠、双引号和换行
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def get_count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["count"] if state else 0
+
+    def get_sum(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["sum"] if state else 0.0
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        记录 with 代码块的耗时（秒）
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """
+        按 Prometheus 文本格式输出所有指标
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def timed(histogram, counter=None, **labels):
+    """
+    装饰器：记录函数（同步或异步）的耗时，counter 可选，按 status=success/error 计数
+    """
+    def decorator(func):
+        def record(start, status):
+            histogram.observe(time.perf_counter() - start, **labels)
+            if counter is not None:
+                counter.inc(status=status, **labels)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                status = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    status = "success"
+                    return result
+                finally:
+                    record(start, status)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = func(*args, **kwargs)
+                status = "success"
+                return result
+            finally:
+                record(start, status)
+        return wrapper
+    return decorator
+
+
+# 飞书 API
+FEISHU_REQUESTS = Counter("feishu_api_requests_total", "飞书 API 请求次数", ["method", "status"])
+FEISHU_LATENCY = Histogram("feishu_api_request_seconds", "飞书 API 请求耗时", ["method"])
+FEISHU_RETRIES = Counter("feishu_api_retries_total", "飞书 API 重试次数", ["method"])
+
+# 重试和熔断，target 为 feishu / tiktok_pdp / tiktok_account / cdn
+RETRIES = Counter("retries_total", "重试次数", ["target"])
+CIRCUIT_OPENED = Counter("circuit_breaker_opened_total", "熔断器打开次数", ["target"])
+CIRCUIT_REJECTED = Counter("circuit_breaker_rejected_total", "熔断期间被拒绝的调用次数", ["target"])
+
+# 安全验证：暂停所有产品页面的次数和暂停总时长
+SECURITY_CHECKS = Counter("security_check_pauses_total", "遇到安全验证后暂停所有页面的次数")
+SECURITY_CHECK_SECONDS = Counter("security_check_pause_seconds_total", "安全验证暂停的总秒数")
+
+# 自适应并发控制的决策次数，action 为 increase / decrease / hold
+CONCURRENCY_DECISIONS = Counter("concurrency_decisions_total", "自适应并发控制决策次数", ["job", "action"])
+
+# 分片任务，event 为 claimed / renewed / completed / failed / expired
+SHARD_EVENTS = Counter("shard_events_total", "分片租约事件次数", ["kind", "event"])
+
+# Playwright 页面阶段：navigation / security_check / extraction
+PLAYWRIGHT_PHASE = Histogram("playwright_phase_seconds", "Playwright 页面各阶段耗时", ["job", "phase"], buckets=SLOW_BUCKETS)
+
+# 图片下载
+IMAGE_DOWNLOADS = Counter("image_downloads_total", "图片下载次数", ["status"])
+IMAGE_DOWNLOAD_BYTES = Counter("image_download_bytes_total", "图片下载字节数")
+IMAGE_DOWNLOAD_SIZE = Histogram("image_download_size_bytes", "单张图片大小", buckets=SIZE_BUCKETS)
+IMAGE_DOWNLOAD_LATENCY = Histogram("image_download_seconds", "单张图片下载耗时", buckets=SLOW_BUCKETS)
+
+# 任务
+JOB_DURATION = Histogram("job_duration_seconds", "任务总耗时", ["job"], buckets=SLOW_BUCKETS)
+JOB_RUNS = Counter("job_runs_total", "任务运行次数", ["job", "status"])
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟的飞书多维表格服务，实现 FeishuSheet 用到的接口，
+支持可配置的延迟、限流和错误注入，用于离线测试和性能压测
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MOCK_TOKEN = "t-mock-tenant-access-token"
+# 离线测试默认使用的多维表格，表格在首次写入时自动创建
+MOCK_APP_TOKEN = "app_mock"
+MOCK_TABLE_ID = "tbl_mock"
+
+# 飞书错误码
+CODE_INVALID_TOKEN = 99991663
+CODE_RATE_LIMITED = 99991400
+CODE_RECORD_NOT_FOUND = 1254043
+CODE_INTERNAL_ERROR = 1254290
+
+_RECORDS_PATH = re.compile(r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)(/views/[^/]+)?/records(?:/([^/]+))?$")
+
+
+def _cell_texts(value):
+    """
+    将单元格值统一转换为文本列表，兼容字符串、数字和 [{"text": ...}] 格式
+    """
+    if value is None or value == "" or value == []:
+        return []
+    if isinstance(value, list):
+        texts = []
+        for item in value:
+            if isinstance(item, dict):
+                texts.append(str(item.get("text", item.get("name", ""))))
+            else:
+                texts.append(str(item))
+        return texts
+    if isinstance(value, dict):
+        return [str(value.get("text", value.get("name", "")))]
+    return [str(value)]
+
+
+def _to_number(value):
+    if isinstance(value, list) and len(value) == 2 and value[0] == "ExactDate":
+        value = value[1]
+    elif isinstance(value, list) and value:
+        value = value[0]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def match_condition(fields, condition):
+    """
+    判断记录是否满足单个过滤条件
+    """
+    texts = _cell_texts(fields.get(condition.get("field_name")))
+    operator = condition.get("operator")
+    values = [str(v) for v in condition.get("value") or []]
+    if operator == "isEmpty":
+        return not texts
+    if operator == "isNotEmpty":
+        return bool(texts)
+    if operator == "is":
+        return bool(values) and " ".join(texts) == values[0]
+    if operator == "isNot":
+        return not values or " ".join(texts) != values[0]
+    if operator == "contains":
+        return any(v in t for v in values for t in texts)
+    if operator == "doesNotContain":
+        return not any(v in t for v in values for t in texts)
+    if operator == "in":
+        return any(t in values for t in texts)
+    if operator in ("isGreater", "isGreaterEqual", "isLess", "isLessEqual"):
+        left = _to_number(fields.get(condition.get("field_name")))
+        right = _to_number(condition.get("value"))
+        if left is None or right is None:
+            return False
+        return {
+            "isGreater": left > right,
+            "isGreaterEqual": left >= right,
+            "isLess": left < right,
+            "isLessEqual": left <= right,
+        }[operator]
+    raise ValueError(f"不支持的操作符: {operator}")
+
+
+def match_filter(fields, filter_spec):
+    """
+    判断记录是否满足过滤条件，支持 conjunction/conditions 以及 children 嵌套
+    """
+    if not filter_spec:
+        return True
+    results = [match_condition(fields, c) for c in filter_spec.get("conditions") or []]
+    results.extend(match_filter(fields, child) for child in filter_spec.get("children") or [])
+    if not results:
+        return True
+    if filter_spec.get("conjunction", "and") == "or":
+        return any(results)
+    return all(results)
+
+
+class MockBitableServer:
+    def __init__(self, latency=0.0, rate_limit=None, error_rate=0.0, seed=None, host="127.0.0.1", port=0):
+        """
+        :param latency: 每个请求的固定延迟（秒）
+        :param rate_limit: 每秒允许的请求数，超过时返回 HTTP 429 和限流错误码，None 表示不限流
+        :param error_rate: 随机返回 HTTP 500 的概率
+        :param seed: 随机数种子，便于复现错误注入
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.tables = defaultdict(OrderedDict)
+        # 每张表的修改版本号，以及按 (表, 过滤条件, 排序) 缓存的查询结果，翻页时不必每页重新全表过滤
+        self._versions = defaultdict(int)
+        self._query_cache = {}
+        self.calls = defaultdict(int)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._random = random.Random(seed)
+        self._injected_errors = []
+        self._lost_responses = 0
+        # 创建接口的 client_token -> 第一次请求的响应，相同 token 重复请求时直接返回，不再创建
+        self._client_tokens = {}
+        self._window_start = 0.0
+        self._window_count = 0
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-bitable", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        """
+        传给 FeishuSheet(base_url=...) 的 API 根地址
+        """
+        return f"http://{self.host}:{self.port}/open-apis"
+
+    # ---------- 数据与统计 ----------
+
+    def _new_record_id(self):
+        with self._lock:
+            self._next_id += 1
+            return f"rec{self._next_id:08d}"
+
+    def add_records(self, app_token, table_id, fields_list):
+        """
+        直接写入测试数据，返回 record_id 列表
+        """
+        ids = []
+        with self._lock:
+            table = self.tables[(app_token, table_id)]
+            for fields in fields_list:
+                record_id = self._new_record_id()
+                table[record_id] = {"record_id": record_id, "fields": dict(fields), "created_time": int(time.time() * 1000)}
+                ids.append(record_id)
+            self._versions[(app_token, table_id)] += 1
+        return ids
+
+    def records(self, app_token, table_id):
+        with self._lock:
+            return [dict(r, fields=dict(r["fields"])) for r in self.tables[(app_token, table_id)].values()]
+
+    def inject_errors(self, count=1, status=500, code=CODE_INTERNAL_ERROR):
+        """
+        让接下来的 count 个请求返回指定错误
+        """
+        with self._lock:
+            self._injected_errors.extend([(status, code)] * count)
+
+    def lose_responses(self, count=1):
+        """
+        让接下来的 count 个写入请求正常执行，但返回 HTTP 500，模拟写入成功后响应超时丢失
+        """
+        with self._lock:
+            self._lost_responses += count
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+    # ---------- 请求处理 ----------
+
+    def _check_limits(self):
+        """
+        返回 (HTTP 状态码, 响应体)，无需拦截时返回 None
+        """
+        with self._lock:
+            if self._injected_errors:
+                status, code = self._injected_errors.pop(0)
+                return status, {"code": code, "msg": "injected error"}
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_count = 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit:
+                    return 429, {"code": CODE_RATE_LIMITED, "msg": "request trigger frequency limit"}
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500, {"code": CODE_INTERNAL_ERROR, "msg": "internal error"}
+        return None
+
+    def handle(self, method, path, query, headers, body):
+        """
+        处理单个请求，返回 (HTTP 状态码, 响应 JSON)
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        if path == "/open-apis/auth/v3/tenant_access_token/internal/":
+            self._count("tenant_access_token")
+            limited = self._check_limits()
+            if limited:
+                return limited
+            if not body.get("app_id") or not body.get("app_secret"):
+                return 400, {"code": 10003, "msg": "invalid param"}
+            return 200, {"code": 0, "msg": "ok", "tenant_access_token": MOCK_TOKEN, "expire": 7200}
+
+        match = _RECORDS_PATH.match(path)
+        if not match:
+            return 404, {"code": 404, "msg": "not found"}
+        app_token, table_id, view, tail = match.groups()
+
+        if headers.get("Authorization") != f"Bearer {MOCK_TOKEN}":
+            self._count("unauthorized")
+            return 200, {"code": CODE_INVALID_TOKEN, "msg": "Invalid access token for authorization"}
+
+        if method == "GET" and tail is None:
+            endpoint = "view_records" if view else "list_records"
+            return self._guarded(endpoint, self._list, app_token, table_id, query, None)
+        if method == "POST" and tail == "search":
+            return self._guarded("search_records", self._list, app_token, table_id, query, body)
+        if method == "POST" and tail == "batch_delete":
+            return self._guarded("batch_delete", self._batch_delete, app_token, table_id, body)
+        if method == "POST" and tail == "batch_create":
+            return self._guarded("batch_create", self._idempotent, self._batch_create, app_token, table_id, query, body)
+        if method == "POST" and tail == "batch_update":
+            return self._guarded("batch_update", self._batch_update, app_token, table_id, body)
+        if method == "POST" and tail is None:
+            return self._guarded("create_record", self._idempotent, self._create, app_token, table_id, query, body)
+        if method == "PUT" and tail:
+            return self._guarded("update_record", self._update, app_token, table_id, tail, body)
+        if method == "DELETE" and tail:
+            return self._guarded("delete_record", self._delete, app_token, table_id, tail)
+        return 404, {"code": 404, "msg": "not found"}
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def _guarded(self, endpoint, func, *args):
+        self._count(endpoint)
+        limited = self._check_limits()
+        if limited:
+            return limited
+        result = func(*args)
+        with self._lock:
+            if self._lost_responses and endpoint not in ("list_records", "view_records", "search_records"):
+                self._lost_responses -= 1
+                return 500, {"code": CODE_INTERNAL_ERROR, "msg": "response lost"}
+        return 200, result
+
+    def _idempotent(self, func, app_token, table_id, query, body):
+        """
+        创建接口的幂等处理：带 client_token 的请求第一次成功后记住响应，重复请求返回同一结果
+        """
+        client_token = (query.get("client_token") or [""])[0]
+        key = (app_token, table_id, func.__name__, client_token)
+        with self._lock:
+            if client_token and key in self._client_tokens:
+                self.calls["idempotent_replays"] += 1
+                return self._client_tokens[key]
+            result = func(app_token, table_id, body)
+            if client_token and result.get("code") == 0:
+                self._client_tokens[key] = result
+            return result
+
+    @staticmethod
+    def _visible_fields(fields, field_names=None):
+        # 飞书不会返回空单元格；指定 field_names 时只返回这些字段
+        return {k: v for k, v in fields.items()
+                if v not in (None, "", []) and (field_names is None or k in field_names)}
+
+    @staticmethod
+    def _projection_and_sort(query, body):
+        """
+        列表接口从查询参数读取 JSON 字符串，查询接口从请求体读取
+        返回 (field_names 或 None, [(字段名, 是否降序)])
+        """
+        if body is not None:
+            field_names = body.get("field_names")
+            sort = [(s.get("field_name"), bool(s.get("desc"))) for s in body.get("sort") or []]
+        else:
+            field_names = json.loads(query["field_names"][0]) if query.get("field_names") else None
+            sort = []
+            for spec in json.loads(query["sort"][0]) if query.get("sort") else []:
+                name, _, direction = spec.rpartition(" ")
+                if direction not in ("ASC", "DESC"):
+                    name, direction = spec, "ASC"
+                sort.append((name, direction == "DESC"))
+        return (set(field_names) if field_names else None), sort
+
+    @staticmethod
+    def _sort_key(value):
+        # 空值排在最前，数字按数值比较，其余按文本比较
+        number = _to_number(value)
+        if number is not None:
+            return (1, number, "")
+        texts = _cell_texts(value)
+        return (2 if texts else 0, 0, " ".join(texts))
+
+    def _list(self, app_token, table_id, query, body):
+        page_size = min(int(query.get("page_size", ["20"])[0] or 20), 500)
+        offset = int(query.get("page_token", ["0"])[0] or 0)
+        filter_spec = (body or {}).get("filter")
+        field_names, sort = self._projection_and_sort(query, body)
+        with self._lock:
+            records = self._query(app_token, table_id, filter_spec, sort)
+            page = records[offset:offset + page_size]
+            items = [{"record_id": r["record_id"], "fields": self._visible_fields(r["fields"], field_names)} for r in page]
+        has_more = offset + page_size < len(records)
+        data = {"items": items, "has_more": has_more, "total": len(records)}
+        if has_more:
+            data["page_token"] = str(offset + page_size)
+        return {"code": 0, "msg": "success", "data": data}
+
+    def _query(self, app_token, table_id, filter_spec, sort):
+        """
+        过滤并排序，结果按表的版本号缓存，表被修改后失效
+        """
+        table_key = (app_token, table_id)
+        cache_key = (table_key, json.dumps(filter_spec, sort_keys=True), tuple(sort))
+        version = self._versions[table_key]
+        cached = self._query_cache.get(cache_key)
+        if cached and cached[0] == version:
+            return cached[1]
+        records = [r for r in self.tables[table_key].values() if match_filter(r["fields"], filter_spec)]
+        # 多字段排序：从最后一个字段开始依次稳定排序
+        for name, desc in reversed(sort):
+            records.sort(key=lambda r: self._sort_key(r["fields"].get(name)), reverse=desc)
+        self._query_cache[cache_key] = (version, records)
+        return records
+
+    def _create(self, app_token, table_id, body):
+        record_id = self.add_records(app_token, table_id, [body.get("fields") or {}])[0]
+        with self._lock:
+            record = self.tables[(app_token, table_id)][record_id]
+            return {"code": 0, "msg": "success", "data": {"record": {"record_id": record_id, "fields": dict(record["fields"])}}}
+
+    def _update(self, app_token, table_id, record_id, body):
+        with self._lock:
+            record = self.tables[(app_token, table_id)].get(record_id)
+            if record is None:
+                return {"code": CODE_RECORD_NOT_FOUND, "msg": "RecordIdNotFound"}
+            record["fields"].update(body.get("fields") or {})
+            self._versions[(app_token, table_id)] += 1
+            return {"code": 0, "msg": "success", "data": {"record": {"record_id": record_id, "fields": dict(record["fields"])}}}
+
+    def _delete(self, app_token, table_id, record_id):
+        with self._lock:
+            if self.tables[(app_token, table_id)].pop(record_id, None) is None:
+                return {"code": CODE_RECORD_NOT_FOUND, "msg": "RecordIdNotFound"}
+            self._versions[(app_token, table_id)] += 1
+        return {"code": 0, "msg": "success", "data": {"deleted": True, "record_id": record_id}}
+
+    def _batch_delete(self, app_token, table_id, body):
+        record_ids = body.get("records") or []
+        if len(record_ids) > 500:
+            return {"code": 1254104, "msg": "records exceed limit 500"}
+        results = []
+        with self._lock:
+            table = self.tables[(app_token, table_id)]
+            for record_id in record_ids:
+                deleted = table.pop(record_id, None) is not None
+                results.append({"deleted": deleted, "record_id": record_id})
+            self._versions[(app_token, table_id)] += 1
+        return {"code": 0, "msg": "success", "data": {"records": results}}
+
+    def _batch_create(self, app_token, table_id, body):
+        creates = body.get("records") or []
+        if len(creates) > 1000:
+            return {"code": 1254104, "msg": "records exceed limit 1000"}
+        record_ids = self.add_records(app_token, table_id, [c.get("fields") or {} for c in creates])
+        with self._lock:
+            table = self.tables[(app_token, table_id)]
+            records = [{"record_id": record_id, "fields": dict(table[record_id]["fields"])} for record_id in record_ids]
+        return {"code": 0, "msg": "success", "data": {"records": records}}
+
+    def _batch_update(self, app_token, table_id, body):
+        updates = body.get("records") or []
+        if len(updates) > 1000:
+            return {"code": 1254104, "msg": "records exceed limit 1000"}
+        with self._lock:
+            table = self.tables[(app_token, table_id)]
+            # 与线上一致：任一记录不存在时整批失败
+            if any(u.get("record_id") not in table for u in updates):
+                return {"code": CODE_RECORD_NOT_FOUND, "msg": "RecordIdNotFound"}
+            records = []
+            for u in updates:
+                record = table[u["record_id"]]
+                record["fields"].update(u.get("fields") or {})
+                records.append({"record_id": u["record_id"], "fields": dict(record["fields"])})
+            self._versions[(app_token, table_id)] += 1
+        return {"code": 0, "msg": "success", "data": {"records": records}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写入，关闭 Nagle 避免与延迟确认叠加产生约 40ms 的额外等待
+    disable_nagle_algorithm = True
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            body = {}
+        status, payload = self.mock.handle(method, parsed.path, parse_qs(parsed.query), self.headers, body)
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        with self.mock._lock:
+            self.mock.bytes_in += len(raw)
+            self.mock.bytes_out += len(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地模拟飞书多维表格服务")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock = MockBitableServer(latency=args.latency, rate_limit=args.rate_limit, error_rate=args.error_rate, port=args.port)
+    mock.start()
+    print(f"模拟服务已启动: {mock.base_url}，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫数据模型：监控任务的视频记录和捕获的请求/响应，产品任务的产品记录、图片和处理结果
+使用 __slots__ 数据类代替字典，降低大批量抓取时每条数据的内存占用，
+与飞书表格字段的对应关系集中在 to_feishu_fields 中
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+
+@dataclass(slots=True)
+class VideoRecord:
+    """
+    item_list 中的一个带货视频，对应视频表的一行
+    """
+    handle: str = ""
+    video_id: str = ""
+    video_create_time: str = ""
+    video_title: str = ""
+    product_id: str = ""
+    product_title: str = ""
+    product_keyword: str = ""
+    product_imgs: str = ""
+
+    def to_feishu_fields(self):
+        return {
+            "handle": self.handle,
+            "video_id": self.video_id,
+            "video_create_time": self.video_create_time,
+            "video_title": self.video_title,
+            "product_id": self.product_id,
+            "product_title": self.product_title,
+            "product_keyword": self.product_keyword,
+            "product_imgs": self.product_imgs,
+        }
+
+
+@dataclass(slots=True)
+class CapturedRequest:
+    """
+    监控任务捕获的 item_list 请求，不保存完整请求头
+    """
+    url: str
+    method: str
+    timestamp: float
+    post_data: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CapturedResponse:
+    """
+    监控任务捕获的 item_list 响应，只保留 Content-Type 响应头
+    """
+    url: str
+    status: int
+    status_text: str
+    content_type: str
+    timestamp: float
+
+
+@dataclass(slots=True)
+class ImageRef:
+    """
+    产品详情页中的一张图片
+    type: main 为主图，sku 为SKU图片
+    """
+    url: str
+    title: str = "main_image"
+    type: str = "main"
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """
+    从产品详情页抓取到的产品信息
+    """
+    product_id: str
+    product_title: str = ""
+    product_description: str = ""
+    images: List[ImageRef] = field(default_factory=list)
+
+    def has_image(self, url):
+        return any(image.url == url for image in self.images)
+
+    def image_urls_text(self):
+        """
+        图片地址按行拼接，写入 product_source_imgs
+        """
+        return "\n".join(image.url for image in self.images)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由 to_dict 的结果还原，用于读取产品缓存
+        """
+        return cls(
+            product_id=data["product_id"],
+            product_title=data.get("product_title", ""),
+            product_description=data.get("product_description", ""),
+            images=[ImageRef(**image) for image in data.get("images", [])],
+        )
+
+    def to_feishu_fields(self):
+        return {
+            "product_desc": self.product_description,
+            "product_source_imgs": self.image_urls_text(),
+        }
+
+
+@dataclass(slots=True)
+class ScrapeResult:
+    """
+    一条待处理记录的处理结果
+    status: success 找到图片，failed 未找到图片或页面获取失败，error 处理时出现异常
+    """
+    product_id: str
+    record_id: str
+    status: str
+    product: Optional[ProductRecord] = None
+    error: Optional[str] = None
+
+    @property
+    def count(self):
+        return len(self.product.images) if self.product else 0
+
+    def to_dict(self):
+        """
+        转换为字典，用于 JSON 输出
+        """
+        return asdict(self)
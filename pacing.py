@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面导航节奏控制：按域名限制两次导航之间的最小间隔并加入随机抖动，
+只作用于 page.goto 等导航操作，其余 Playwright 调用不受影响
+"""
+
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+# 各任务的默认节奏（秒），可在 config.json 的 pacing 中按任务覆盖
+DEFAULT_PACING = {
+    "monitor": {"min_interval": 2.0, "jitter": 2.0},
+    "product": {"min_interval": 1.0, "jitter": 1.0},
+}
+
+
+class PacingScheduler:
+    def __init__(self, min_interval=0.0, jitter=0.0, domains=None):
+        """
+        :param min_interval: 同一域名两次导航之间的最小间隔（秒）
+        :param jitter: 在最小间隔之上追加的随机抖动上限（秒）
+        :param domains: 按域名覆盖的配置，如 {"www.tiktok.com": {"min_interval": 3, "jitter": 2}}
+        """
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.domains = domains or {}
+        self.navigations = 0
+        self.wait_seconds = 0.0
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, job):
+        """
+        根据 config.json 的 pacing.<job> 创建调度器，未配置的项使用 DEFAULT_PACING
+        """
+        cfg = dict(DEFAULT_PACING.get(job, {}))
+        cfg.update((config or {}).get("pacing", {}).get(job) or {})
+        return cls(
+            min_interval=cfg.get("min_interval", 0.0),
+            jitter=cfg.get("jitter", 0.0),
+            domains=cfg.get("domains"),
+        )
+
+    def _reserve(self, url):
+        """
+        为本次导航预留时间槽，返回需要等待的秒数
+        多个线程/协程同时导航同一域名时按预留顺序依次放行
+        """
+        domain = urlparse(url).netloc
+        cfg = self.domains.get(domain, {})
+        interval = cfg.get("min_interval", self.min_interval)
+        jitter = cfg.get("jitter", self.jitter)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(domain, now))
+            self._next_allowed[domain] = slot + interval + random.uniform(0, jitter)
+            delay = slot - now
+            self.navigations += 1
+            self.wait_seconds += delay
+        return delay
+
+    def wait(self, url):
+        """
+        同步等待直到允许导航到 url
+        :return: 实际等待的秒数
+        """
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def async_wait(self, url):
+        """
+        异步等待直到允许导航到 url
+        :return: 实际等待的秒数
+        """
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {"navigations": self.navigations, "wait_seconds": round(self.wait_seconds, 3)}
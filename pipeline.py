@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控→产品流水线：账号监控写入的新视频记录带有 product_id 时，立即放入产品抓取队列，
+产品抓取与账号抓取同时进行，新记录在发现后几分钟内就能补全产品图片，
+不再等整个监控任务结束后由产品任务重新查询 product_source_imgs 为空的记录。
+
+说明：
+- 产品抓取在后台线程中运行 scrape_products_concurrent 的流式模式，监控任务在事件循环中继续抓取账号
+- 同一批写入中重复的 product_id 合并为一次页面访问，跨批次重复的产品由产品缓存避免再次访问
+- 开始时先放入表格中 product_source_imgs 仍为空的记录（之前抓取失败或本次运行前已有的行），不需要再单独运行产品任务
+- 重复记录在产品更新全部写完后才删除：批量更新以批为单位，其中一条 record_id 已被删除会让整批失败
+"""
+
+import asyncio
+import functools
+import json
+import queue
+import threading
+import time
+
+from concurrency import AdaptiveConcurrency
+from dead_letter import DeadLetterQueue
+from feishu_sheet import FeishuSheet
+from pacing import PacingScheduler
+from product_cache import ProductCache
+from tiktok_account_monitor import delete_duplicate_rows, update_titkok_video
+from tiktok_pid_to_product import TikTokProductScraperPlaywright, get_empty_product_source_imgs_records
+
+
+class ProductPipeline:
+    def __init__(self, scraper, feishu_sheet, app_token, table_id, batch_size=10, progress=None):
+        """
+        :param scraper: TikTokProductScraperPlaywright实例
+        :param batch_size: 批量更新多维表格的记录数，没有排队的产品时不等凑满直接写出
+        :param progress: JobProgress实例，可选，上报产品抓取进度
+        """
+        self.scraper = scraper
+        self.feishu_sheet = feishu_sheet
+        self.app_token = app_token
+        self.table_id = table_id
+        self.batch_size = batch_size
+        self.progress = progress
+        self.queue = queue.Queue()
+        self.submitted = 0
+        self.results = []
+        self.error = None
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="product-pipeline", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        if self.progress:
+            self.progress.set_phase("抓取产品")
+        try:
+            self.results = self.scraper.scrape_products_concurrent(
+                [], self.feishu_sheet, self.app_token, self.table_id,
+                progress=self.progress, batch_size=self.batch_size, incoming=self.queue)
+        except Exception as e:
+            print(f"[流水线] 产品抓取出错: {str(e)}")
+            self.error = str(e)
+
+    def submit(self, tasks):
+        """
+        提交待抓取的记录，每个字典包含 product_id 和 record_id（可带 fields 当前值），只做入队不阻塞
+        """
+        for task in tasks:
+            self.queue.put(task)
+            self.submitted += 1
+
+    def on_created(self, fields_list, record_ids):
+        """
+        写入缓冲的回调：新建的视频记录中带 product_id 的交给产品抓取，在事件循环中调用
+        """
+        self.submit({"product_id": str(fields["product_id"]), "record_id": record_id}
+                    for fields, record_id in zip(fields_list, record_ids)
+                    if fields.get("product_id") and record_id)
+
+    def close(self):
+        """
+        通知输入结束并等待已提交的产品处理完成
+        :return: ScrapeResult 列表
+        """
+        if self._thread is None:
+            return self.results
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+        print(f"[流水线] 提交产品记录 {self.submitted} 条，完成 {len(self.results)} 条，"
+              f"耗时 {time.perf_counter() - self._started_at:.1f} 秒")
+        return self.results
+
+
+async def run_pipeline(progress=None, product_progress=None, config=None, feishu_sheet=None, feishu_sheet_r=None, scraper=None,
+                       cdp_endpoint=None, seed=True):
+    """
+    运行监控任务，同时把新发现的产品交给产品抓取，两者都结束后返回
+    :param progress: JobProgress实例，可选，上报监控任务进度
+    :param product_progress: JobProgress实例，可选，上报产品抓取进度，由调用方负责结束
+    :param config: 已加载的配置，可选，为空时读取config.json
+    :param feishu_sheet / feishu_sheet_r: 共享的写入/读取用 FeishuSheet 实例，可选
+    :param scraper: 共享的TikTokProductScraperPlaywright实例，可选，传入时任务结束后不关闭
+    :param cdp_endpoint: 常驻浏览器服务的 CDP 地址，可选，监控和产品抓取共用
+    :param seed: 是否先放入表格中 product_source_imgs 为空的记录，重试之前失败的行和本次运行前已有的行
+    :return: 产品抓取的 ScrapeResult 列表，产品抓取出错时抛出 RuntimeError
+    """
+    if config is None:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    if feishu_sheet is None:
+        feishu_cfg = config.get('feishu', {})
+        feishu_sheet = FeishuSheet(feishu_cfg.get('app_id'), feishu_cfg.get('app_secret'),
+                                   dead_letters=DeadLetterQueue.from_config(config))
+    bitable_cfg = config.get('bitable', {})
+    app_token = bitable_cfg.get('app_token')
+    table_id = bitable_cfg.get('table_id')
+
+    owns_scraper = scraper is None
+    if owns_scraper:
+        scraper = TikTokProductScraperPlaywright(cdp_endpoint=cdp_endpoint)
+    if scraper.pacer is None:
+        scraper.pacer = PacingScheduler.from_config(config, "product")
+    if scraper.cache is None:
+        scraper.cache = ProductCache.from_config(config)
+    if scraper.concurrency is None and config.get('concurrency', {}).get('product', {}).get('enabled'):
+        scraper.concurrency = AdaptiveConcurrency.from_config(config, "product")
+
+    pipeline = ProductPipeline(scraper, feishu_sheet, app_token, table_id,
+                               batch_size=config.get('product', {}).get('write_batch_size', 10),
+                               progress=product_progress).start()
+    loop = asyncio.get_event_loop()
+    try:
+        if seed:
+            pipeline.submit(await loop.run_in_executor(None, functools.partial(
+                get_empty_product_source_imgs_records, config=config, feishu_sheet=feishu_sheet)))
+        await update_titkok_video(
+            progress=progress,
+            config=config,
+            feishu_sheet=feishu_sheet,
+            feishu_sheet_r=feishu_sheet_r,
+            cdp_endpoint=cdp_endpoint,
+            delete_duplicates=False,
+            on_created=pipeline.on_created,
+        )
+    finally:
+        # 监控结束（或出错）后等待已提交的产品处理完，不阻塞事件循环
+        results = await loop.run_in_executor(None, pipeline.close)
+        if owns_scraper:
+            scraper.close()
+    # 产品更新全部写完后再删除重复记录
+    await loop.run_in_executor(None, delete_duplicate_rows, feishu_sheet, app_token, table_id, progress)
+    if pipeline.error:
+        raise RuntimeError(f"产品抓取出错: {pipeline.error}")
+    return results
+
+
+if __name__ == "__main__":
+
+    asyncio.run(run_pipeline())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程抓取：把待处理的产品列表分片交给多个工作进程，每个进程启动自己的浏览器并用线程池处理分片，
+抓取结果通过队列逐条发回主进程，由主进程统一按差异批量写入多维表格。
+结果解析、图片提取等 Python 代码分散到多个 CPU 核上执行，不再受单个进程的 GIL 限制。
+
+说明：
+- 工作进程使用 spawn 方式启动（Playwright 不支持 fork），scraper 的类和参数需要可以 pickle
+- 导航节奏按进程数放大每个进程的最小间隔，各进程合计的访问频率与单进程相同
+- 自适应并发：主进程控制器的初始并发数和上下限按进程数平均分给各进程，各进程按自己的页面指标独立调整；
+  多维表格写入在主进程进行，写入错误率不参与工作进程的决策
+- 产品缓存：各进程按同样的参数打开自己的 SQLite 连接
+- 安全验证协调和熔断器在各进程内独立生效
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+
+from concurrency import AdaptiveConcurrency
+from models import ScrapeResult
+from pacing import PacingScheduler
+from product_cache import ProductCache
+from product_writes import ProductUpdateBatcher
+from tiktok_pid_to_product import group_by_product
+
+
+def shard_tasks(tasks, processes):
+    """
+    按顺序轮流分配，各分片数量相差不超过 1
+    """
+    return [shard for shard in (tasks[i::processes] for i in range(processes)) if shard]
+
+
+def _run_shard(index, scraper_class, settings, pacing, cache, concurrency, shard, results):
+    """
+    工作进程入口：处理一个分片，每条结果发回主进程，结束时发送 done，异常时发送 error
+    """
+    scraper = scraper_class(**settings)
+    if pacing is not None:
+        scraper.pacer = PacingScheduler(**pacing)
+    if concurrency is not None:
+        scraper.concurrency = AdaptiveConcurrency(**concurrency)
+    if cache is not None:
+        # SQLite 连接不能跨进程传递，工作进程按同样的参数打开自己的连接
+        scraper.cache = ProductCache(**cache)
+    try:
+        scraper.scrape_products_concurrent(shard, on_result=lambda result: results.put(("result", index, result)))
+        results.put(("done", index, None))
+    except Exception as e:
+        results.put(("error", index, str(e)))
+    finally:
+        scraper.close()
+
+
+def scrape_products_in_processes(scraper, product_ids, feishu_sheet=None, app_token=None, table_id=None, processes=None,
+                                 tabs_per_process=None, batch_size=10, progress=None, fingerprints=None):
+    """
+    多进程批量抓取产品图片并更新多维表格
+    :param scraper: TikTokProductScraperPlaywright实例，工作进程按它的类和参数创建各自的实例
+    :param product_ids: 产品信息字典数组，每个字典包含product_id和record_id
+    :param processes: 工作进程数，默认CPU核数，不超过产品数
+    :param tabs_per_process: 每个进程的并发tab数，默认把scraper.max_tabs平均分给各进程（至少1个）；
+        scraper设置了自适应并发时由各进程的控制器决定，不使用该参数
+    :param batch_size: 批量更新多维表格的记录数
+    :param progress: JobProgress实例，可选
+    :param fingerprints: FingerprintStore实例，可选，跳过字段未变化的记录
+    :return: ScrapeResult 列表
+    """
+    tasks = [item for item in product_ids
+             if isinstance(item, dict) and item.get("product_id") and item.get("record_id")]
+    if not tasks:
+        print("没有找到有效的产品信息")
+        return []
+    # 先按 product_id 合并再分片，同一产品只在一个进程中访问一次
+    units = group_by_product(tasks)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(units)))
+    tabs_per_process = tabs_per_process or max(1, scraper.max_tabs // processes)
+    shards = shard_tasks(units, processes)
+
+    settings = {
+        "headless": scraper.headless,
+        "user_data_dir": scraper.user_data_dir,
+        "profile_name": scraper.profile_name,
+        "max_tabs": tabs_per_process,
+        "cdp_endpoint": scraper.cdp_endpoint,
+        "page_setup": scraper.page_setup,
+        "settle_ms": scraper.settle_ms,
+        "security_wait_ms": scraper.security_wait_ms,
+    }
+    pacing = None
+    if scraper.pacer is not None:
+        pacing = {
+            "min_interval": scraper.pacer.min_interval * len(shards),
+            "jitter": scraper.pacer.jitter,
+            "domains": {domain: dict(cfg, min_interval=cfg.get("min_interval", scraper.pacer.min_interval) * len(shards))
+                        for domain, cfg in scraper.pacer.domains.items()},
+        }
+
+    concurrency = scraper.concurrency.settings(len(shards)) if scraper.concurrency is not None else None
+    if concurrency is not None:
+        tabs_desc = f"每个进程自适应 {concurrency['min_limit']}-{concurrency['max_limit']} 个tab（初始 {concurrency['initial']}）"
+    else:
+        tabs_desc = f"每个进程 {tabs_per_process} 个tab"
+    print(f"\n=== 开始多进程处理 {len(units)} 个产品（{len(tasks)} 条记录）：{len(shards)} 个进程，{tabs_desc} ===")
+    if progress:
+        progress.set_phase("抓取产品")
+        progress.add_total(len(tasks))
+
+    writer = ProductUpdateBatcher(feishu_sheet, app_token, table_id, batch_size, fingerprints, progress)
+    by_record = {record["record_id"]: record for unit in units for record in unit["records"]}
+    pending = [{record["record_id"] for unit in shard for record in unit["records"]} for shard in shards]
+    results = []
+
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    cache = scraper.cache.settings() if scraper.cache is not None else None
+    workers = []
+    for index, shard in enumerate(shards):
+        process = ctx.Process(target=_run_shard, args=(index, type(scraper), settings, pacing, cache, concurrency, shard, result_queue),
+                              name=f"product-shard-{index}", daemon=True)
+        process.start()
+        workers.append(process)
+
+    def handle(result):
+        results.append(result)
+        task = by_record.get(result.record_id, {"record_id": result.record_id})
+        if result.product is not None:
+            if progress:
+                progress.incr("items", len(result.product.images))
+            if writer.enabled:
+                writer.queue(task, result.product.to_feishu_fields())
+        elif progress:
+            progress.incr("failures")
+        if progress:
+            progress.incr("processed")
+
+    start = time.perf_counter()
+    finished = set()
+    try:
+        while len(finished) < len(workers):
+            try:
+                kind, index, payload = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                # 进程异常退出（如浏览器崩溃导致进程被杀）时不会发送 done，分片中未完成的记录记为错误
+                for index, process in enumerate(workers):
+                    if index not in finished and not process.is_alive():
+                        finished.add(index)
+                        print(f"工作进程 {process.name} 异常退出（exitcode={process.exitcode}），"
+                              f"未完成 {len(pending[index])} 条")
+                        for record_id in sorted(pending[index]):
+                            handle(ScrapeResult(by_record[record_id]["product_id"], record_id, "error", error="工作进程异常退出"))
+                        pending[index].clear()
+                continue
+            if kind == "result":
+                pending[index].discard(payload.record_id)
+                handle(payload)
+                continue
+            finished.add(index)
+            if kind == "error":
+                print(f"工作进程 product-shard-{index} 出错: {payload}")
+            # 分片中没有返回结果的记录（如进程内异常）记为错误
+            for record_id in sorted(pending[index]):
+                handle(ScrapeResult(by_record[record_id]["product_id"], record_id, "error", error=payload or "未返回结果"))
+            pending[index].clear()
+    finally:
+        for process in workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        if writer.enabled:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    total_success = sum(1 for r in results if r.status == "success")
+    print("\n=== 多进程处理完成 ===")
+    print(f"总处理记录数: {len(results)}，产品数: {len(units)}，合并重复产品节省页面访问 {len(tasks) - len(units)} 次")
+    print(f"成功: {total_success}，失败: {len(results) - total_success}")
+    print(f"耗时 {elapsed:.1f} 秒，吞吐 {len(results) / max(elapsed, 1e-6):.2f} 个/秒")
+    print(f"多维表格更新: 提交 {writer.stats['sent']} 条，失败 {writer.stats['failed']} 条，未变化跳过 {writer.stats['skipped']} 条")
+    return results
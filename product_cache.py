@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品缓存：按 product_id 把产品详情页的标题、描述和图片列表保存在本地 SQLite 文件中，
+同一产品在有效期内再次出现时直接读取缓存，不再打开浏览器访问产品页。
+超过有效期的条目读取时删除；条目数超过上限时按最近访问时间淘汰最久未使用的条目。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from models import ProductRecord
+
+DEFAULT_PATH = "product_cache.sqlite3"
+
+
+class ProductCache:
+    def __init__(self, path=DEFAULT_PATH, ttl=7 * 24 * 3600, max_entries=50000):
+        """
+        :param path: SQLite 文件路径，为 None 时只保存在内存中
+        :param ttl: 缓存有效期（秒）
+        :param max_entries: 最多保存的产品数，超过后淘汰最久未访问的产品
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # 多个抓取线程共用一个连接，由 _lock 串行访问；多进程各自打开连接，由 SQLite 文件锁协调
+        self._conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "product_id TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS products_accessed_at ON products (accessed_at)")
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        根据 config.json 的 product 部分创建：cache_path、cache_ttl（秒）、cache_max_entries
+        product.cache_enabled 为 false 时返回 None
+        """
+        product_cfg = (config or {}).get("product", {})
+        if not product_cfg.get("cache_enabled", True):
+            return None
+        return cls(
+            path=product_cfg.get("cache_path", DEFAULT_PATH),
+            ttl=product_cfg.get("cache_ttl", 7 * 24 * 3600),
+            max_entries=product_cfg.get("cache_max_entries", 50000),
+        )
+
+    def settings(self):
+        """
+        创建参数，多进程模式下工作进程按同样的参数打开自己的连接
+        """
+        return {"path": self.path, "ttl": self.ttl, "max_entries": self.max_entries}
+
+    def get(self, product_id):
+        """
+        :return: 有效期内的 ProductRecord，没有或已过期时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT data, fetched_at FROM products WHERE product_id = ?",
+                                     (str(product_id),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            data, fetched_at = row
+            with self._conn:
+                if now - fetched_at > self.ttl:
+                    self._conn.execute("DELETE FROM products WHERE product_id = ?", (str(product_id),))
+                    self.expired += 1
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE products SET accessed_at = ? WHERE product_id = ?", (now, str(product_id)))
+            self.hits += 1
+        return ProductRecord.from_dict(json.loads(data))
+
+    def put(self, product):
+        """
+        保存产品，没有图片的结果不缓存（可能是页面没有加载完整）
+        """
+        if not product.images:
+            return
+        now = time.time()
+        data = json.dumps(product.to_dict(), ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products (product_id, data, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (str(product.product_id), data, now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            if count > self.max_entries:
+                evict = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM products WHERE product_id IN "
+                    "(SELECT product_id FROM products ORDER BY accessed_at ASC LIMIT ?)", (evict,))
+                self.evicted += evict
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "expired": self.expired, "evicted": self.evicted}
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品任务的多维表格写入：字段与当前值（或上次写入的指纹）相同时跳过，其余攒够 batch_size 条后批量更新。
+线程池模式和多进程模式共用，多进程模式下只在主进程写入
+"""
+
+import threading
+
+from fingerprints import FingerprintStore, fingerprint
+
+
+class ProductUpdateBatcher:
+    def __init__(self, feishu_sheet, app_token, table_id, batch_size=10, fingerprints=None, progress=None, on_write=None):
+        """
+        :param batch_size: 批量更新多维表格的记录数
+        :param fingerprints: FingerprintStore实例，可选，记录写入指纹，跳过字段未变化的记录
+        :param progress: JobProgress实例，可选，上报 writes/failures/skipped
+        :param on_write: 每批写入后调用 on_write(提交条数, 失败条数)，可选
+        """
+        self.feishu_sheet = feishu_sheet
+        self.app_token = app_token
+        self.table_id = table_id
+        self.batch_size = batch_size
+        self.fingerprints = fingerprints
+        self.progress = progress
+        self.on_write = on_write
+        self.stats = {"sent": 0, "failed": 0, "skipped": 0}
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.feishu_sheet and self.app_token and self.table_id)
+
+    def flush(self, force=False):
+        with self._lock:
+            if not self._pending or (not force and len(self._pending) < self.batch_size):
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+        updated = set(self.feishu_sheet.batch_update_records(self.app_token, self.table_id, batch))
+        print(f"  批量更新多维表格 {len(batch)} 条，成功 {len(updated)} 条")
+        if self.on_write:
+            self.on_write(len(batch), len(batch) - len(updated))
+        for update in batch:
+            ok = update["record_id"] in updated
+            if ok and self.fingerprints is not None:
+                self.fingerprints.mark(FingerprintStore.key(self.app_token, self.table_id, update["record_id"]), update["fields"])
+            if self.progress:
+                self.progress.incr("writes" if ok else "failures")
+        with self._lock:
+            self.stats["sent"] += len(updated)
+            self.stats["failed"] += len(batch) - len(updated)
+
+    def queue(self, task, fields):
+        """
+        字段与表格当前值（或上次写入的指纹）相同时跳过，否则加入批量更新
+        """
+        self.queue_all([task], fields)
+
+    def queue_all(self, tasks, fields):
+        """
+        多条记录写入相同的字段（如同一产品对应的多行），全部加入后再判断是否提交
+        """
+        for task in tasks:
+            current = task.get("fields")
+            if current is not None:
+                unchanged = fingerprint({name: current.get(name) for name in fields}) == fingerprint(fields)
+            else:
+                unchanged = self.fingerprints is not None and self.fingerprints.is_unchanged(
+                    FingerprintStore.key(self.app_token, self.table_id, task["record_id"]), fields)
+            if unchanged:
+                print(f"  记录 {task['record_id']} 字段未变化，跳过更新")
+                with self._lock:
+                    self.stats["skipped"] += 1
+                if self.progress:
+                    self.progress.incr("skipped")
+                continue
+            with self._lock:
+                self._pending.append({"record_id": task["record_id"], "fields": fields})
+        self.flush()
+
+    def close(self):
+        """
+        写出剩余的更新并保存指纹
+        """
+        self.flush(force=True)
+        if self.fingerprints is not None:
+            self.fingerprints.save()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重试、退避和熔断：飞书 API、TikTok 产品页和图片 CDN 共用的容错策略，提供同步和异步两种调用方式
+
+- classify 把异常分为可重试（超时、连接错误、5xx/429）和不可重试两类，不再靠匹配异常文本判断
+- Backoff 指数退避并加入随机抖动，避免多个线程同时重试
+- RetryBudget 限制一个任务内重试次数占请求次数的比例，依赖整体故障时不会成倍放大请求量
+- CircuitBreaker 按目标统计连续失败，达到阈值后在冷却时间内直接拒绝调用，冷却后放行一个探测请求
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+from metrics import CIRCUIT_OPENED, CIRCUIT_REJECTED, RETRIES
+
+try:
+    from playwright.sync_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    PlaywrightError = PlaywrightTimeoutError = None
+
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+# Playwright 网络错误的前缀，如 net::ERR_CONNECTION_RESET，可以重试
+_PLAYWRIGHT_NETWORK_ERROR = "net::ERR_"
+
+
+class RetryableError(Exception):
+    """
+    调用方判断为临时性的失败，例如 HTTP 5xx 或限流错误码
+    """
+    def __init__(self, message="", status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(Exception):
+    """
+    熔断器处于打开状态，调用被直接拒绝
+    """
+    def __init__(self, target, retry_after):
+        super().__init__(f"{target} 熔断中，{retry_after:.1f} 秒后重试")
+        self.target = target
+        self.retry_after = retry_after
+
+
+def is_retryable_status(status):
+    return status == 429 or status >= 500
+
+
+def classify(exc):
+    """
+    异常分类：返回 TRANSIENT 或 FATAL
+    """
+    if isinstance(exc, CircuitOpenError):
+        return FATAL
+    if isinstance(exc, RetryableError):
+        return TRANSIENT
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return TRANSIENT
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return TRANSIENT if is_retryable_status(exc.response.status_code) else FATAL
+    if PlaywrightTimeoutError is not None and isinstance(exc, PlaywrightTimeoutError):
+        return TRANSIENT
+    if PlaywrightError is not None and isinstance(exc, PlaywrightError) and _PLAYWRIGHT_NETWORK_ERROR in str(exc):
+        return TRANSIENT
+    return FATAL
+
+
+class Backoff:
+    def __init__(self, base=0.5, factor=2.0, max_delay=30.0, jitter=0.5):
+        """
+        :param base: 第一次重试前的等待时间（秒）
+        :param factor: 每次重试等待时间的倍数
+        :param max_delay: 等待时间上限（秒）
+        :param jitter: 随机抖动比例，0.5 表示在 [50%, 100%] 之间随机
+        """
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        """
+        第 attempt 次重试（从 0 开始）前的等待时间
+        """
+        delay = min(self.max_delay, self.base * self.factor ** attempt)
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+
+class RetryBudget:
+    def __init__(self, ratio=0.2, min_retries=10):
+        """
+        :param ratio: 重试次数最多占调用次数的比例
+        :param min_retries: 调用次数较少时至少允许的重试次数
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.calls = 0
+        self.retries = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self):
+        """
+        申请一次重试，预算用完时返回 False
+        """
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.calls:
+                self.denied += 1
+                return False
+            self.retries += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "denied": self.denied}
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, target, failure_threshold=5, recovery_timeout=30.0):
+        """
+        :param target: 目标名称，如 feishu / tiktok_pdp / cdn，用作指标标签
+        :param failure_threshold: 连续失败多少次后打开
+        :param recovery_timeout: 打开后多少秒放行一个探测请求
+        """
+        self.target = target
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        调用前检查，打开状态下抛出 CircuitOpenError；冷却时间过后只放行一个探测请求
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        CIRCUIT_REJECTED.inc(target=self.target)
+        raise CircuitOpenError(self.target, max(0.0, remaining))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """
+        探测请求以不可重试的错误结束：目标是否恢复仍未知，保持当前状态，只让下一个调用可以继续探测
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+                opened = True
+            else:
+                opened = False
+        if opened:
+            print(f"[熔断] {self.target} 连续失败 {self.failures} 次，{self.recovery_timeout:.0f} 秒内不再调用")
+            CIRCUIT_OPENED.inc(target=self.target)
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class RetryPolicy:
+    def __init__(self, target, attempts=3, backoff=None, budget=None, breaker=None, classify=classify):
+        """
+        :param target: 目标名称，用作重试指标标签
+        :param attempts: 最多调用次数（含第一次）
+        :param backoff: Backoff 实例，为空时使用默认退避
+        :param budget: RetryBudget 实例，可选，多个策略可以共用一个任务级预算
+        :param breaker: CircuitBreaker 实例，可选
+        :param classify: 异常分类函数
+        """
+        self.target = target
+        self.attempts = attempts
+        self.backoff = backoff or Backoff()
+        self.budget = budget
+        self.breaker = breaker
+        self.classify = classify
+
+    def _before(self):
+        if self.breaker:
+            self.breaker.before_call()
+        if self.budget:
+            self.budget.record_call()
+
+    def _after_success(self):
+        if self.breaker:
+            self.breaker.record_success()
+
+    def _after_fatal(self):
+        # 不可重试的错误说明目标仍有响应（如参数错误、页面结构变化），不计入熔断，
+        # 但也不能证明目标已恢复，半开状态下不关闭熔断器
+        if self.breaker:
+            self.breaker.release_probe()
+
+    def _should_retry(self, attempt, reason, on_retry):
+        """
+        记录一次临时性失败，返回下次重试前的等待秒数，不再重试时返回 None
+        """
+        if self.breaker:
+            self.breaker.record_failure()
+        if attempt + 1 >= self.attempts:
+            return None
+        if self.budget and not self.budget.try_spend():
+            print(f"[重试] {self.target} 重试预算已用完，不再重试: {reason}")
+            return None
+        RETRIES.inc(target=self.target)
+        if on_retry:
+            on_retry(attempt, reason)
+        delay = self.backoff.delay(attempt)
+        print(f"[重试] {self.target} 第 {attempt + 1} 次失败（{reason}），{delay:.1f} 秒后重试")
+        return delay
+
+    def call(self, func, *args, retry_result=None, on_retry=None, **kwargs):
+        """
+        同步调用 func，临时性异常按退避重试
+        retry_result: 可选，判断返回值是否需要重试（如 HTTP 5xx 响应），最后一次仍返回该值
+        on_retry: 可选，每次重试前调用 on_retry(attempt, reason)
+        """
+        for attempt in range(self.attempts):
+            self._before()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if self.classify(e) != TRANSIENT:
+                    self._after_fatal()
+                    raise
+                delay = self._should_retry(attempt, e, on_retry)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            if retry_result and retry_result(result):
+                delay = self._should_retry(attempt, "返回值需要重试", on_retry)
+                if delay is None:
+                    return result
+                time.sleep(delay)
+                continue
+            self._after_success()
+            return result
+
+    async def acall(self, func, *args, retry_result=None, on_retry=None, **kwargs):
+        """
+        异步版本，func 为协程函数，等待使用 asyncio.sleep，不阻塞事件循环
+        """
+        for attempt in range(self.attempts):
+            self._before()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if self.classify(e) != TRANSIENT:
+                    self._after_fatal()
+                    raise
+                delay = self._should_retry(attempt, e, on_retry)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if retry_result and retry_result(result):
+                delay = self._should_retry(attempt, "返回值需要重试", on_retry)
+                if delay is None:
+                    return result
+                await asyncio.sleep(delay)
+                continue
+            self._after_success()
+            return result
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+安全验证协调：并发抓取产品页时，任一页面遇到 TikTok 安全验证（Security Check / Verify to continue）后
+暂停所有页面的导航，只由发现验证的页面等待并刷新探测，其余页面上的产品放回队列，验证通过后继续。
+连续探测失败时等待时间按倍数增加，验证通过后恢复初始等待时间。
+"""
+
+import threading
+import time
+
+from metrics import SECURITY_CHECKS, SECURITY_CHECK_SECONDS
+
+
+class SecurityCheckPending(Exception):
+    """
+    页面遇到安全验证且由其他页面负责探测，当前产品需要放回队列稍后重试
+    """
+    def __init__(self, product_id):
+        super().__init__(f"产品 {product_id} 遇到安全验证，稍后重试")
+        self.product_id = product_id
+
+
+def is_security_check(page):
+    """
+    判断页面是否为安全验证页：标题为 Security Check 或页面包含 Verify to continue
+    """
+    try:
+        if "Security Check" in page.title():
+            return True
+        return page.query_selector("text=Verify to continue") is not None
+    except Exception as e:
+        print(f"  检查安全验证时出错: {e}")
+        return False
+
+
+class SecurityCheckCoordinator:
+    def __init__(self, wait_ms=30000, backoff_factor=2.0, max_wait_ms=300000, max_probes=3):
+        """
+        :param wait_ms: 第一次探测前等待用户完成验证的毫秒数
+        :param backoff_factor: 探测仍在验证页时等待时间的倍数
+        :param max_wait_ms: 单次等待上限（毫秒）
+        :param max_probes: 每次暂停最多探测次数，用完后恢复其余页面，避免一直阻塞
+        """
+        self.wait_ms = wait_ms
+        self.backoff_factor = backoff_factor
+        self.max_wait_ms = max_wait_ms
+        self.max_probes = max_probes
+        self.events = 0  # 暂停次数（一次验证只计一次）
+        self.detections = 0  # 遇到验证页的页面数
+        self.recovered = 0  # 探测后验证通过的次数
+        self.pause_seconds = 0.0  # 暂停的总时长
+        self.blocked_seconds = 0.0  # 各页面等待暂停结束的时长之和
+        self._next_wait_ms = wait_ms
+        self._prober = None
+        self._clear = threading.Event()
+        self._clear.set()
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self):
+        return not self._clear.is_set()
+
+    def wait_until_clear(self):
+        """
+        导航前调用，暂停期间阻塞，返回等待的秒数
+        """
+        if self._clear.is_set():
+            return 0.0
+        start = time.perf_counter()
+        self._clear.wait()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.blocked_seconds += waited
+        return waited
+
+    def on_challenge(self, page):
+        """
+        页面遇到安全验证时调用
+        第一个遇到的页面负责探测：暂停其余页面，等待后刷新，直到验证通过或探测次数用完
+        :return: True 表示本页面验证已通过可以继续处理；False 表示应把当前产品放回队列
+        """
+        with self._lock:
+            self.detections += 1
+            if self._prober is not None:
+                return False
+            self._prober = threading.get_ident()
+            self.events += 1
+            self._clear.clear()
+        SECURITY_CHECKS.inc()
+        pause_start = time.perf_counter()
+        recovered = False
+        try:
+            for probe in range(self.max_probes):
+                wait_ms = self._next_wait_ms
+                print(f"  [安全验证] 暂停所有页面，等待 {wait_ms / 1000:.0f} 秒后第 {probe + 1}/{self.max_probes} 次探测...")
+                page.wait_for_timeout(wait_ms)
+                page.reload(wait_until="domcontentloaded")
+                if not is_security_check(page):
+                    recovered = True
+                    print("  [安全验证] 验证已通过，恢复所有页面")
+                    return True
+                self._next_wait_ms = min(self.max_wait_ms, wait_ms * self.backoff_factor)
+            print("  [安全验证] 验证仍未通过，恢复其余页面，本产品稍后重试")
+            return False
+        except Exception as e:
+            print(f"  [安全验证] 探测时出错: {e}")
+            return False
+        finally:
+            paused = time.perf_counter() - pause_start
+            SECURITY_CHECK_SECONDS.inc(paused)
+            with self._lock:
+                if recovered:
+                    self.recovered += 1
+                    self._next_wait_ms = self.wait_ms
+                self.pause_seconds += paused
+                self._prober = None
+                self._clear.set()
+
+    def check(self, page, product_id):
+        """
+        导航后调用：遇到验证页时协调处理，需要放回队列时抛出 SecurityCheckPending
+        :return: 是否遇到过安全验证（已通过）
+        """
+        if not is_security_check(page):
+            return False
+        print(f"  检测到安全验证页面（产品 {product_id}）")
+        if not self.on_challenge(page):
+            raise SecurityCheckPending(product_id)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "events": self.events,
+                "detections": self.detections,
+                "recovered": self.recovered,
+                "pause_seconds": round(self.pause_seconds, 1),
+                "blocked_seconds": round(self.blocked_seconds, 1),
+            }
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片协调：把 handle 列表和产品列表切成分片，多台机器（或本机多个进程）上的工作端领取分片后持有租约，
+处理期间定期续约，完成后上报结果。工作端失联导致租约过期的分片重新分配给其他工作端，
+过期后才提交的结果被拒绝，同一分片不会被两个工作端同时处理。
+
+- ShardCoordinator: 协调端状态（内存），线程安全
+- create_router: 协调端的 FastAPI 路由，挂载到 webhook 服务
+- CoordinatorClient: 工作端通过 HTTP 调用协调端，方法与 ShardCoordinator 相同
+"""
+
+import threading
+import time
+import uuid
+
+import requests
+
+from metrics import SHARD_EVENTS
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class ShardCoordinator:
+    def __init__(self, lease_seconds=60.0, max_attempts=3, shard_size=20, on_done=None):
+        """
+        :param lease_seconds: 租约时长（秒），工作端需要在到期前续约
+        :param max_attempts: 同一分片最多分配次数（租约过期和处理失败都计一次），超过后标记为失败
+        :param shard_size: 默认每个分片的条目数
+        :param on_done: 任务所有分片结束后调用 on_done(任务状态)，在后台线程执行，可选
+        """
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.shard_size = shard_size
+        self.on_done = on_done
+        self._jobs = {}
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, on_done=None):
+        """
+        根据 config.json 的 shards 部分创建：lease_seconds、max_attempts、shard_size
+        """
+        cfg = (config or {}).get("shards", {})
+        return cls(
+            lease_seconds=cfg.get("lease_seconds", 60.0),
+            max_attempts=cfg.get("max_attempts", 3),
+            shard_size=cfg.get("shard_size", 20),
+            on_done=on_done,
+        )
+
+    def create_job(self, kind, items, shard_size=None):
+        """
+        创建分片任务
+        :param kind: 任务类型，monitor（items 为账号 URL）或 product（items 为产品任务字典）
+        :param items: 待处理条目
+        :return: 任务状态
+        """
+        shard_size = max(1, shard_size or self.shard_size)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            shard_ids = []
+            for start in range(0, len(items), shard_size):
+                shard_id = f"{job_id[:8]}-{start // shard_size}"
+                self._shards[shard_id] = {
+                    "shard_id": shard_id,
+                    "job_id": job_id,
+                    "kind": kind,
+                    "items": list(items[start:start + shard_size]),
+                    "state": PENDING,
+                    "worker_id": None,
+                    "lease_token": None,
+                    "lease_expires": 0.0,
+                    "attempts": 0,
+                    "result": None,
+                    "error": None,
+                }
+                shard_ids.append(shard_id)
+            self._jobs[job_id] = {"job_id": job_id, "kind": kind, "items": len(items), "shard_ids": shard_ids,
+                                  "created_at": time.time(), "notified": False}
+        print(f"[分片] 创建 {kind} 任务 {job_id}: {len(items)} 条，{len(shard_ids)} 个分片")
+        return self.job_status(job_id)
+
+    def _expire_leases(self, now):
+        """
+        租约到期的分片放回待领取，超过最多分配次数的标记为失败，调用方持有锁
+        """
+        for shard in self._shards.values():
+            if shard["state"] != LEASED or shard["lease_expires"] > now:
+                continue
+            print(f"[分片] {shard['shard_id']} 的租约已过期（工作端 {shard['worker_id']}），重新分配")
+            SHARD_EVENTS.inc(kind=shard["kind"], event="expired")
+            shard["lease_token"] = None
+            shard["worker_id"] = None
+            if shard["attempts"] >= self.max_attempts:
+                shard["state"] = FAILED
+                shard["error"] = "租约多次过期"
+            else:
+                shard["state"] = PENDING
+
+    def _notify_done(self):
+        """
+        对所有分片都已结束、尚未通知的任务调用 on_done，不持有锁时调用
+        """
+        if self.on_done is None:
+            return
+        with self._lock:
+            finished = []
+            for job in self._jobs.values():
+                if job["notified"]:
+                    continue
+                if all(self._shards[shard_id]["state"] in (DONE, FAILED) for shard_id in job["shard_ids"]):
+                    job["notified"] = True
+                    finished.append(job["job_id"])
+        for job_id in finished:
+            threading.Thread(target=self.on_done, args=(self.job_status(job_id),), daemon=True).start()
+
+    def claim(self, worker_id, kinds=None):
+        """
+        领取一个待处理分片
+        :param kinds: 只领取这些类型的分片，为空时不限
+        :return: 分片（含 items、lease_token、lease_seconds），没有可领取的分片时返回 None
+        """
+        shard = self._claim(worker_id, kinds, time.monotonic())
+        # 租约过期可能使最后一个分片标记为失败
+        self._notify_done()
+        return shard
+
+    def _claim(self, worker_id, kinds, now):
+        with self._lock:
+            self._expire_leases(now)
+            for shard in self._shards.values():
+                if shard["state"] != PENDING or (kinds and shard["kind"] not in kinds):
+                    continue
+                shard["state"] = LEASED
+                shard["worker_id"] = worker_id
+                shard["lease_token"] = uuid.uuid4().hex
+                shard["lease_expires"] = now + self.lease_seconds
+                shard["attempts"] += 1
+                SHARD_EVENTS.inc(kind=shard["kind"], event="claimed")
+                return {
+                    "shard_id": shard["shard_id"],
+                    "job_id": shard["job_id"],
+                    "kind": shard["kind"],
+                    "items": list(shard["items"]),
+                    "lease_token": shard["lease_token"],
+                    "lease_seconds": self.lease_seconds,
+                    "attempt": shard["attempts"],
+                }
+        return None
+
+    def _leased(self, shard_id, lease_token):
+        """
+        返回租约仍有效的分片，租约已过期或已被重新分配时返回 None，调用方持有锁
+        """
+        self._expire_leases(time.monotonic())
+        shard = self._shards.get(shard_id)
+        if shard is None or shard["state"] != LEASED or shard["lease_token"] != lease_token:
+            return None
+        return shard
+
+    def renew(self, shard_id, lease_token):
+        """
+        续约，租约已失效时返回 False，工作端应停止处理该分片
+        """
+        with self._lock:
+            shard = self._leased(shard_id, lease_token)
+            if shard is None:
+                return False
+            shard["lease_expires"] = time.monotonic() + self.lease_seconds
+            SHARD_EVENTS.inc(kind=shard["kind"], event="renewed")
+            return True
+
+    def complete(self, shard_id, lease_token, result=None):
+        """
+        上报分片处理结果，租约已失效时拒绝（分片可能已交给其他工作端）
+        """
+        with self._lock:
+            shard = self._leased(shard_id, lease_token)
+            if shard is None:
+                return False
+            shard["state"] = DONE
+            shard["result"] = result
+            shard["lease_token"] = None
+            SHARD_EVENTS.inc(kind=shard["kind"], event="completed")
+        self._notify_done()
+        return True
+
+    def fail(self, shard_id, lease_token, error=""):
+        """
+        上报分片处理失败，未超过最多分配次数时放回待领取
+        """
+        with self._lock:
+            shard = self._leased(shard_id, lease_token)
+            if shard is None:
+                return False
+            shard["error"] = error
+            shard["lease_token"] = None
+            shard["worker_id"] = None
+            shard["state"] = FAILED if shard["attempts"] >= self.max_attempts else PENDING
+            SHARD_EVENTS.inc(kind=shard["kind"], event="failed")
+        self._notify_done()
+        return True
+
+    def job_status(self, job_id):
+        """
+        任务状态：各状态分片数和已完成分片的结果，任务不存在时返回 None
+        """
+        with self._lock:
+            self._expire_leases(time.monotonic())
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            shards = [self._shards[shard_id] for shard_id in job["shard_ids"]]
+            counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+            for shard in shards:
+                counts[shard["state"]] += 1
+            return {
+                "job_id": job_id,
+                "kind": job["kind"],
+                "items": job["items"],
+                "shards": counts,
+                "done": counts[PENDING] == 0 and counts[LEASED] == 0,
+                "results": [{"shard_id": shard["shard_id"], "state": shard["state"], "worker_id": shard["worker_id"],
+                             "attempts": shard["attempts"], "result": shard["result"], "error": shard["error"]}
+                            for shard in shards if shard["state"] in (DONE, FAILED)],
+                "created_at": job["created_at"],
+            }
+
+    def list_jobs(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.job_status(job_id) for job_id in job_ids]
+
+    def active_job(self, kind):
+        """
+        返回该类型尚未结束的任务状态，没有时返回 None
+        """
+        for status in self.list_jobs():
+            if status["kind"] == kind and not status["done"]:
+                return status
+        return None
+
+
+def create_router(coordinator, sources):
+    """
+    协调端路由
+    :param coordinator: ShardCoordinator 实例
+    :param sources: {kind: 函数}，函数无参数，返回该类型任务的全部条目（同步函数，在线程池中执行）
+    """
+    import asyncio
+
+    from fastapi import APIRouter, Body, HTTPException, Response
+
+    router = APIRouter(prefix="/shards")
+
+    @router.post("/jobs/{kind}", status_code=201)
+    async def create_job(kind: str, shard_size: int = None):
+        if kind not in sources:
+            raise HTTPException(status_code=404, detail=f"unknown kind: {kind}")
+        if coordinator.active_job(kind):
+            raise HTTPException(status_code=409, detail=f"{kind} shards already running")
+        items = await asyncio.get_event_loop().run_in_executor(None, sources[kind])
+        return coordinator.create_job(kind, items, shard_size)
+
+    @router.get("/jobs")
+    def list_jobs():
+        return {"jobs": coordinator.list_jobs()}
+
+    @router.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        status = coordinator.job_status(job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        return status
+
+    @router.post("/claim")
+    def claim(worker_id: str = Body(...), kinds: list = Body(None)):
+        shard = coordinator.claim(worker_id, kinds)
+        if shard is None:
+            return Response(status_code=204)
+        return shard
+
+    @router.post("/{shard_id}/renew")
+    def renew(shard_id: str, lease_token: str = Body(..., embed=True)):
+        if not coordinator.renew(shard_id, lease_token):
+            raise HTTPException(status_code=409, detail="lease lost")
+        return {"status": "renewed"}
+
+    @router.post("/{shard_id}/complete")
+    def complete(shard_id: str, lease_token: str = Body(...), result: dict = Body(None)):
+        if not coordinator.complete(shard_id, lease_token, result):
+            raise HTTPException(status_code=409, detail="lease lost")
+        return {"status": "completed"}
+
+    @router.post("/{shard_id}/fail")
+    def fail(shard_id: str, lease_token: str = Body(...), error: str = Body("")):
+        if not coordinator.fail(shard_id, lease_token, error):
+            raise HTTPException(status_code=409, detail="lease lost")
+        return {"status": "failed"}
+
+    return router
+
+
+class CoordinatorClient:
+    def __init__(self, base_url, session=None, timeout=10):
+        """
+        :param base_url: 协调端地址，如 http://coordinator:8000
+        """
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        return self.session.post(f"{self.base_url}/shards{path}", json=payload, timeout=self.timeout)
+
+    def claim(self, worker_id, kinds=None):
+        response = self._post("/claim", {"worker_id": worker_id, "kinds": kinds})
+        if response.status_code == 204:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def renew(self, shard_id, lease_token):
+        response = self._post(f"/{shard_id}/renew", {"lease_token": lease_token})
+        if response.status_code == 409:
+            return False
+        response.raise_for_status()
+        return True
+
+    def complete(self, shard_id, lease_token, result=None):
+        response = self._post(f"/{shard_id}/complete", {"lease_token": lease_token, "result": result})
+        if response.status_code == 409:
+            return False
+        response.raise_for_status()
+        return True
+
+    def fail(self, shard_id, lease_token, error=""):
+        response = self._post(f"/{shard_id}/fail", {"lease_token": lease_token, "error": error})
+        if response.status_code == 409:
+            return False
+        response.raise_for_status()
+        return True
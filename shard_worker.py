@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片工作端：从协调端领取分片，处理期间后台续约，完成后上报结果；续约失败说明分片已被重新分配，
+处理结果不再提交。每台机器可以运行一个或多个工作端，写入飞书表格使用本机的 config.json。
+
+用法（在仓库根目录）:
+    python shard_worker.py --coordinator http://coordinator:8000                  # 处理所有类型的分片
+    python shard_worker.py --coordinator http://coordinator:8000 --kinds product  # 只处理产品分片
+    python shard_worker.py --coordinator http://coordinator:8000 --once           # 没有待处理分片时退出
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from shard_coordinator import CoordinatorClient
+
+
+class LeaseKeeper:
+    def __init__(self, coordinator, shard, interval=None):
+        """
+        后台线程定期续约
+        :param interval: 续约间隔（秒），默认租约时长的三分之一
+        """
+        self.coordinator = coordinator
+        self.shard = shard
+        self.interval = interval or max(0.05, shard["lease_seconds"] / 3)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{shard['shard_id']}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                renewed = self.coordinator.renew(self.shard["shard_id"], self.shard["lease_token"])
+            except Exception as e:
+                # 协调端暂时不可用时继续处理，下次再续约
+                print(f"[分片] {self.shard['shard_id']} 续约请求失败: {e}")
+                continue
+            if not renewed:
+                print(f"[分片] {self.shard['shard_id']} 租约已失效，结果不再提交")
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(coordinator, processors, worker_id=None, kinds=None, once=False, poll_interval=5.0):
+    """
+    领取并处理分片
+    :param coordinator: ShardCoordinator 或 CoordinatorClient
+    :param processors: {kind: 函数}，函数接收分片条目列表，返回可 JSON 序列化的结果字典
+    :param kinds: 只处理这些类型，默认 processors 中的全部类型
+    :param once: 没有待处理分片时退出，否则每隔 poll_interval 秒重新领取
+    :return: 处理的分片数
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    kinds = list(kinds or processors)
+    processed = 0
+    while True:
+        try:
+            shard = coordinator.claim(worker_id, kinds)
+        except Exception as e:
+            print(f"[分片] 领取分片失败: {e}")
+            shard = None
+        if shard is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        shard_id, lease_token = shard["shard_id"], shard["lease_token"]
+        print(f"[分片] {worker_id} 领取 {shard['kind']} 分片 {shard_id}（{len(shard['items'])} 条，第 {shard['attempt']} 次分配）")
+        with LeaseKeeper(coordinator, shard) as keeper:
+            try:
+                result = processors[shard["kind"]](shard["items"])
+                error = None
+            except Exception as e:
+                result, error = None, str(e)
+        processed += 1
+        if keeper.lost:
+            continue
+        try:
+            if error is None:
+                accepted = coordinator.complete(shard_id, lease_token, result)
+            else:
+                print(f"[分片] {shard_id} 处理失败: {error}")
+                accepted = coordinator.fail(shard_id, lease_token, error)
+            if not accepted:
+                print(f"[分片] {shard_id} 的结果未被接受（租约已失效）")
+        except Exception as e:
+            print(f"[分片] 上报 {shard_id} 结果失败: {e}")
+
+
+def product_processor(config, scraper=None, feishu_sheet=None):
+    """
+    产品分片：抓取产品图片并批量更新多维表格
+    """
+    from dead_letter import DeadLetterQueue
+    from feishu_sheet import FeishuSheet
+    from fingerprints import DEFAULT_PATH as DEFAULT_FINGERPRINT_PATH, FingerprintStore
+    from job_progress import JobProgress
+    from pacing import PacingScheduler
+    from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+    feishu_cfg = config.get("feishu", {})
+    bitable_cfg = config.get("bitable", {})
+    product_cfg = config.get("product", {})
+    if feishu_sheet is None:
+        feishu_sheet = FeishuSheet(feishu_cfg.get("app_id"), feishu_cfg.get("app_secret"),
+                                   dead_letters=DeadLetterQueue.from_config(config))
+    if scraper is None:
+        scraper = TikTokProductScraperPlaywright()
+    if scraper.pacer is None:
+        scraper.pacer = PacingScheduler.from_config(config, "product")
+
+    def process(items):
+        progress = JobProgress("product")
+        feishu_sheet.reset_retry_budget()
+        results = scraper.scrape_products(
+            items, feishu_sheet, bitable_cfg.get("app_token"), bitable_cfg.get("table_id"),
+            batch_size=product_cfg.get("write_batch_size", 10),
+            progress=progress,
+            fingerprints=FingerprintStore(product_cfg.get("fingerprint_path", DEFAULT_FINGERPRINT_PATH)),
+        )
+        snapshot = progress.snapshot()
+        return {
+            "statuses": {r.record_id: r.status for r in results},
+            "writes": snapshot["writes"],
+            "failures": snapshot["failures"],
+            "skipped": snapshot["skipped"],
+        }
+
+    return process
+
+
+def monitor_processor(config):
+    """
+    账号分片：抓取分片中的账号视频并写入多维表格，重复记录由协调端在任务结束后统一删除
+    """
+    import asyncio
+
+    from job_progress import JobProgress
+    from tiktok_account_monitor import update_titkok_video
+
+    def process(items):
+        progress = JobProgress("monitor")
+        asyncio.run(update_titkok_video(progress=progress, config=config, urls=items, delete_duplicates=False))
+        snapshot = progress.snapshot()
+        return {key: snapshot[key] for key in ("processed", "items", "writes", "failures")}
+
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片工作端：从协调端领取账号/产品分片并处理")
+    parser.add_argument("--coordinator", required=True, help="协调端地址，如 http://coordinator:8000")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--kinds", nargs="+", choices=["monitor", "product"], default=["monitor", "product"])
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--once", action="store_true", help="没有待处理分片时退出")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    factories = {"monitor": monitor_processor, "product": product_processor}
+    processors = {kind: factories[kind](config) for kind in args.kinds}
+    count = run_worker(CoordinatorClient(args.coordinator), processors, args.worker_id, args.kinds, args.once,
+                       args.poll_interval)
+    print(f"工作端退出，共处理 {count} 个分片")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号监控任务测试：从 handle 表读取账号列表
+"""
+
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from tiktok_account_monitor import read_handle_urls
+
+
+def test_reads_every_page_of_handles(feishu, mock):
+    # 超过一页（100 条）的账号也要全部读取
+    mock.add_records(APP_TOKEN, TABLE_ID, [{"handle": f"user_{i}"} for i in range(250)])
+    urls = read_handle_urls(feishu, APP_TOKEN, TABLE_ID)
+    assert len(urls) == 250
+    assert urls[0] == "https://www.tiktok.com/@user_0" and urls[-1] == "https://www.tiktok.com/@user_249"
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻浏览器服务测试：替换 Chrome 进程和 /json/version 健康检查，
+验证启动、进程退出后 ensure_running 重启、后台健康检查线程自动重启以及启动超时
+"""
+
+import time
+
+import pytest
+import requests
+
+import browser_service
+from browser_service import BrowserService
+
+
+class FakeProcess:
+    """
+    替代 subprocess.Popen 返回的进程：exit() 模拟浏览器崩溃
+    """
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.terminated = False
+
+    def poll(self):
+        return self.returncode
+
+    def exit(self, code=1):
+        self.returncode = code
+
+    def terminate(self):
+        self.terminated = True
+        self.returncode = 0
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+class FakeChrome:
+    """
+    记录启动的进程；responding 为 False 时 CDP 端口不响应
+    """
+    def __init__(self):
+        self.processes = []
+        self.responding = True
+        self.health_checks = []
+
+    def popen(self, args, **kwargs):
+        process = FakeProcess(pid=1000 + len(self.processes))
+        process.args = args
+        self.processes.append(process)
+        return process
+
+    def get(self, url, timeout=None):
+        self.health_checks.append(url)
+        if not self.responding:
+            raise requests.ConnectionError("connection refused")
+        return type("Response", (), {"status_code": 200})()
+
+
+@pytest.fixture
+def chrome(monkeypatch):
+    chrome = FakeChrome()
+    monkeypatch.setattr(browser_service.subprocess, "Popen", chrome.popen)
+    monkeypatch.setattr(browser_service.requests, "get", chrome.get)
+    return chrome
+
+
+def make_service(**kwargs):
+    return BrowserService(port=9333, chrome_path="/fake/chrome", profile_path="/fake/profile", **kwargs)
+
+
+def test_start_launches_chrome_with_cdp_port(chrome):
+    service = make_service()
+    service.ensure_running()
+
+    assert len(chrome.processes) == 1
+    args = chrome.processes[0].args
+    assert args[0] == "/fake/chrome"
+    assert "--remote-debugging-port=9333" in args
+    assert "--user-data-dir=/fake/profile" in args
+    assert chrome.health_checks[-1] == "http://127.0.0.1:9333/json/version"
+    status = service.status()
+    assert status["running"] and status["pid"] == 1000 and status["restarts"] == 0
+    assert status["last_health_check"] is not None
+
+    # 健康时不会重复启动
+    service.ensure_running()
+    assert len(chrome.processes) == 1
+
+
+def test_ensure_running_restarts_dead_process(chrome):
+    service = make_service()
+    service.ensure_running()
+    chrome.processes[0].exit()
+
+    assert not service.is_healthy()
+    service.ensure_running()
+
+    assert len(chrome.processes) == 2
+    assert service.restarts == 1
+    assert service.status()["pid"] == 1001
+
+
+def test_ensure_running_restarts_unresponsive_process(chrome, monkeypatch):
+    service = make_service(startup_timeout=5)
+    service.ensure_running()
+
+    # 进程还在但 CDP 端口无响应：终止旧进程后重新启动
+    chrome.responding = False
+    assert not service.is_healthy()
+    chrome.responding = True
+    chrome.health_checks.clear()
+    original_get = chrome.get
+
+    def first_check_fails(url, timeout=None):
+        if not chrome.health_checks:
+            chrome.health_checks.append(url)
+            raise requests.ConnectionError("connection refused")
+        return original_get(url, timeout)
+
+    monkeypatch.setattr(browser_service.requests, "get", first_check_fails)
+    service.ensure_running()
+
+    assert chrome.processes[0].terminated
+    assert len(chrome.processes) == 2
+    assert service.restarts == 1
+
+
+def test_watchdog_restarts_crashed_browser(chrome):
+    service = make_service(health_interval=0.01)
+    service.start()
+    try:
+        chrome.processes[0].exit()
+        deadline = time.time() + 5
+        while service.restarts == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert service.restarts >= 1
+        assert service.status()["running"]
+    finally:
+        service.stop()
+
+    assert chrome.processes[-1].terminated
+    assert not service.status()["running"]
+    assert service._watchdog is None
+
+
+def test_launch_times_out_when_cdp_never_responds(chrome, monkeypatch):
+    monkeypatch.setattr(browser_service.time, "sleep", lambda seconds: None)
+    chrome.responding = False
+    service = make_service(startup_timeout=0.05)
+
+    with pytest.raises(Exception, match="超时"):
+        service.ensure_running()
+    assert chrome.processes[0].terminated
+    assert service.process is None
+
+
+def test_launch_fails_when_process_exits_immediately(chrome, monkeypatch):
+    original_popen = chrome.popen
+
+    def crashing_popen(args, **kwargs):
+        process = original_popen(args, **kwargs)
+        process.exit(21)
+        return process
+
+    monkeypatch.setattr(browser_service.subprocess, "Popen", crashing_popen)
+    service = make_service()
+
+    with pytest.raises(Exception, match="退出码 21"):
+        service.ensure_running()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试请求捕获统计的聚合结果和内存上限
+"""
+
+from capture import CaptureStats
+
+
+class FakeMessage:
+    """
+    模拟 Playwright 的 Request/Response，按对象本身哈希
+    """
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+def make_exchange(i, status=200):
+    request = FakeMessage(url=f"https://www.tiktok.com/api/post/item_list/?n={i}", method="GET")
+    response = FakeMessage(url=request.url, status=status, status_text="OK", request=request)
+    return request, response
+
+
+def test_aggregates_without_buffer():
+    """
+    测试默认只保存计数和耗时样本
+    """
+    stats = CaptureStats(reservoir_size=100, seed=1)
+    for i in range(1000):
+        request, response = make_exchange(i, 200 if i % 10 else 429)
+        stats.record_request(request, 0.0)
+        stats.record_response(response, (i + 1) / 1000, "application/json")
+    summary = stats.summary()
+    assert summary["requests"] == summary["responses"] == 1000
+    assert summary["methods"] == {"GET": 1000}
+    assert summary["statuses"] == {200: 900, 429: 100}
+    assert summary["latency"]["count"] == 1000
+    assert summary["latency"]["max"] == 1.0
+    assert 0.35 < summary["latency"]["p50"] < 0.65
+    assert stats.buffer is None
+    assert len(stats._reservoir) == 100
+
+
+def test_ring_buffer_and_failures():
+    """
+    测试环形缓冲区只保留最近的条目，失败和悬挂的请求不会累积
+    """
+    stats = CaptureStats(buffer_size=4)
+    for i in range(10):
+        request, response = make_exchange(i)
+        stats.record_request(request, 1.0)
+        stats.record_response(response, 1.5)
+    assert len(stats.buffer) == 4
+    assert stats.buffer[-1].url.endswith("n=9")
+
+    request, _ = make_exchange(10)
+    stats.record_request(request, 2.0)
+    stats.record_failure(request)
+    stats.record_request(make_exchange(11)[0], 2.0)
+    stats.forget_pending()
+    assert stats.failed == 1
+    assert stats._pending == {}
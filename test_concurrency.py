@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制测试：健康时逐步增加，超过阈值时按比例减小，并发数不超过当前上限
+"""
+
+import json
+import threading
+import time
+
+from concurrency import AdaptiveConcurrency
+
+
+def feed(controller, pages, latency=1.0, failed=0, security=0):
+    for i in range(pages):
+        controller.record_page(latency, failed=i < failed, security=i < security)
+
+
+def test_additive_increase_up_to_max():
+    controller = AdaptiveConcurrency(initial=2, min_limit=1, max_limit=4, window=5)
+    feed(controller, 20)
+    assert [d["to"] for d in controller.decisions] == [3, 4, 4, 4]
+    assert [d["action"] for d in controller.decisions] == ["increase", "increase", "hold", "hold"]
+
+
+def test_multiplicative_decrease_by_reason():
+    controller = AdaptiveConcurrency(initial=8, min_limit=1, max_limit=8, window=10, latency_target=5.0)
+    feed(controller, 10, security=1)
+    feed(controller, 10, failed=3)
+    controller.record_writes(10, 5)
+    feed(controller, 10)
+    feed(controller, 10, latency=6.0)
+    reasons = [(d["reason"], d["to"]) for d in controller.decisions]
+    assert reasons == [("security_check", 4), ("timeout", 2), ("bitable_errors", 1), ("latency", 1)]
+    assert controller.decisions[-1]["action"] == "hold"
+
+
+def test_decision_log(tmp_path):
+    path = tmp_path / "decisions.jsonl"
+    controller = AdaptiveConcurrency(initial=1, max_limit=3, window=2, log_path=str(path))
+    feed(controller, 4)
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["to"] for line in lines] == [2, 3]
+    assert controller.best_limit() in (1, 2)
+
+
+def test_from_config_overrides_defaults():
+    controller = AdaptiveConcurrency.from_config({"concurrency": {"product": {"max": 12, "initial": 20}}}, "product")
+    assert controller.max_limit == 12 and controller.limit == 12 and controller.window == 10
+
+
+def test_slot_limits_active_workers():
+    controller = AdaptiveConcurrency(initial=2, max_limit=4, window=100)
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with controller.slot():
+            with lock:
+                peak.append(controller.active)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2 and controller.active == 0
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+使用本地模拟服务离线测试飞书多维表格操作
+"""
+
+import json
+import time
+
+import pytest
+
+import datetime
+
+from feishu_sheet import FeishuSheet, Field, and_, date_partitions, filter_records, or_, partitions_from_config, value_partitions
+from dead_letter import DeadLetterQueue
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from resilience import RetryBudget
+
+
+def test_auth(feishu):
+    """
+    测试认证功能
+    """
+    assert feishu.get_access_token()
+    assert feishu.ensure_token() == feishu.access_token
+
+
+def test_write_data(feishu, mock):
+    """
+    测试创建、更新、删除记录
+    """
+    result = feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "test_12345"})
+    record_id = result["data"]["record"]["record_id"]
+
+    assert feishu.update_record(APP_TOKEN, TABLE_ID, record_id, {"pid": "updated_12345"})
+    assert mock.records(APP_TOKEN, TABLE_ID)[0]["fields"] == {"pid": "updated_12345"}
+
+    assert feishu.delete_record(APP_TOKEN, TABLE_ID, record_id)
+    assert mock.records(APP_TOKEN, TABLE_ID) == []
+    assert feishu.delete_record(APP_TOKEN, TABLE_ID, record_id) is None
+
+
+def test_read_all_pages(feishu, mock):
+    """
+    测试分页读取全部数据
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [{"handle": f"user{i}"} for i in range(250)])
+
+    first_page = feishu.get_sheet_data(APP_TOKEN, TABLE_ID, page_size=100)
+    assert len(first_page["data"]["items"]) == 100
+    assert first_page["data"]["has_more"]
+
+    result = feishu.get_sheet_data(APP_TOKEN, TABLE_ID, page_size=100, get_all=True)
+    assert [item["fields"]["handle"] for item in result["data"]["items"]] == [f"user{i}" for i in range(250)]
+    assert mock.stats()["calls"]["list_records"] == 4
+
+    view = feishu.get_view_data(APP_TOKEN, TABLE_ID, "vew_mock", page_size=100, get_all=True)
+    assert view["data"]["total"] == 250
+
+
+def test_search_filter(feishu, mock):
+    """
+    测试按条件查询，空单元格与 isEmpty 匹配
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [
+        {"product_id": "1", "product_source_imgs": "http://img/1.jpg"},
+        {"product_id": "2", "product_source_imgs": ""},
+        {"product_id": "3"},
+    ])
+    filter_formula = {
+        "conjunction": "and",
+        "conditions": [{"field_name": "product_source_imgs", "operator": "isEmpty", "value": []}],
+    }
+    result = feishu.get_records_by_filter(APP_TOKEN, TABLE_ID, filter_formula, page_size=1, get_all=True)
+    assert sorted(item["fields"]["product_id"] for item in result["data"]["items"]) == ["2", "3"]
+
+
+def test_delete_duplicates(feishu, mock):
+    """
+    测试批量删除重复记录
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [{"重复": "重复"}] * 3 + [{"重复": ""}])
+    assert feishu.delete_duplicate_records(APP_TOKEN, TABLE_ID) == 3
+    assert len(mock.records(APP_TOKEN, TABLE_ID)) == 1
+    assert mock.stats()["calls"]["batch_delete"] == 1
+
+
+def test_error_injection(feishu, mock):
+    """
+    测试注入的服务端错误被识别为失败，开启重试时重试成功
+    """
+    feishu.ensure_token()
+    feishu.retries = 0
+    mock.inject_errors(1, status=500)
+    assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "x"}) is None
+    assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "x"})
+
+    feishu.retries = 1
+    mock.inject_errors(1, status=500)
+    assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "y"})
+    assert len(mock.records(APP_TOKEN, TABLE_ID)) == 2
+
+
+def test_circuit_breaker(feishu, mock):
+    """
+    测试连续失败后熔断，熔断期间不再请求飞书
+    """
+    feishu.ensure_token()
+    feishu.retries = 0
+    mock.inject_errors(10, status=500)
+    for _ in range(feishu.breaker.failure_threshold + 3):
+        assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "x"}) is None
+    assert feishu.breaker.state == feishu.breaker.OPEN
+    assert mock.stats()["calls"]["create_record"] == feishu.breaker.failure_threshold
+
+
+def test_retry_budget_resets_per_job(feishu, mock):
+    """
+    测试共用的实例在新任务开始时换用新的重试预算
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [{"n": 1}])
+    feishu.ensure_token()
+    feishu.retry_policy.budget = RetryBudget(ratio=0, min_retries=0)
+    mock.inject_errors(1)
+    assert not feishu.get_sheet_data(APP_TOKEN, TABLE_ID)
+
+    budget = feishu.reset_retry_budget()
+    mock.inject_errors(1)
+    assert feishu.get_sheet_data(APP_TOKEN, TABLE_ID)["data"]["items"]
+    assert budget.stats()["retries"] == 1
+
+
+def test_idempotent_retry(feishu, mock, tmp_path):
+    """
+    测试写入成功但响应丢失时，使用同一个 client_token 重试不会重复创建；
+    重试后仍失败的写入进入死信文件，重新提交后不产生重复记录
+    """
+    feishu.ensure_token()
+    mock.lose_responses(1)
+    assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "x"})
+    assert len(mock.records(APP_TOKEN, TABLE_ID)) == 1
+    assert mock.stats()["calls"]["idempotent_replays"] == 1
+
+    feishu.dead_letters = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+    feishu.retries = 0
+    mock.lose_responses(2)
+    assert feishu.batch_create_records(APP_TOKEN, TABLE_ID, [{"pid": "a"}, {"pid": "b"}]) == []
+    record_id = mock.records(APP_TOKEN, TABLE_ID)[0]["record_id"]
+    assert feishu.update_record(APP_TOKEN, TABLE_ID, record_id, {"pid": "x2"}) is None
+    mock.inject_errors(1, status=200, code=1254000)
+    assert feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "c"}) is None
+    assert [entry["op"] for entry in feishu.dead_letters.load()] == ["batch_create", "update", "create"]
+
+    assert feishu.dead_letters.replay(feishu) == {"replayed": 4, "failed": 0}
+    assert sorted(r["fields"]["pid"] for r in mock.records(APP_TOKEN, TABLE_ID)) == ["a", "b", "c", "x2"]
+    assert len(feishu.dead_letters) == 0
+
+
+def test_dead_letter_main_resumes_interrupted_replay(tmp_path, monkeypatch, capsys):
+    """
+    死信文件为空时，上次中途退出留下的 .replaying 文件仍然被统计并重新提交
+    """
+    import dead_letter
+
+    path = tmp_path / "dead_letters.jsonl"
+    (tmp_path / "config.json").write_text(json.dumps({"feishu": {"dead_letter_path": str(path)}}), encoding="utf-8")
+    queue = DeadLetterQueue(str(path))
+    with open(queue.replay_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "update", "app_token": APP_TOKEN, "table_id": TABLE_ID,
+                            "record_id": "rec1", "fields": {"pid": "x"}}) + "\n")
+    assert len(queue) == 1
+
+    monkeypatch.setattr("sys.argv", ["dead_letter.py", "--config", str(tmp_path / "config.json"), "--dry-run"])
+    dead_letter.main()
+    out = capsys.readouterr().out
+    assert "共 1 条" in out and "上次中途退出" in out
+
+    replayed = []
+    monkeypatch.setattr(DeadLetterQueue, "replay", lambda self, feishu_sheet, batch_size=500: replayed.append(self.path))
+    monkeypatch.setattr("sys.argv", ["dead_letter.py", "--config", str(tmp_path / "config.json")])
+    dead_letter.main()
+    assert replayed == [str(path)]
+
+
+def test_rate_limit(mock):
+    """
+    测试超过限流后请求失败
+    """
+    mock.rate_limit = 3
+    feishu = FeishuSheet("cli_mock", "secret_mock", base_url=mock.base_url, retries=0)
+    results = [feishu.create_record(APP_TOKEN, TABLE_ID, {"n": i}) for i in range(5)]
+    # 第一个请求用于获取 token
+    assert results.count(None) == 3
+
+
+def test_latency(mock):
+    """
+    测试可配置的延迟
+    """
+    mock.latency = 0.05
+    feishu = FeishuSheet("cli_mock", "secret_mock", base_url=mock.base_url)
+    start = time.perf_counter()
+    feishu.create_record(APP_TOKEN, TABLE_ID, {"pid": "x"})
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_batch_update(feishu, mock):
+    """
+    测试批量更新，记录不存在时整批失败
+    """
+    record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"pid": str(i)} for i in range(5)])
+    updates = [{"record_id": rid, "fields": {"desc": f"d{rid}"}} for rid in record_ids]
+    assert feishu.batch_update_records(APP_TOKEN, TABLE_ID, updates, batch_size=2) == record_ids
+    assert mock.stats()["calls"]["batch_update"] == 3
+    assert all(r["fields"]["desc"] == f"d{r['record_id']}" for r in mock.records(APP_TOKEN, TABLE_ID))
+
+    assert feishu.batch_update_records(APP_TOKEN, TABLE_ID, [{"record_id": "missing", "fields": {}}]) == []
+
+
+def test_projection_and_sort(feishu, mock):
+    """
+    测试只返回指定字段并按字段排序，列表接口和查询接口一致
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [{"handle": f"user{i}", "n": i, "desc": "x" * 100} for i in (3, 1, 2)])
+
+    result = feishu.get_sheet_data(APP_TOKEN, TABLE_ID, field_names=["handle"], sort=["-n"])
+    assert [item["fields"] for item in result["data"]["items"]] == [{"handle": "user3"}, {"handle": "user2"}, {"handle": "user1"}]
+
+    not_empty = {"conjunction": "and", "conditions": [{"field_name": "handle", "operator": "isNotEmpty", "value": []}]}
+    result = feishu.get_records_by_filter(APP_TOKEN, TABLE_ID, not_empty, field_names=["n"], sort=["n"], get_all=True)
+    assert [item["fields"] for item in result["data"]["items"]] == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+
+@pytest.mark.parametrize("where", [
+    Field("product_source_imgs").is_empty(),
+    Field("handle").in_(["user0", "user3"]) & Field("product_source_imgs").not_empty(),
+    Field("views").gt(150) | Field("handle").eq("user0"),
+    Field("created").between(datetime.date(2024, 1, 2), datetime.date(2024, 1, 3)),
+    (Field("handle").eq("user1") | Field("handle").eq("user2")) & Field("views").le(300),
+])
+def test_filter_dsl(feishu, mock, where):
+    """
+    测试查询条件下推到服务端的结果与本地过滤一致
+    """
+    day = 24 * 3600 * 1000
+    start = int(datetime.datetime(2024, 1, 1).timestamp() * 1000)
+    mock.add_records(APP_TOKEN, TABLE_ID, [
+        {"handle": f"user{i % 4}", "views": i * 50, "created": start + i * day,
+         "product_source_imgs": "" if i % 2 else f"http://img/{i}.jpg"}
+        for i in range(8)
+    ])
+    everything = feishu.get_sheet_data(APP_TOKEN, TABLE_ID, get_all=True)["data"]["items"]
+    pushed = feishu.get_records_by_filter(APP_TOKEN, TABLE_ID, where, get_all=True)["data"]["items"]
+    expected = filter_records(everything, where)
+    assert expected
+    assert [item["record_id"] for item in pushed] == [item["record_id"] for item in expected]
+
+
+def test_filter_dsl_rejects_deep_nesting():
+    """
+    测试超过接口支持的嵌套层数时报错，而不是静默扩大查询范围
+    """
+    where = Field("a").eq(1) & (Field("b").eq(1) | (Field("c").eq(1) & Field("d").eq(1)))
+    with pytest.raises(ValueError):
+        where.compile()
+
+
+def test_filter_dsl_empty_or_matches_nothing():
+    """
+    测试空的 in_ 列表报错，空的 or 组在本地不匹配任何记录且不能下推，避免查询整张表
+    """
+    with pytest.raises(ValueError):
+        Field("handle").in_([])
+    empty = or_()
+    assert not empty.evaluate({"handle": "user0"})
+    assert filter_records([{"fields": {"handle": "user0"}}], empty) == []
+    with pytest.raises(ValueError):
+        empty.compile()
+    with pytest.raises(ValueError):
+        (Field("a").eq(1) & or_()).compile()
+    # 空的 and 组仍然匹配所有记录
+    assert and_().evaluate({"handle": "user0"})
+
+
+def test_partitioned_read_rejects_bad_filter_up_front(feishu, mock):
+    """
+    测试分区读取的过滤条件无法转换时在发出请求前报错
+    """
+    where = Field("b").eq(1) | (Field("c").eq(1) & Field("d").eq(1))
+    with pytest.raises(ValueError):
+        feishu.get_records_partitioned(APP_TOKEN, TABLE_ID, value_partitions("handle", ["user0", "user1"]), where=where)
+    assert "search_records" not in mock.stats()["calls"]
+
+
+def test_partitions_from_config():
+    """
+    测试按配置生成分区：未配置时顺序读取，缺少字段或划分方式时报错
+    """
+    assert partitions_from_config(None) is None
+    assert len(partitions_from_config({"field": "handle", "values": ["a", "b"]})) == 3
+    partitions = partitions_from_config({"field": "created", "start": "2024-01-01", "end": "2024-01-09", "parts": 4})
+    assert len(partitions) == 5
+    with pytest.raises(ValueError):
+        partitions_from_config({"values": ["a"]})
+    with pytest.raises(ValueError):
+        partitions_from_config({"field": "created", "start": "2024-01-01"})
+
+
+@pytest.mark.parametrize("partitions", [
+    value_partitions("handle", ["user0", "user1", "user2"]),
+    date_partitions("created", datetime.date(2024, 1, 3), datetime.date(2024, 1, 20), 4),
+])
+def test_partitioned_read(feishu, mock, partitions):
+    """
+    测试分区并发读取与顺序读取全表的结果一致，空值和区间外的记录不会丢失
+    """
+    day = 24 * 3600 * 1000
+    start = int(datetime.datetime(2024, 1, 1).timestamp() * 1000)
+    mock.add_records(APP_TOKEN, TABLE_ID, [
+        {"handle": f"user{i % 5}", "created": start + (i % 30) * day} for i in range(120)
+    ] + [{"note": "empty"}])
+    serial = feishu.get_sheet_data(APP_TOKEN, TABLE_ID, page_size=50, get_all=True)["data"]["items"]
+
+    result = feishu.get_records_partitioned(APP_TOKEN, TABLE_ID, partitions, page_size=20, max_workers=3, rate_limit=None)
+    assert result["data"]["total"] == len(serial) == 121
+    assert sorted(item["record_id"] for item in result["data"]["items"]) == sorted(item["record_id"] for item in serial)
+
+    where = Field("handle").eq("user1")
+    result = feishu.get_records_partitioned(APP_TOKEN, TABLE_ID, partitions, where=where, field_names=["handle"])
+    assert result["data"]["total"] == 24
+    assert all(item["fields"] == {"handle": "user1"} for item in result["data"]["items"])
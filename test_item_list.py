@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 item_list 响应解析，各 JSON 后端的结果应一致
+"""
+
+import json
+
+import pytest
+
+import fast_json
+from item_list import parse_item_list
+from tiktok_fixtures import TikTokFixtures
+
+BACKENDS = fast_json.available_backends()
+
+
+@pytest.fixture(scope="module")
+def payload():
+    fixtures = TikTokFixtures(videos_per_account=4)
+    return json.dumps(fixtures.item_list("shopdemo"), ensure_ascii=False).encode("utf-8"), fixtures
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_parse_fields(payload, backend):
+    """
+    测试只提取写入表格的字段
+    """
+    body, fixtures = payload
+    item_count, videos = parse_item_list(body, backend=backend)
+    product_ids = fixtures.product_ids_for("shopdemo")
+    assert item_count == 4
+    assert [v.product_id for v in videos] == product_ids
+    first = videos[0].to_feishu_fields()
+    assert set(first) == {"handle", "video_id", "video_create_time", "video_title",
+                          "product_id", "product_title", "product_keyword", "product_imgs"}
+    assert first["handle"] == "shopdemo"
+    assert first["video_create_time"] == "1717000000"
+    assert first["product_title"] == f"Fixture product {product_ids[0]}"
+    assert first["product_imgs"] == str([f"{fixtures.image_base_url}/img/{product_ids[0]}/thumb.jpg"])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_agree_and_tolerate_bad_input(payload, backend):
+    """
+    测试各后端结果一致，非法 UTF-8 被忽略，非 JSON 抛出 ValueError
+    """
+    body, _ = payload
+    assert parse_item_list(body, backend=backend) == parse_item_list(body, backend="json")
+    assert parse_item_list(body.replace(b"#tiktok", b"\xff#tiktok"), backend=backend)[0] == 4
+    assert parse_item_list(b'{"statusCode": 0}', backend=backend) is None
+    with pytest.raises(ValueError):
+        parse_item_list(b"<html></html>", backend=backend)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务进度测试：快照中的吞吐量和预计剩余时间，以及任务列表超过上限时丢弃最早的任务
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import job_progress
+from job_progress import JobProgress, JobRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(job_progress, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_snapshot_throughput_and_eta(clock):
+    progress = JobProgress("product", job_id="job1")
+    progress.set_phase("抓取产品")
+    progress.add_total(10)
+    progress.incr("processed", 4)
+    progress.incr("writes", 3)
+    progress.incr("failures")
+    clock.now += 2
+
+    snapshot = progress.snapshot()
+    assert snapshot["job_id"] == "job1" and snapshot["status"] == "running" and snapshot["phase"] == "抓取产品"
+    assert (snapshot["total"], snapshot["processed"], snapshot["writes"], snapshot["failures"]) == (10, 4, 3, 1)
+    # 2 秒处理 4 条，剩余 6 条约 3 秒
+    assert snapshot["elapsed"] == 2.0 and snapshot["throughput"] == 2.0 and snapshot["eta"] == 3.0
+
+
+def test_snapshot_without_total_or_progress_has_no_eta(clock):
+    progress = JobProgress("monitor")
+    clock.now += 5
+    assert progress.snapshot()["eta"] is None
+    progress.add_total(3)
+    # 还没有处理任何条目，吞吐为 0，无法估算
+    assert progress.snapshot()["eta"] is None and progress.snapshot()["throughput"] == 0
+
+
+def test_finished_job_freezes_elapsed(clock):
+    progress = JobProgress("monitor")
+    progress.add_total(4)
+    progress.incr("processed", 2)
+    clock.now += 4
+    progress.finish("error", "boom")
+    clock.now += 100
+
+    snapshot = progress.snapshot()
+    assert progress.done and snapshot["status"] == "error" and snapshot["error"] == "boom"
+    assert snapshot["elapsed"] == 4.0 and snapshot["throughput"] == 0.5 and snapshot["eta"] is None
+    assert snapshot["finished_at"] == 1004.0
+
+
+def test_registry_evicts_oldest_jobs():
+    registry = JobRegistry(max_jobs=2)
+    first, second, third = (registry.create(job) for job in ("monitor", "product", "monitor"))
+    assert registry.get(first.job_id) is None
+    assert registry.get(third.job_id) is third
+    assert [p.job_id for p in registry.list()] == [second.job_id, third.job_id]
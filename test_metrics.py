@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标测试：文本格式输出、直方图分桶、标签转义，以及任务失败时按 error 计数
+"""
+
+import pytest
+
+from metrics import JOB_RUNS, Counter, Histogram, Registry, timed
+from tiktok_pid_to_product import main_process_empty_product_source_imgs
+
+
+def test_render_counter_and_histogram():
+    registry = Registry()
+    requests = Counter("requests_total", "请求次数", ["method", "status"], registry=registry)
+    latency = Histogram("latency_seconds", "耗时", ["method"], buckets=(0.1, 1), registry=registry)
+    requests.inc(method="get", status=200)
+    requests.inc(2, method="get", status=200)
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value, method="get")
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == [
+        "# HELP requests_total 请求次数",
+        "# TYPE requests_total counter",
+        'requests_total{method="get",status="200"} 3',
+    ]
+    # 分桶为累计计数，最后一个为 +Inf
+    assert lines[3:] == [
+        "# HELP latency_seconds 耗时",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{method="get",le="0.1"} 1',
+        'latency_seconds_bucket{method="get",le="1"} 3',
+        'latency_seconds_bucket{method="get",le="+Inf"} 4',
+        'latency_seconds_sum{method="get"} 4.05',
+        'latency_seconds_count{method="get"} 4',
+    ]
+
+
+def test_label_values_escaped():
+    registry = Registry()
+    errors = Counter("errors_total", "错误次数", ["message"], registry=registry)
+    errors.inc(message='bad "path" C:\\tmp\nnext')
+    assert 'errors_total{message="bad \\"path\\" C:\\\\tmp\\nnext"} 1' in registry.render().splitlines()
+
+
+def test_labels_must_match():
+    counter = Counter("labelled_total", "计数", ["job"], registry=Registry())
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_timed_counts_errors():
+    registry = Registry()
+    duration = Histogram("job_seconds", "耗时", ["job"], registry=registry)
+    runs = Counter("job_runs", "次数", ["job", "status"], registry=registry)
+
+    @timed(duration, runs, job="demo")
+    def run(fail):
+        if fail:
+            raise RuntimeError("boom")
+
+    run(False)
+    with pytest.raises(RuntimeError):
+        run(True)
+    assert runs.get(job="demo", status="success") == 1 and runs.get(job="demo", status="error") == 1
+    assert duration.get_count(job="demo") == 2
+
+
+def test_product_job_config_error_counted_as_failure():
+    before = JOB_RUNS.get(job="product", status="error")
+    # 缺少飞书凭证和表格参数
+    with pytest.raises(RuntimeError):
+        main_process_empty_product_source_imgs(config={"feishu": {}, "bitable": {}})
+    assert JOB_RUNS.get(job="product", status="error") == before + 1
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试爬虫数据模型与飞书字段的对应关系
+"""
+
+import pytest
+
+from models import ImageRef, ProductRecord, ScrapeResult, VideoRecord
+
+
+def test_product_feishu_fields():
+    """
+    测试产品图片按行写入 product_source_imgs
+    """
+    product = ProductRecord("1729", "title", "desc", [ImageRef("http://img/1.jpg"), ImageRef("http://img/2.jpg", "Red", "sku")])
+    assert product.has_image("http://img/2.jpg")
+    assert product.to_feishu_fields() == {"product_desc": "desc", "product_source_imgs": "http://img/1.jpg\nhttp://img/2.jpg"}
+
+    result = ScrapeResult("1729", "rec1", "success", product)
+    assert result.count == 2
+    assert result.to_dict()["product"]["images"][1] == {"url": "http://img/2.jpg", "title": "Red", "type": "sku"}
+    assert ScrapeResult("1729", "rec1", "error", error="boom").count == 0
+
+
+def test_records_use_slots():
+    """
+    测试记录不带 __dict__，不能随意添加属性
+    """
+    video = VideoRecord(handle="shopdemo", product_id="1729")
+    assert not hasattr(video, "__dict__")
+    assert video.to_feishu_fields()["handle"] == "shopdemo"
+    with pytest.raises(AttributeError):
+        video.extra = 1
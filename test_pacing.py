@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导航节奏测试：同一域名的导航间隔和抖动，以及只配置部分参数时其余参数使用默认值
+（使用假时钟，不真正等待）
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import pacing
+from pacing import DEFAULT_PACING, PacingScheduler
+
+
+def test_partial_config_keeps_defaults():
+    pacer = PacingScheduler.from_config({"pacing": {"product": {"jitter": 0.5}}}, "product")
+    assert pacer.min_interval == DEFAULT_PACING["product"]["min_interval"]
+    assert pacer.jitter == 0.5
+
+    pacer = PacingScheduler.from_config({"pacing": {"monitor": {"min_interval": 0, "jitter": 0}}}, "monitor")
+    assert (pacer.min_interval, pacer.jitter) == (0, 0)
+    assert PacingScheduler.from_config(None, "monitor").min_interval == DEFAULT_PACING["monitor"]["min_interval"]
+
+
+class FakeClock:
+    """
+    替代 pacing 模块中的 time：sleep 只推进时间，不真正等待
+    """
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        # 协程并发等待，只记录时长，不推进时间
+        self.sleeps.append(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pacing, "time", clock)
+    monkeypatch.setattr(pacing, "asyncio", SimpleNamespace(sleep=clock.async_sleep))
+    # 抖动取上限，便于断言
+    monkeypatch.setattr(pacing, "random", SimpleNamespace(uniform=lambda low, high: high))
+    return clock
+
+
+def test_wait_spaces_navigations_per_domain(clock):
+    pacer = PacingScheduler(min_interval=2.0, jitter=0.5)
+    assert pacer.wait("https://www.tiktok.com/@a") == 0
+    # 同一域名：至少间隔 min_interval + 抖动
+    assert pacer.wait("https://www.tiktok.com/@b") == 2.5
+    # 其他域名不受影响
+    assert pacer.wait("https://shop.tiktok.com/view/product/1") == 0
+    # 距上次导航已经过了足够时间，不再等待
+    clock.now += 10
+    assert pacer.wait("https://www.tiktok.com/@c") == 0
+    assert clock.sleeps == [2.5]
+    assert pacer.stats() == {"navigations": 4, "wait_seconds": 2.5}
+
+
+def test_wait_counts_elapsed_time_and_domain_overrides(clock):
+    pacer = PacingScheduler(min_interval=2.0, domains={"shop.tiktok.com": {"min_interval": 5.0, "jitter": 0}})
+    pacer.wait("https://www.tiktok.com/@a")
+    # 两次导航之间已经过去的时间从间隔中扣除
+    clock.now += 1.5
+    assert pacer.wait("https://www.tiktok.com/@b") == pytest.approx(0.5)
+    pacer.wait("https://shop.tiktok.com/view/product/1")
+    assert pacer.wait("https://shop.tiktok.com/view/product/2") == 5.0
+
+
+def test_async_wait_reserves_slots_in_order(clock):
+    pacer = PacingScheduler(min_interval=1.0, jitter=0.0)
+
+    async def navigate_three():
+        # 三个协程同时导航同一域名，按预留顺序依次间隔 min_interval
+        return await asyncio.gather(*(pacer.async_wait(f"https://www.tiktok.com/@{i}") for i in range(3)))
+
+    assert asyncio.run(navigate_three()) == [0, 1.0, 2.0]
+    assert clock.sleeps == [1.0, 2.0]
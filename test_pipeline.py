@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控→产品流水线测试：写入缓冲创建的视频记录立即交给产品抓取，监控结束前就开始补全产品图片
+（不启动浏览器，页面抓取结果由 monkeypatch 提供）
+"""
+
+import asyncio
+import threading
+import time
+
+from job_progress import JobProgress
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from models import ImageRef, ProductRecord
+from pipeline import ProductPipeline, run_pipeline
+from tiktok_account_monitor import delete_duplicate_rows
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
+from write_behind import WriteBehindBuffer
+
+
+def one_image_product(scraper, page, product_id):
+    """
+    每个产品一张图片
+    """
+    return ProductRecord(product_id, f"title {product_id}", "", [ImageRef(f"http://img/{product_id}.jpg")])
+
+
+def test_products_scraped_while_crawling(fake_pages, feishu, mock):
+    loads = fake_pages(one_image_product)
+    progress = JobProgress("product")
+    pipeline = ProductPipeline(TikTokProductScraperPlaywright(max_tabs=2), feishu, APP_TOKEN, TABLE_ID,
+                               batch_size=100, progress=progress).start()
+
+    async def crawl():
+        async with WriteBehindBuffer(feishu, APP_TOKEN, TABLE_ID, batch_size=10, flush_interval=0.05,
+                                     on_created=pipeline.on_created) as writer:
+            # 第一个账号：重复的产品合并为一次访问，没有 product_id 的视频不提交
+            for video_id, product_id in [("v1", "1"), ("v2", "1"), ("v3", ""), ("v4", "2")]:
+                await writer.put({"video_id": video_id, "product_id": product_id})
+            # 账号抓取还没结束，第一批产品已经写入表格
+            deadline = time.monotonic() + 5
+            while progress.writes < 3 and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            assert progress.writes == 3
+            await writer.put({"video_id": "v5", "product_id": "3"})
+
+    asyncio.run(crawl())
+    results = pipeline.close()
+
+    assert sorted(loads) == ["1", "2", "3"]
+    assert pipeline.submitted == 4 and len(results) == 4
+    images = {r["fields"]["video_id"]: r["fields"].get("product_source_imgs") for r in mock.records(APP_TOKEN, TABLE_ID)}
+    assert images == {"v1": "http://img/1.jpg", "v2": "http://img/1.jpg", "v3": None,
+                      "v4": "http://img/2.jpg", "v5": "http://img/3.jpg"}
+    assert (progress.total, progress.processed, progress.writes) == (4, 4, 4)
+
+
+def slow_product(scraper, page, product_id):
+    # 产品页加载比账号抓取结束慢（time.sleep 已被替换，用 Event.wait 真实等待）
+    threading.Event().wait(0.2)
+    return one_image_product(scraper, page, product_id)
+
+
+def test_duplicates_deleted_after_products_written(fake_pages, feishu, mock, monkeypatch):
+    fake_pages(slow_product)
+    original = mock.add_records(APP_TOKEN, TABLE_ID, [{"video_id": "v1", "product_id": "1",
+                                                       "product_source_imgs": "http://img/1.jpg"}])
+
+    async def recrawl(progress=None, config=None, feishu_sheet=None, delete_duplicates=True, on_created=None, **kwargs):
+        # 重新抓到已有的视频：新建的行被标记为重复，同时交给产品抓取
+        async with WriteBehindBuffer(feishu_sheet, APP_TOKEN, TABLE_ID, flush_interval=0.01, on_created=on_created) as writer:
+            await writer.put({"video_id": "v1", "product_id": "1", "重复": "重复"})
+        if delete_duplicates:
+            delete_duplicate_rows(feishu_sheet, APP_TOKEN, TABLE_ID, progress)
+
+    monkeypatch.setattr("pipeline.update_titkok_video", recrawl)
+    config = {
+        "bitable": {"app_token": APP_TOKEN, "table_id": TABLE_ID},
+        "pacing": {"product": {"min_interval": 0, "jitter": 0}},
+        "product": {"cache_enabled": False},
+    }
+    product_progress = JobProgress("product")
+    results = asyncio.run(run_pipeline(product_progress=product_progress, config=config, feishu_sheet=feishu,
+                                       scraper=TikTokProductScraperPlaywright(max_tabs=2)))
+
+    # 产品更新先写入重复行，之后才删除重复行，批量更新没有失败
+    assert len(results) == 1
+    assert (product_progress.writes, product_progress.failures) == (1, 0)
+    assert [r["record_id"] for r in mock.records(APP_TOKEN, TABLE_ID)] == original
+
+
+def test_seeds_rows_still_missing_images(fake_pages, feishu, mock, monkeypatch):
+    loads = fake_pages(one_image_product)
+    # 之前抓取失败的行和已经有图片的行
+    failed, done = mock.add_records(APP_TOKEN, TABLE_ID, [
+        {"video_id": "v1", "product_id": "1"},
+        {"video_id": "v2", "product_id": "2", "product_source_imgs": "http://img/2.jpg"},
+    ])
+
+    async def no_new_videos(**kwargs):
+        pass
+
+    monkeypatch.setattr("pipeline.update_titkok_video", no_new_videos)
+    config = {
+        "feishu": {"app_id": "cli_mock", "app_secret": "secret_mock"},
+        "bitable": {"app_token": APP_TOKEN, "table_id": TABLE_ID},
+        "pacing": {"product": {"min_interval": 0, "jitter": 0}},
+        "product": {"cache_enabled": False},
+    }
+    asyncio.run(run_pipeline(config=config, feishu_sheet=feishu, scraper=TikTokProductScraperPlaywright(max_tabs=2)))
+
+    assert loads == ["1"]
+    images = {r["record_id"]: r["fields"].get("product_source_imgs") for r in mock.records(APP_TOKEN, TABLE_ID)}
+    assert images == {failed: "http://img/1.jpg", done: "http://img/2.jpg"}
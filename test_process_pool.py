@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多进程抓取：分片交给多个工作进程，结果发回主进程批量写入（不启动浏览器）
+"""
+
+import json
+import os
+
+from concurrency import AdaptiveConcurrency
+from job_progress import JobProgress
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from models import ImageRef, ProductRecord
+from process_pool import shard_tasks
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+
+class FakeScraper(TikTokProductScraperPlaywright):
+    """
+    不启动浏览器，产品标题为处理它的进程号；product_id 为 "bad" 时获取失败
+    """
+    def open_browser(self):
+        pass
+
+    def create_page(self):
+        return None
+
+    def close(self):
+        pass
+
+    def _get_product_images_with_page(self, page, product_id):
+        if product_id == "bad":
+            return None
+        return ProductRecord(product_id, str(os.getpid()), "", [ImageRef(f"http://img/{product_id}.jpg")])
+
+
+def test_shard_tasks():
+    assert shard_tasks(list(range(7)), 3) == [[0, 3, 6], [1, 4], [2, 5]]
+    assert shard_tasks([1], 4) == [[1]]
+
+
+def test_results_stream_back_for_batched_writes(feishu, mock):
+    record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": str(i)} for i in range(8)])
+    tasks = [{"product_id": str(i), "record_id": rid} for i, rid in enumerate(record_ids)]
+    bad_id = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": "bad"}])[0]
+    tasks.append({"product_id": "bad", "record_id": bad_id})
+
+    progress = JobProgress("product")
+    scraper = FakeScraper(max_tabs=2)
+    results = scraper.scrape_products(tasks, feishu, APP_TOKEN, TABLE_ID, batch_size=4, progress=progress, processes=2)
+
+    assert len(results) == 9
+    statuses = {r.product_id: r.status for r in results}
+    assert statuses.pop("bad") == "failed" and set(statuses.values()) == {"success"}
+    # 两个进程各处理一个分片，写入只发生在主进程
+    pids = {r.product.product_title for r in results if r.product}
+    assert len(pids) == 2 and str(os.getpid()) not in pids
+    assert mock.stats()["calls"]["batch_update"] == 2
+    assert mock.records(APP_TOKEN, TABLE_ID)[3]["fields"]["product_source_imgs"] == "http://img/3.jpg"
+    assert (progress.processed, progress.writes, progress.failures) == (9, 8, 1)
+
+
+def test_adaptive_concurrency_split_across_processes(tmp_path):
+    log_path = tmp_path / "decisions.jsonl"
+    concurrency = AdaptiveConcurrency(initial=4, min_limit=2, max_limit=6, window=1, log_path=str(log_path))
+    scraper = FakeScraper(concurrency=concurrency)
+    tasks = [{"product_id": str(i), "record_id": f"rec{i}"} for i in range(4)]
+    results = scraper.scrape_products(tasks, processes=2)
+
+    assert len(results) == 4
+    # 每个进程按一半的初始值和上下限创建自己的控制器，每处理一个页面做一次决策：2 -> 3，然后保持在上限 3
+    decisions = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert sorted((d["from"], d["to"]) for d in decisions) == [(2, 3), (2, 3), (3, 3), (3, 3)]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品缓存测试：有效期、按最近访问淘汰、跨实例持久化，以及批量抓取命中缓存时不打开浏览器
+"""
+
+import time
+
+from job_progress import JobProgress
+from models import ImageRef, ProductRecord
+from product_cache import ProductCache
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
+
+
+def product(product_id):
+    return ProductRecord(product_id, f"title {product_id}", "desc", [ImageRef(f"http://img/{product_id}.jpg", "Red", "sku")])
+
+
+def test_roundtrip_and_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ProductCache(path)
+    assert cache.get("1") is None
+    cache.put(product("1"))
+    # 没有图片的结果不缓存
+    cache.put(ProductRecord("2"))
+    cache.close()
+
+    reopened = ProductCache(path)
+    assert reopened.get("1") == product("1")
+    assert reopened.get("2") is None
+    assert reopened.stats() == {"hits": 1, "misses": 1, "expired": 0, "evicted": 0}
+
+
+def test_ttl_expiry():
+    cache = ProductCache(None, ttl=0.05)
+    cache.put(product("1"))
+    assert cache.get("1") is not None
+    time.sleep(0.06)
+    assert cache.get("1") is None
+    assert len(cache) == 0 and cache.stats()["expired"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = ProductCache(None, max_entries=2)
+    cache.put(product("1"))
+    cache.put(product("2"))
+    cache.get("1")
+    cache.put(product("3"))
+    assert cache.get("2") is None
+    assert cache.get("1") is not None and cache.get("3") is not None
+    assert cache.stats()["evicted"] == 1
+
+
+def test_cached_products_skip_browser(fake_pages):
+    loads = fake_pages(lambda scraper, page, product_id: product(product_id))
+
+    scraper = TikTokProductScraperPlaywright(max_tabs=2, cache=ProductCache(None))
+    tasks = [{"product_id": pid, "record_id": f"rec{pid}"} for pid in ("1", "2")]
+    scraper.scrape_products(tasks)
+    assert sorted(loads) == ["1", "2"]
+
+    progress = JobProgress("product")
+    results = scraper.scrape_products(tasks + [{"product_id": "3", "record_id": "rec3"}], progress=progress)
+    assert sorted(loads) == ["1", "2", "3"]
+    assert all(r.status == "success" for r in results)
+    assert progress.snapshot()["cache_hits"] == 2
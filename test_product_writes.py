@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试产品任务的批量、按差异写入（不启动浏览器，页面抓取结果由 monkeypatch 提供）
+"""
+
+import pytest
+
+from fingerprints import FingerprintStore
+from job_progress import JobProgress
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from models import ImageRef, ProductRecord
+from tiktok_pid_to_product import TikTokProductScraperPlaywright, get_empty_product_source_imgs_records
+
+
+def even_images(scraper, page, product_id):
+    """
+    product_id 为偶数时返回一张图片，奇数时没有图片
+    """
+    images = [ImageRef(f"http://img/{product_id}.jpg")] if int(product_id) % 2 == 0 else []
+    return ProductRecord(product_id, f"title {product_id}", "", images)
+
+
+@pytest.fixture
+def scraper(fake_pages):
+    fake_pages(even_images)
+    return TikTokProductScraperPlaywright(max_tabs=3)
+
+
+def test_batched_diff_aware_writes(scraper, feishu, mock, tmp_path):
+    record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": str(i)} for i in range(10)])
+    tasks = [{"product_id": str(i), "record_id": rid} for i, rid in enumerate(record_ids)]
+    store = FingerprintStore(str(tmp_path / "fingerprints.json"))
+
+    scraper.scrape_products(tasks, feishu, APP_TOKEN, TABLE_ID, batch_size=4, fingerprints=store)
+    assert mock.stats()["calls"]["batch_update"] == 3
+    assert mock.stats()["calls"].get("update_record", 0) == 0
+    assert mock.records(APP_TOKEN, TABLE_ID)[2]["fields"]["product_source_imgs"] == "http://img/2.jpg"
+
+    # 重跑：指纹与上次写入相同，不再调用更新接口
+    mock.reset_stats()
+    scraper.scrape_products(tasks, feishu, APP_TOKEN, TABLE_ID, batch_size=4, fingerprints=FingerprintStore(store.path))
+    assert "batch_update" not in mock.stats()["calls"]
+
+    # 携带表格当前值时以当前值为准：图片被清空的记录重新写入，没有图片的记录跳过
+    current = [dict(task, fields={"product_desc": "", "product_source_imgs": None}) for task in tasks]
+    progress = JobProgress("product")
+    scraper.scrape_products(current, feishu, APP_TOKEN, TABLE_ID, batch_size=100, progress=progress, fingerprints=store)
+    assert mock.stats()["calls"]["batch_update"] == 1
+    assert (progress.writes, progress.skipped) == (5, 5)
+
+
+def test_duplicate_products_scraped_once(scraper, fake_pages, feishu, mock):
+    loads = fake_pages(even_images)
+    product_ids = ["2", "4", "2", "2", "4", "6"]
+    record_ids = mock.add_records(APP_TOKEN, TABLE_ID, [{"product_id": pid} for pid in product_ids])
+    tasks = [{"product_id": pid, "record_id": rid} for pid, rid in zip(product_ids, record_ids)]
+
+    progress = JobProgress("product")
+    results = scraper.scrape_products(tasks, feishu, APP_TOKEN, TABLE_ID, batch_size=100, progress=progress)
+    assert sorted(loads) == ["2", "4", "6"]
+    # 每条记录都有结果并写入对应产品的图片，且合并在一次批量更新中
+    assert sorted(r.record_id for r in results) == sorted(record_ids)
+    assert mock.stats()["calls"]["batch_update"] == 1
+    for pid, record in zip(product_ids, mock.records(APP_TOKEN, TABLE_ID)):
+        assert record["fields"]["product_source_imgs"] == f"http://img/{pid}.jpg"
+    assert (progress.processed, progress.writes) == (6, 6)
+
+
+def test_empty_records_read_by_partition(feishu, mock):
+    """
+    测试配置 read_partitions 后按分区并发读取待抓取的记录，结果与顺序读取相同
+    """
+    mock.add_records(APP_TOKEN, TABLE_ID, [
+        {"product_id": str(i), "handle": f"user{i % 4}", **({"product_source_imgs": "http://img"} if i % 3 == 0 else {})}
+        for i in range(60)
+    ] + [{"product_id": "60"}])
+    config = {
+        "feishu": {"app_id": "cli_mock", "app_secret": "secret_mock"},
+        "bitable": {"app_token": APP_TOKEN, "table_id": TABLE_ID},
+    }
+    serial = get_empty_product_source_imgs_records(config=config, feishu_sheet=feishu)
+    searches = mock.stats()["calls"]["search_records"]
+
+    config["product"] = {"read_partitions": {"field": "handle", "values": ["user0", "user1", "user2"]}, "read_workers": 2}
+    partitioned = get_empty_product_source_imgs_records(config=config, feishu_sheet=feishu)
+    # 3 个取值分区加 1 个覆盖其余值和空值的分区
+    assert mock.stats()["calls"]["search_records"] - searches == 4
+    assert len(serial) == 41
+    assert sorted(r["record_id"] for r in partitioned) == sorted(r["record_id"] for r in serial)
+    assert "60" in {r["product_id"] for r in partitioned}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+容错策略测试：异常分类、退避、重试预算、熔断器和同步/异步重试
+"""
+
+import asyncio
+import time
+
+import pytest
+import requests
+
+from resilience import (
+    FATAL, TRANSIENT, Backoff, CircuitBreaker, CircuitOpenError, RetryableError, RetryBudget, RetryPolicy, classify,
+)
+
+NO_WAIT = Backoff(base=0.0)
+
+
+class Flaky:
+    """
+    前 failures 次调用抛出 exc，之后返回 "ok"
+    """
+    def __init__(self, failures, exc=None):
+        self.failures = failures
+        self.exc = exc or requests.ConnectionError("reset")
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc
+        return "ok"
+
+
+@pytest.mark.parametrize("exc, kind", [
+    (requests.Timeout(), TRANSIENT),
+    (requests.ConnectionError(), TRANSIENT),
+    (asyncio.TimeoutError(), TRANSIENT),
+    (RetryableError("busy", status=503), TRANSIENT),
+    (ValueError("bad json"), FATAL),
+    (KeyError("field"), FATAL),
+    (CircuitOpenError("feishu", 1.0), FATAL),
+])
+def test_classify(exc, kind):
+    assert classify(exc) == kind
+
+
+def test_backoff_grows_with_jitter():
+    backoff = Backoff(base=1.0, factor=2.0, max_delay=5.0, jitter=0.5)
+    for attempt, full in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)]:
+        delays = [backoff.delay(attempt) for _ in range(50)]
+        assert all(full * 0.5 <= d <= full for d in delays)
+
+
+def test_policy_retries_transient_only():
+    flaky = Flaky(2)
+    assert RetryPolicy("t", attempts=3, backoff=NO_WAIT).call(flaky) == "ok"
+    assert flaky.calls == 3
+
+    fatal = Flaky(1, ValueError("bad"))
+    with pytest.raises(ValueError):
+        RetryPolicy("t", attempts=3, backoff=NO_WAIT).call(fatal)
+    assert fatal.calls == 1
+
+
+def test_policy_retry_result_returns_last():
+    statuses = iter([503, 502, 500])
+    result = RetryPolicy("t", attempts=3, backoff=NO_WAIT).call(lambda: next(statuses), retry_result=lambda s: s >= 500)
+    assert result == 500
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.0, min_retries=2)
+    policy = RetryPolicy("t", attempts=5, backoff=NO_WAIT, budget=budget)
+    flaky = Flaky(10)
+    with pytest.raises(requests.ConnectionError):
+        policy.call(flaky)
+    # 第一次调用加上预算允许的 2 次重试
+    assert flaky.calls == 3
+    assert budget.stats() == {"calls": 3, "retries": 2, "denied": 1}
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker("t", failure_threshold=2, recovery_timeout=0.05)
+    policy = RetryPolicy("t", attempts=1, backoff=NO_WAIT, breaker=breaker)
+    flaky = Flaky(3)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            policy.call(flaky)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # 打开期间直接拒绝，不调用目标
+    with pytest.raises(CircuitOpenError):
+        policy.call(flaky)
+    assert flaky.calls == 2
+
+    # 冷却后放行一个探测请求，失败则重新打开
+    time.sleep(0.06)
+    with pytest.raises(requests.ConnectionError):
+        policy.call(flaky)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert policy.call(flaky) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["opened"] == 2
+
+
+def test_fatal_error_does_not_trip_breaker():
+    breaker = CircuitBreaker("t", failure_threshold=1)
+    policy = RetryPolicy("t", attempts=3, backoff=NO_WAIT, breaker=breaker)
+    with pytest.raises(KeyError):
+        policy.call(Flaky(1, KeyError("field")))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_fatal_error_keeps_half_open_breaker():
+    breaker = CircuitBreaker("t", failure_threshold=2, recovery_timeout=0.05)
+    policy = RetryPolicy("t", attempts=1, backoff=NO_WAIT, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            policy.call(Flaky(1))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # 探测请求以不可重试的错误结束：不关闭、不清零失败次数，下一个调用继续探测
+    time.sleep(0.06)
+    with pytest.raises(KeyError):
+        policy.call(Flaky(1, KeyError("field")))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.failures == 2
+    assert policy.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_policy():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    policy = RetryPolicy("t", attempts=3, backoff=NO_WAIT)
+    assert asyncio.run(policy.acall(flaky)) == "ok"
+    assert len(calls) == 3
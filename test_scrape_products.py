@@ -5,7 +5,7 @@
 """
 
 import os
-from tiktok_product_scraper_playwright import TikTokProductScraperPlaywright
+from tiktok_pid_to_product import TikTokProductScraperPlaywright
 from feishu_sheet import FeishuSheet
 import json
 
@@ -74,15 +74,15 @@ def test_scrape_products():
     
     for i, result in enumerate(results):
         print(f"\n第 {i+1} 个产品结果:")
-        print(f"  product_id: {result.get('product_id')}")
-        print(f"  record_id: {result.get('record_id')}")
-        print(f"  status: {result.get('status')}")
-        if result.get('error'):
-            print(f"  error: {result.get('error')}")
-        else:
-            print(f"  product_title: {result.get('product_title')}")
-            print(f"  product_description: {result.get('product_description')[:50]}...")
-            print(f"  image_urls_count: {len(result.get('image_urls', []))}")
+        print(f"  product_id: {result.product_id}")
+        print(f"  record_id: {result.record_id}")
+        print(f"  status: {result.status}")
+        if result.error:
+            print(f"  error: {result.error}")
+        elif result.product:
+            print(f"  product_title: {result.product.product_title}")
+            print(f"  product_description: {result.product.product_description[:50]}...")
+            print(f"  image_urls_count: {result.count}")
     
     print("\n=== 测试完成 ===")
 
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+安全验证协调测试：一个页面探测时其他页面暂停，未通过验证的产品放回队列
+"""
+
+import threading
+import time
+
+import pytest
+
+from job_progress import JobProgress
+from models import ImageRef, ProductRecord
+from security_check import SecurityCheckCoordinator, SecurityCheckPending
+from tiktok_pid_to_product import MAX_SECURITY_REQUEUES, TikTokProductScraperPlaywright
+
+
+class FakePage:
+    """
+    前 challenges 次加载（含刷新）显示安全验证页，wait_for_timeout 按毫秒真实等待
+    """
+    def __init__(self, challenges):
+        self.challenges = challenges
+        self.loads = 0
+        self.waits = []
+
+    def title(self):
+        return "Security Check" if self.loads <= self.challenges else "Product"
+
+    def query_selector(self, selector):
+        return None
+
+    def wait_for_timeout(self, ms):
+        self.waits.append(ms)
+        time.sleep(ms / 1000)
+
+    def reload(self, wait_until=None):
+        self.loads += 1
+
+
+def test_recovered_after_probe():
+    security = SecurityCheckCoordinator(wait_ms=10, max_probes=3)
+    page = FakePage(challenges=2)
+    page.loads = 1
+    security.check(page, "1")
+    # 第一次刷新仍在验证页，等待时间加倍，第二次刷新通过
+    assert page.waits == [10, 20]
+    assert security.stats()["events"] == 1 and security.stats()["recovered"] == 1
+    # 通过后恢复初始等待时间
+    assert security._next_wait_ms == 10
+
+
+def test_probe_exhausted_raises_pending():
+    security = SecurityCheckCoordinator(wait_ms=1, max_probes=2)
+    page = FakePage(challenges=10)
+    page.loads = 1
+    with pytest.raises(SecurityCheckPending):
+        security.check(page, "1")
+    assert not security.paused and security.stats()["recovered"] == 0
+
+
+def test_other_pages_pause_while_probing():
+    security = SecurityCheckCoordinator(wait_ms=200, max_probes=1)
+    prober_page = FakePage(challenges=1)
+    prober_page.loads = 1
+    prober = threading.Thread(target=security.check, args=(prober_page, "1"))
+    prober.start()
+    time.sleep(0.05)
+    assert security.paused
+
+    # 探测期间其他页面遇到验证直接放回队列，不再各自等待
+    other = FakePage(challenges=1)
+    other.loads = 1
+    with pytest.raises(SecurityCheckPending):
+        security.check(other, "2")
+    assert other.waits == []
+
+    waited = security.wait_until_clear()
+    prober.join()
+    assert waited > 0.05
+    stats = security.stats()
+    assert stats["events"] == 1 and stats["detections"] == 2 and stats["recovered"] == 1
+
+
+def test_pending_products_are_requeued(fake_pages):
+    attempts = {}
+    lock = threading.Lock()
+
+    def fake_get(self, page, product_id):
+        with lock:
+            attempts[product_id] = attempts.get(product_id, 0) + 1
+            count = attempts[product_id]
+        if product_id == "blocked" or count == 1:
+            raise SecurityCheckPending(product_id)
+        return ProductRecord(product_id, images=[ImageRef(f"https://cdn/{product_id}.jpg")])
+
+    fake_pages(fake_get)
+
+    scraper = TikTokProductScraperPlaywright(max_tabs=2)
+    progress = JobProgress("product")
+    tasks = [{"product_id": pid, "record_id": f"rec{pid}"} for pid in ("a", "b", "blocked")]
+    results = {r.product_id: r.status for r in scraper.scrape_products_concurrent(tasks, progress=progress)}
+
+    assert results == {"a": "success", "b": "success", "blocked": "error"}
+    assert attempts == {"a": 2, "b": 2, "blocked": MAX_SECURITY_REQUEUES + 1}
+    snapshot = progress.snapshot()
+    assert snapshot["processed"] == 3 and snapshot["requeued"] == 2 + MAX_SECURITY_REQUEUES
+
+
+class FakeProductPage(FakePage):
+    def goto(self, url, wait_until=None, timeout=None):
+        self.loads += 1
+
+    def query_selector_all(self, selector):
+        return []
+
+
+def test_sync_path_uses_coordinator(monkeypatch):
+    monkeypatch.setattr(TikTokProductScraperPlaywright, "open_browser", lambda self: None)
+    security = SecurityCheckCoordinator(wait_ms=1, max_probes=2)
+    scraper = TikTokProductScraperPlaywright(settle_ms=0, security=security)
+
+    # 第一次加载遇到验证，协调器等待后刷新通过，不再固定等待 30 秒
+    scraper.page = FakeProductPage(challenges=1)
+    assert scraper.get_product_images_sync("1") is not None
+    assert scraper.page.waits == [1, 0]
+    assert security.stats()["recovered"] == 1
+
+    # 验证一直未通过时返回 None
+    scraper.page = FakeProductPage(challenges=10)
+    assert scraper.get_product_images_sync("2") is None
+    assert security.stats()["events"] == 2 and not security.paused
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片协调测试：领取、续约、租约过期后重新分配、HTTP 路由，以及本机多个工作进程共同处理一个任务
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shard_coordinator import DONE, FAILED, CoordinatorClient, ShardCoordinator, create_router
+from shard_worker import run_worker
+
+
+def test_expired_lease_is_reassigned():
+    coordinator = ShardCoordinator(lease_seconds=0.05, shard_size=2)
+    job = coordinator.create_job("product", list(range(3)))
+    assert job["shards"] == {"pending": 2, "leased": 0, "done": 0, "failed": 0}
+
+    first = coordinator.claim("a")
+    assert first["items"] == [0, 1] and coordinator.renew(first["shard_id"], first["lease_token"])
+    time.sleep(0.06)
+    # 租约过期后分片交给其他工作端，原工作端的续约和结果都被拒绝
+    second = coordinator.claim("b")
+    assert second["shard_id"] == first["shard_id"] and second["attempt"] == 2
+    assert not coordinator.renew(first["shard_id"], first["lease_token"])
+    assert not coordinator.complete(first["shard_id"], first["lease_token"], {"by": "a"})
+    assert coordinator.complete(second["shard_id"], second["lease_token"], {"by": "b"})
+
+    status = coordinator.job_status(job["job_id"])
+    assert status["results"][0]["result"] == {"by": "b"} and not status["done"]
+
+
+def test_failed_shard_retries_until_max_attempts():
+    done = threading.Event()
+    coordinator = ShardCoordinator(max_attempts=2, on_done=lambda status: done.set())
+    job = coordinator.create_job("monitor", ["https://www.tiktok.com/@a"])
+    for _ in range(2):
+        shard = coordinator.claim("w", ["monitor"])
+        assert coordinator.fail(shard["shard_id"], shard["lease_token"], "boom")
+    assert coordinator.claim("w") is None
+    status = coordinator.job_status(job["job_id"])
+    assert status["done"] and status["shards"]["failed"] == 1 and status["results"][0]["error"] == "boom"
+    assert done.wait(1)
+
+
+def test_http_routes():
+    coordinator = ShardCoordinator(shard_size=2)
+    app = FastAPI()
+    app.include_router(create_router(coordinator, {"product": lambda: [{"product_id": "1", "record_id": "r1"}]}))
+    http = TestClient(app)
+    client = CoordinatorClient("http://testserver", session=http)
+
+    job = http.post("/shards/jobs/product").json()
+    assert job["shards"]["pending"] == 1
+    # 同类型任务未结束时不能重复创建
+    assert http.post("/shards/jobs/product").status_code == 409
+    assert http.post("/shards/jobs/unknown").status_code == 404
+
+    assert client.claim("w1", ["monitor"]) is None
+    shard = client.claim("w1", ["product"])
+    assert shard["items"] == [{"product_id": "1", "record_id": "r1"}]
+    assert client.renew(shard["shard_id"], shard["lease_token"])
+    assert not client.complete(shard["shard_id"], "stale-token", {})
+    assert client.complete(shard["shard_id"], shard["lease_token"], {"success": 1})
+    status = http.get(f"/shards/jobs/{job['job_id']}").json()
+    assert status["done"] and status["results"][0]["result"] == {"success": 1}
+
+
+class CoordinatorManager(BaseManager):
+    pass
+
+
+_shared = {}
+
+
+def _shared_coordinator():
+    if "coordinator" not in _shared:
+        _shared["coordinator"] = ShardCoordinator(lease_seconds=0.5, shard_size=2)
+    return _shared["coordinator"]
+
+
+CoordinatorManager.register("coordinator", callable=_shared_coordinator)
+
+
+def _process(items):
+    # 处理时间超过续约间隔，依赖后台续约保持租约
+    time.sleep(0.3)
+    return {"items": items, "pid": os.getpid()}
+
+
+def _worker(address, authkey, worker_id, crash):
+    manager = CoordinatorManager(address=address, authkey=authkey)
+    manager.connect()
+    coordinator = manager.coordinator()
+    if crash:
+        # 领取分片后进程直接退出，不续约也不上报
+        coordinator.claim(worker_id)
+        os._exit(1)
+    run_worker(coordinator, {"product": _process}, worker_id=worker_id, once=True)
+
+
+def test_local_worker_processes():
+    ctx = multiprocessing.get_context("spawn")
+    authkey = b"shards"
+    manager = CoordinatorManager(address=("127.0.0.1", 0), authkey=authkey, ctx=ctx)
+    manager.start()
+    try:
+        coordinator = manager.coordinator()
+        job = coordinator.create_job("product", list(range(10)))
+
+        crasher = ctx.Process(target=_worker, args=(manager.address, authkey, "crasher", True))
+        crasher.start()
+        crasher.join()
+        time.sleep(0.6)
+
+        workers = [ctx.Process(target=_worker, args=(manager.address, authkey, f"w{i}", False)) for i in range(2)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(30)
+            assert process.exitcode == 0
+
+        status = coordinator.job_status(job["job_id"])
+        assert status["done"] and status["shards"][DONE] == 5 and status["shards"][FAILED] == 0
+        items = sorted(item for shard in status["results"] for item in shard["result"]["items"])
+        assert items == list(range(10))
+        assert sorted(shard["attempts"] for shard in status["results"]) == [1, 1, 1, 1, 2]
+        assert {shard["worker_id"] for shard in status["results"]} <= {"w0", "w1"}
+    finally:
+        manager.shutdown()
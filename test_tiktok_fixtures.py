@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 TikTok 离线回放数据
+"""
+
+import json
+
+import requests
+
+from tiktok_fixtures import TikTokFixtures, TikTokFixtureServer
+
+
+def test_item_list_matches_monitor_format():
+    """
+    item_list 的 anchors.extra 需要能按监控脚本的方式两层解析出产品信息
+    """
+    fixtures = TikTokFixtures(videos_per_account=4)
+    status, content_type, body = fixtures.render("https://www.tiktok.com/api/post/item_list/?uniqueId=demo&count=35")
+    assert status == 200 and "application/json" in content_type
+
+    items = json.loads(body)["itemList"]
+    assert len(items) == 4
+    for item, product_id in zip(items, fixtures.product_ids_for("demo")):
+        assert item["author"]["uniqueId"] == "demo"
+        extra_json = json.loads(item["anchors"][0]["extra"])[0]
+        assert extra_json["id"] == product_id
+        assert json.loads(extra_json["extra"])["product_id"] == product_id
+
+
+def test_security_check_then_pdp():
+    """
+    配置的产品首次访问返回安全验证页，之后返回详情页
+    """
+    fixtures = TikTokFixtures(security_checks={"123": 1})
+    url = "https://www.tiktok.com/shop/pdp/product/123"
+    assert b"Security Check" in fixtures.render(url)[2]
+    page = fixtures.render(url)[2].decode("utf-8")
+    assert "H2-Semibold" in page and page.count("object-cover") == fixtures.images_per_product
+    assert fixtures.hits["security_check"] == 1 and fixtures.hits["pdp"] == 1
+
+
+def test_server_serves_images():
+    """
+    本地服务提供图片下载，详情页中的图片地址指向该服务
+    """
+    fixtures = TikTokFixtures()
+    with TikTokFixtureServer(fixtures) as server:
+        assert server.base_url in fixtures.pdp_html("1")
+        response = requests.get(f"{server.base_url}/img/1/main_0.jpg", timeout=5)
+        assert response.status_code == 200 and response.content.startswith(b"\xff\xd8")
+        assert requests.get(f"{server.base_url}/unknown", timeout=5).status_code == 404
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+webhook 服务任务锁测试：路由返回 202 之前取得任务锁，后台任务结束后释放
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import threading
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # 模块导入时读取当前目录的 config.json
+    (tmp_path / "config.json").write_text(json.dumps({}))
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop("webhook_server", None)
+    module = importlib.import_module("webhook_server")
+    yield module
+    sys.modules.pop("webhook_server", None)
+
+
+def test_pipeline_holds_both_locks_until_task_ends(server, monkeypatch):
+    ran = []
+
+    async def fake_job(progress=None):
+        ran.append("pipeline")
+
+    monkeypatch.setattr(server, "_pipeline_job", lambda product_progress: fake_job)
+
+    async def scenario():
+        tasks = BackgroundTasks()
+        await server.run_pipeline_job(tasks)
+        # 后台任务还没开始，单独触发两个任务都应返回 409
+        for route in (server.run_product, server.run_monitor, server.run_pipeline_job):
+            with pytest.raises(HTTPException) as excinfo:
+                await route(BackgroundTasks())
+            assert excinfo.value.status_code == 409
+        await tasks()
+        assert ran == ["pipeline"]
+        assert not server._monitor_lock.locked() and not server._product_lock.locked()
+
+    asyncio.run(scenario())
+
+
+def test_locks_released_when_job_fails(server, monkeypatch):
+    def failing_job(progress=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server, "_product_job", failing_job)
+
+    async def scenario():
+        tasks = BackgroundTasks()
+        result = await server.run_product(tasks)
+        assert server._product_lock.locked()
+        await tasks()
+        assert not server._product_lock.locked()
+        assert server._jobs.get(result["job_id"]).snapshot()["status"] == "error"
+
+    asyncio.run(scenario())
+
+
+def test_metrics_endpoint(server):
+    from fastapi.testclient import TestClient
+
+    server.metrics.JOB_RUNS.inc(job="product", status="error")
+    # 不进入 with，不触发 lifespan（不连接飞书、不启动浏览器）
+    response = TestClient(server.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE job_runs_total counter" in lines
+    assert any(line.startswith('job_runs_total{job="product",status="error"} ') for line in lines)
+    assert "# TYPE job_duration_seconds histogram" in lines
+
+
+def test_job_events_stream_until_done(server, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "JOB_EVENT_INTERVAL", 0.02)
+    progress = server._jobs.create("product")
+    progress.add_total(2)
+    progress.incr("processed")
+    # 任务在推送几次进度后结束
+    timer = threading.Timer(0.2, progress.finish)
+    timer.start()
+    client = TestClient(server.app)
+    try:
+        response = client.get(f"/jobs/{progress.job_id}/events")
+    finally:
+        timer.cancel()
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0] for lines in events]
+    assert len(names) >= 2 and set(names[:-1]) == {"event: progress"} and names[-1] == "event: done"
+    first = json.loads(events[0][1][len("data: "):])
+    last = json.loads(events[-1][1][len("data: "):])
+    assert (first["status"], first["processed"], first["total"]) == ("running", 1, 2)
+    assert last["status"] == "success" and last["job_id"] == progress.job_id
+
+    assert client.get("/jobs/missing/events").status_code == 404
+    assert client.get(f"/jobs/{progress.job_id}").json()["status"] == "success"
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入缓冲测试：攒批写入、按时间写入、队列满时等待以及写入失败统计
+"""
+
+import asyncio
+
+from job_progress import JobProgress
+from mock_bitable_server import MOCK_APP_TOKEN as APP_TOKEN, MOCK_TABLE_ID as TABLE_ID
+from write_behind import WriteBehindBuffer
+
+
+def test_batches_and_drains(feishu, mock):
+    """
+    测试按 batch_size 攒批，关闭时写完剩余记录
+    """
+    progress = JobProgress("monitor")
+
+    async def run():
+        async with WriteBehindBuffer(feishu, APP_TOKEN, TABLE_ID, batch_size=100, flush_interval=5, progress=progress) as writer:
+            for i in range(250):
+                await writer.put({"video_id": str(i)})
+        return writer
+
+    writer = asyncio.run(run())
+    assert [r["fields"]["video_id"] for r in mock.records(APP_TOKEN, TABLE_ID)] == [str(i) for i in range(250)]
+    assert mock.stats()["calls"]["batch_create"] == 3
+    assert writer.stats()["written"] == 250
+    assert progress.writes == 250
+
+
+def test_flushes_on_interval(feishu, mock):
+    """
+    测试不足 batch_size 时等待 flush_interval 后也会写入
+    """
+    async def run():
+        writer = WriteBehindBuffer(feishu, APP_TOKEN, TABLE_ID, batch_size=100, flush_interval=0.1).start()
+        for i in range(3):
+            await writer.put({"video_id": str(i)})
+        await asyncio.sleep(0.5)
+        written = len(mock.records(APP_TOKEN, TABLE_ID))
+        await writer.close()
+        return written
+
+    assert asyncio.run(run()) == 3
+
+
+def test_backpressure(feishu, mock):
+    """
+    测试写入变慢时队列不会超过容量，put 会等待
+    """
+    mock.latency = 0.05
+
+    async def run():
+        async with WriteBehindBuffer(feishu, APP_TOKEN, TABLE_ID, batch_size=5, flush_interval=0.01, max_queue=10) as writer:
+            for i in range(60):
+                await writer.put({"video_id": str(i)})
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["written"] == 60
+    assert stats["max_depth"] <= 10
+    assert stats["blocked_seconds"] > 0
+
+
+def test_failures_counted(feishu, mock):
+    """
+    测试批量写入失败时按条数统计失败
+    """
+    feishu.ensure_token()
+    mock.inject_errors(1, status=200, code=1254000)
+
+    async def run():
+        async with WriteBehindBuffer(feishu, APP_TOKEN, TABLE_ID, batch_size=4, flush_interval=5) as writer:
+            for i in range(8):
+                await writer.put({"video_id": str(i)})
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["written"] == 4
+    assert stats["failed"] == 4
+    assert len(mock.records(APP_TOKEN, TABLE_ID)) == 4
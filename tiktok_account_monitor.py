@@ -13,15 +13,31 @@ import random
 import platform
 import sys
 from feishu_sheet import FeishuSheet
+from item_list import parse_item_list
+from capture import CaptureStats
+from dead_letter import DeadLetterQueue
+from metrics import JOB_DURATION, JOB_RUNS, PLAYWRIGHT_PHASE, timed
+from pacing import PacingScheduler
+from resilience import TRANSIENT, CircuitBreaker, classify
+from write_behind import WriteBehindBuffer
 
-
-async def intercept_requests(page, url, feishu_sheet=None, app_token=None, table_id=None):
+async def intercept_requests(page, url, feishu_sheet=None, app_token=None, table_id=None, progress=None, pacer=None, capture_wait=5, stats=None, writer=None, breaker=None):
         """
         拦截并分析网络请求
+        progress: JobProgress 实例，可选，用于上报解析的视频数和写入数
+        pacer: PacingScheduler 实例，可选，导航前按域名控制访问间隔
+        capture_wait: 页面加载后继续捕获请求的秒数
+        stats: CaptureStats 实例，可选，多个账号共用时累计统计
+        writer: WriteBehindBuffer 实例，可选，提供时视频放入写入缓冲由后台批量写入，否则逐条同步写入
+        breaker: CircuitBreaker 实例，可选，账号页连续导航失败时熔断，抛出 CircuitOpenError 跳过本账号
+        :return: CaptureStats
         """
-        # 存储所有请求
-        requests_data = []
-        responses_data = []
+        if breaker:
+            breaker.before_call()
+        # 只保存聚合统计，不保存每个请求的完整内容
+        if stats is None:
+            stats = CaptureStats()
+        responses_before = stats.responses
         # 存储异步任务
         tasks = []
 
@@ -33,25 +49,15 @@ async def intercept_requests(page, url, feishu_sheet=None, app_token=None, table
             if "item_list" not in request.url:
                 return
             
-            request_info = {
-                "url": request.url,
-                "method": request.method,
-                "headers": dict(request.headers),
-                "timestamp": time.time()
-            }
-            # 尝试获取请求体
-            try:
-                if request.post_data:
-                    request_info["post_data"] = request.post_data
-            except Exception as e:
-                request_info["post_data_error"] = str(e)
-            
-            requests_data.append(request_info)
+            # 开启环形缓冲区时才读取请求体
+            post_data = None
+            if stats.buffer is not None:
+                try:
+                    post_data = request.post_data
+                except Exception:
+                    pass
+            stats.record_request(request, time.time(), post_data)
             #print(f"\n[请求] {request.method} {request.url}")
-            #print(f"[请求头] {dict(request.headers)}")
-            if request.post_data:
-                #print(f"[请求体] {request.post_data}")
-                pass
 
         def log_response(response):
             """
@@ -61,88 +67,42 @@ async def intercept_requests(page, url, feishu_sheet=None, app_token=None, table
             if "item_list" not in response.request.url:
                 return
             
-            response_info = {
-                "url": response.url,
-                "status": response.status,
-                "status_text": response.status_text,
-                "headers": dict(response.headers),
-                "timestamp": time.time()
-            }
-            responses_data.append(response_info)
+            content_type = response.headers.get("content-type", "")
+            stats.record_response(response, time.time(), content_type)
             #print(f"\n[响应] {response.status} {response.status_text} {response.url}")
-            #print(f"[响应头] {dict(response.headers)}")
             # 尝试获取响应体（仅针对特定内容类型）
-            content_type = response.headers.get("content-type", "")
             if any(ct in content_type for ct in ["application/json", "text/plain", "text/html"]):
                 async def get_response_body():
                     try:
-                        body = await response.body()
+                        with PLAYWRIGHT_PHASE.time(job="monitor", phase="response_body"):
+                            body = await response.body()
                         if body:
+                            extract_start = time.perf_counter()
                             try:
-                                # 尝试解析为 JSON
-                                json_body = json.loads(body.decode('utf-8', errors='ignore'))
-                                #print(f"[响应体] {json.dumps(json_body, indent=2, ensure_ascii=False)}")
-                                
-                                # 提取和处理 itemList 中的 anchors.extra 字段
-                                if "itemList" in json_body:
-                                    item_list = json_body["itemList"]
-                                    print("\n[解析 itemList] 找到 itemList 数组，包含 {} 项".format(len(item_list)))
-                                    
-                                    for i, item in enumerate(item_list):
-                                        if "anchors" in item and isinstance(item["anchors"], list) and item["anchors"]:
-                                            first_anchor = item["anchors"][0]
-                                            if "extra" in first_anchor and isinstance(first_anchor["extra"], str):
-                                                extra_str = first_anchor["extra"]
-                                                #print("\n[解析 anchors] 第 {} 项的 anchors 第一个元素的 extra 字段:".format(i+1))
-                                                #print(f"原始字符串: {extra_str}")
-                                                
-                                                # 尝试将 extra 字符串解析为 JSON
-                                                try:
-                                                    extra_json = json.loads(extra_str)[0]
-                                                    if 'extra' not in extra_json:
-                                                        continue                                                    
-                                                    # 移除不需要的字段
-                                                    unwanted_fields = ['icon', 'actions', 'component_key', 'anchor_strong']
-                                                    for field in unwanted_fields:
-                                                        if field in extra_json:
-                                                            del extra_json[field]
-                                                    try:
-                                                        inner_extra = json.loads(extra_json['extra'])
-                                                        # 只保留 product_id, title, img 三个字段
-                                                        if 'product_id' in inner_extra:
-                                                            extra_json['product_id'] = inner_extra['product_id']
-                                                        if 'title' in inner_extra:
-                                                            extra_json['title'] = inner_extra['title']
-                                                        if 'img' in inner_extra:
-                                                            extra_json['img'] = inner_extra['img']
-                                                    except json.JSONDecodeError as inner_e:
-                                                        print(f"解析 inner extra 失败: {str(inner_e)}")
-                                                    
-                                                    #print("解析结果 (JSON):")
-                                                    #print(json.dumps(extra_json, indent=2, ensure_ascii=False))
-                                                    
-                                                    # 写入飞书表格
-                                                    if feishu_sheet and app_token and table_id:
-                                                        # 构建字段数据
-                                                        fields = {
-                                                            "handle": item.get('author', '').get('uniqueId', ''),
-                                                            "video_id": item.get('id', ''),
-                                                            "video_create_time": str(item.get('createTime', '')),
-                                                            "video_title": item.get('desc', ''),                                                                                                              
-                                                            "product_id": extra_json.get('id', ''),
-                                                            "product_title": extra_json.get('title', ''),
-                                                            "product_keyword": extra_json.get('keyword', ''),
-                                                            "product_imgs": str(extra_json.get('img', '')) if isinstance(extra_json.get('img'), list) else extra_json.get('img', ''),
-                                                        }
-                                                        # 写入记录
-                                                        result = feishu_sheet.create_record(app_token, table_id, fields, f"第 {i+1} 项")
-                                                        if not result:
-                                                            print("写入飞书表格失败")
-                                                except json.JSONDecodeError as e:
-                                                    print(f"解析失败: {str(e)}")
-                            except:
+                                # 只解析写入表格需要的字段，三层 JSON 由 item_list 模块处理
+                                parsed = parse_item_list(body)
+                            except ValueError:
                                 # 非 JSON 格式
+                                parsed = None
                                 print(f"[响应体] {body.decode('utf-8', errors='ignore')[:500]}...")
+                            if parsed:
+                                item_count, videos = parsed
+                                print("\n[解析 itemList] 找到 itemList 数组，包含 {} 项".format(item_count))
+                                for i, video in enumerate(videos):
+                                    if writer:
+                                        # 放入写入缓冲，队列满时在这里等待
+                                        await writer.put(video.to_feishu_fields())
+                                        if progress:
+                                            progress.incr("items")
+                                    # 写入飞书表格
+                                    elif feishu_sheet and app_token and table_id:
+                                        result = feishu_sheet.create_record(app_token, table_id, video.to_feishu_fields(), f"第 {i+1} 项")
+                                        if not result:
+                                            print("写入飞书表格失败")
+                                        if progress:
+                                            progress.incr("items")
+                                            progress.incr("writes" if result else "failures")
+                            PLAYWRIGHT_PHASE.observe(time.perf_counter() - extract_start, job="monitor", phase="extraction")
                     except Exception as e:
                         print(f"[获取响应体失败] {str(e)}")
                 
@@ -150,75 +110,317 @@ async def intercept_requests(page, url, feishu_sheet=None, app_token=None, table
                 task = asyncio.create_task(get_response_body())
                 tasks.append(task)
 
+        def log_request_failed(request):
+            if "item_list" in request.url:
+                stats.record_failure(request)
+
         # 设置请求和响应监听器
         page.on("request", log_request)
         page.on("response", log_response)
+        page.on("requestfailed", log_request_failed)
 
         # 导航到目标 URL
         print(f"\n=== 导航到: {url} ===")
+        if pacer:
+            waited = await pacer.async_wait(url)
+            if waited > 0:
+                print(f"节奏控制：等待 {waited:.1f} 秒后导航")
         try:
             # 使用 domcontentloaded 等待策略，减少超时风险
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            with PLAYWRIGHT_PHASE.time(job="monitor", phase="navigation"):
+                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            if breaker:
+                breaker.record_success()
         except Exception as e:
+            if breaker and classify(e) == TRANSIENT:
+                breaker.record_failure()
             print(f"页面加载超时: {str(e)}")
             print("继续执行，捕获已产生的网络请求...")
 
-        # 等待 5 秒，捕获更多网络请求
-        print("\n=== 等待 5 秒捕获更多请求 ===")
-        await asyncio.sleep(5)
+        # 等待一段时间（默认 5 秒），捕获更多网络请求
+        print(f"\n=== 等待 {capture_wait} 秒捕获更多请求 ===")
+        await asyncio.sleep(capture_wait)
         # 等待所有异步任务完成
         if tasks:
             print(f"\n=== 等待 {len(tasks)} 个异步任务完成 ===")
             await asyncio.gather(*tasks)
             print("所有异步任务已完成")
 
-        # 统计请求数量
+        # 移除监听器，同一页面处理下一个账号时不再触发本账号的处理函数
+        page.remove_listener("request", log_request)
+        page.remove_listener("response", log_response)
+        page.remove_listener("requestfailed", log_request_failed)
+        stats.forget_pending()
+
+        # 统计信息
         print(f"\n=== 统计信息 ===")
-        print(f"总请求数: {len(requests_data)}")
-        print(f"总响应数: {len(responses_data)}")
+        print(f"本账号响应数: {stats.responses - responses_before}")
+        print(f"累计请求方法分布: {dict(stats.methods)}")
+        print(f"累计响应状态码分布: {dict(stats.statuses)}")
 
-        # 分析请求类型
-        request_methods = {}
-        for req in requests_data:
-            method = req["method"]
-            request_methods[method] = request_methods.get(method, 0) + 1
-        print(f"请求方法分布: {request_methods}")
+        return stats
 
-        # 分析响应状态码
-        status_codes = {}
-        for resp in responses_data:
-            status = resp["status"]
-            status_codes[status] = status_codes.get(status, 0) + 1
-        print(f"响应状态码分布: {status_codes}")
 
-        return requests_data, responses_data
+def get_chrome_profile():
+    """
+    根据操作系统获取 Chrome profile 路径和可执行文件候选路径
+    :return: (profile_path, chrome_paths)
+    """
+    system = platform.system()
+    
+    if system == "Windows":
+        # Windows 系统
+        profile_path = os.path.expanduser("~\\AppData\\Local\\Google\\Chrome\\User Data\\Profile 4")
+        chrome_paths = [
+            "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+            "C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe",
+            os.path.expanduser("~\\AppData\\Local\\Google\\Chrome\\Application\\chrome.exe")
+        ]
+    elif system == "Darwin":
+        # macOS 系统
+        profile_path = os.path.expanduser("~/Library/Application Support/Google/Chrome/Profile 4")
+        chrome_paths = [
+            "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+        ]
+    elif system == "Linux":
+        # Linux 系统
+        profile_path = os.path.expanduser("~/.config/google-chrome/Profile 4")
+        chrome_paths = [
+            "/usr/bin/google-chrome",
+            "/usr/bin/chromium-browser",
+            "/usr/bin/chromium"
+        ]
+    else:
+        # 其他系统
+        profile_path = os.path.expanduser("~/.config/google-chrome/Profile 4")
+        chrome_paths = []
+    
+    print(f"当前操作系统: {system}")
+    print(f"使用指定的 Chrome profile: {profile_path}")
+    return profile_path, chrome_paths
+
+
+async def launch_monitor_context(p):
+    """
+    使用系统已安装的 Chrome 和指定 profile 启动持久上下文
+    p: async_playwright 实例
+    """
+    profile_path, chrome_paths = get_chrome_profile()
+    print("\n=== 启动浏览器 ===")
+    try:
+        # 尝试使用系统已安装的 Chrome
+        chrome_exe = None
+        for path in chrome_paths:
+            if os.path.exists(path):
+                chrome_exe = path
+                break
+        
+        if chrome_exe:
+            print(f"使用系统 Chrome: {chrome_exe}")
+            # 使用系统 Chrome 创建持久上下文
+            context = await p.chromium.launch_persistent_context(
+                profile_path,
+                headless=False,
+                executable_path=chrome_exe,
+                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36",
+                viewport={"width": 1920, "height": 1080},
+                accept_downloads=True,
+                locale="en-US",
+                args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-features=IsolateOrigins,site-per-process'
+                ],
+    
+            )
+            print("浏览器启动成功")
+            return context
+        else:
+            print("未找到系统 Chrome 浏览器")
+            raise Exception("未找到可用的 Chrome 浏览器")
+    except Exception as e:
+        print(f"浏览器启动失败: {str(e)}")
+        raise
+
+
+async def crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress=None, pacer=None, capture_wait=5, capture_buffer=0, config=None,
+                         on_created=None):
+    """
+    使用同一个页面顺序处理每个账号 URL
+    pacer: PacingScheduler 实例，可选，控制账号之间的导航间隔
+    capture_wait: 每个账号页面加载后继续捕获请求的秒数
+    capture_buffer: 保留最近多少条 item_list 请求/响应用于排查问题，0 表示只统计
+    config: 配置，可选，从 monitor 部分读取写入缓冲的批量大小、等待时间和队列容量，
+        以及 slow_mo_account_seconds（移除 slow_mo 之前实测的单个账号平均耗时，配置后输出每个账号节省的时间）
+    on_created: 视频记录写入表格后调用 on_created(字段列表, record_id 列表)，可选，流水线模式用于把新产品交给产品抓取
+    :return: CaptureStats
+    """
+    stats = CaptureStats(buffer_size=capture_buffer)
+    # TikTok 不可用时连续多个账号导航失败，熔断后跳过导航和捕获等待，冷却后再探测
+    breaker = CircuitBreaker("tiktok_account")
+    # 视频写入缓冲，所有账号共用，任务结束时写完剩余记录
+    writer = None
+    if feishu_sheet and app_token and table_id:
+        writer = WriteBehindBuffer.from_config(config, feishu_sheet, app_token, table_id, progress, on_created).start()
+    slow_mo_baseline = (config or {}).get("monitor", {}).get("slow_mo_account_seconds")
+    try:
+        await _crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, stats, writer, breaker,
+                              slow_mo_baseline)
+    finally:
+        if writer:
+            await writer.close()
+            print(f"=== 写入缓冲统计: {writer.stats()} ===")
+    return stats
+
+
+def _slow_mo_delta(seconds, baseline):
+    """
+    与移除 slow_mo 之前实测的单个账号耗时比较，未配置 baseline 时返回空字符串
+    baseline 取 benchmarks/bench_pipeline.py --compare-slow-mo 输出的 per_account_seconds.before，
+    压测时 --capture-wait 应与生产的 monitor.capture_wait 相同
+    """
+    if not baseline:
+        return ""
+    saved = baseline - seconds
+    return f"，相比 slow_mo 基线 {baseline:.2f} 秒{'节省' if saved >= 0 else '增加'} {abs(saved):.2f} 秒"
+
+
+async def _crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, stats, writer, breaker,
+                          slow_mo_baseline=None):
+    # 顺序处理每个URL
+    print(f"\n=== 开始处理 {len(url_list)} 个URL ===")
+    if progress:
+        progress.set_phase("抓取账号视频")
+        progress.add_total(len(url_list))
+    crawl_start = time.perf_counter()
+    succeeded_seconds = []
+    for i, url in enumerate(url_list, 1):
+        print(f"\n=== 处理第 {i} 个URL: {url} ===")
+        account_start = time.perf_counter()
+        wait_before = pacer.stats()["wait_seconds"] if pacer else 0.0
+        responses_before = stats.responses
+        try:
+            # 拦截请求
+            await intercept_requests(page, url, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, stats, writer, breaker)
+            print(f"URL {url} 处理成功")
+            # 每个账号的 Playwright 调用：一次 goto 加上每个 item_list 响应的 body()
+            operations = 1 + stats.responses - responses_before
+            elapsed = time.perf_counter() - account_start
+            PLAYWRIGHT_PHASE.observe(elapsed, job="monitor", phase="account")
+            succeeded_seconds.append(elapsed)
+            waited = (pacer.stats()["wait_seconds"] if pacer else 0.0) - wait_before
+            print(f"账号耗时 {elapsed:.1f} 秒（其中节奏等待 {waited:.1f} 秒），"
+                  f"Playwright 调用 {operations} 次{_slow_mo_delta(elapsed, slow_mo_baseline)}")
+        except Exception as e:
+            print(f"URL {url} 处理失败: {str(e)}")
+            if progress:
+                progress.incr("failures")
+            # 记录错误信息
+            print(f"错误详情: {str(e)}")
+            # 继续处理下一个URL
+            continue
+        finally:
+            if progress:
+                progress.incr("processed")
+    if url_list:
+        crawl_seconds = time.perf_counter() - crawl_start
+        print(f"\n=== 节奏统计: {pacer.stats() if pacer else {}}，"
+              f"账号抓取共耗时 {crawl_seconds:.1f} 秒（平均每个账号 {crawl_seconds / len(url_list):.2f} 秒） ===")
+        if succeeded_seconds:
+            average = sum(succeeded_seconds) / len(succeeded_seconds)
+            print(f"=== 成功账号平均耗时 {average:.2f} 秒{_slow_mo_delta(average, slow_mo_baseline)} ===")
+        print(f"=== item_list 请求统计: {stats.summary()}，账号页熔断: {breaker.stats()} ===")
+
+
+def read_handle_urls(feishu_sheet_r, app_token_r, table_id_r, config=None):
+    """
+    从飞书表格读取 handle 并生成账号主页 URL 列表
+    :return: URL 列表，读取失败时为空列表
+    """
+    handles = []
+    try:
+        print("\n=== 从飞书表格读取handle数据 ===")
+        # 只读取 handle 列（bitable_r.handle_field，默认 handle），列名不存在等原因失败时再读取全部字段
+        # 读取全部分页，handle 超过一页（100 条）时也不会遗漏账号
+        handle_field = (config or {}).get('bitable_r', {}).get('handle_field', 'handle')
+        sheet_data = feishu_sheet_r.get_sheet_data(app_token_r, table_id_r, get_all=True, field_names=[handle_field])
+        if not sheet_data:
+            print(f"按字段 {handle_field} 读取失败，改为读取全部字段")
+            sheet_data = feishu_sheet_r.get_sheet_data(app_token_r, table_id_r, get_all=True)
+        if sheet_data:
+            # 提取handle数据
+            records = sheet_data.get('data', {}).get('items', [])
+            print(f"从表格中读取到 {len(records)} 条记录")
+            
+            for record in records:
+                # 尝试从fields中获取handle字段
+                fields = record.get('fields', {})
+                # 查找可能的handle字段名
+                handle = None
+                for key, value in fields.items():
+                    if 'handle' in key.lower() or 'uniqueid' in key.lower():
+                        handle = value
+                        break
+                # 直接检查handle字段
+                if not handle:
+                    handle = fields.get('handle')
+                if handle:
+                    handles.append(handle)
+                    print(f"获取到handle: {handle}")
+            
+            print(f"成功提取 {len(handles)} 个handle")
+        else:
+            print("读取表格数据失败")
+    except Exception as e:
+        print(f"读取handle数据异常: {str(e)}")
+    
+    base_url = "https://www.tiktok.com/@"
+    url_list = [f"{base_url}{handle}" for handle in handles]
+    print(f"\n生成了 {len(url_list)} 个URL")
+    for url in url_list:
+        print(f"- {url}")
+    return url_list
 
 
-async def update_titkok_video():
+@timed(JOB_DURATION, JOB_RUNS, job="monitor")
+async def update_titkok_video(progress=None, config=None, feishu_sheet=None, feishu_sheet_r=None, context=None, cdp_endpoint=None,
+                              urls=None, delete_duplicates=True, on_created=None):
     """
     主函数
-    urls: 目标网址列表或单个网址
+    urls: 目标网址列表或单个网址，可选，为空时从飞书表格读取 handle 生成
+    progress: JobProgress 实例，可选，用于上报任务进度
+    config: 已加载的配置，可选，为空时读取 config.json
+    feishu_sheet / feishu_sheet_r: 共享的写入/读取用 FeishuSheet 实例，可选
+    context: 调用方自己管理的浏览器上下文，可选，任务只在其中新开页面、不关闭上下文。
+             webhook 服务改为通过 cdp_endpoint 连接常驻浏览器后不再传入；保留给需要预先在上下文上
+             安装路由的调用方，如 benchmarks/bench_pipeline.py 用它把请求回放到本地夹具
+    cdp_endpoint: 常驻浏览器服务的 CDP 地址，可选，传入时连接该浏览器而不是临时启动。
+                  context 和 cdp_endpoint 都为空时（命令行运行或常驻浏览器启动失败）用 launch_monitor_context 临时启动 Chrome
+    delete_duplicates: 结束后是否删除重复记录，分片任务由协调端在所有分片完成后统一删除
+    on_created: 视频记录写入表格后调用 on_created(字段列表, record_id 列表)，可选，见 pipeline 模块
     """
     print("=== Playwright 网络请求监听器 ====")
     
     # 从配置文件读取飞书表格信息
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        if config is None:
+            with open('config.json', 'r', encoding='utf-8') as f:
+                config = json.load(f)
         
         # 初始化飞书表格实例（用于写入数据）
-        app_id = config.get('feishu', {}).get('app_id')
-        app_secret = config.get('feishu', {}).get('app_secret')
-        feishu_sheet = FeishuSheet(app_id, app_secret)
+        if feishu_sheet is None:
+            app_id = config.get('feishu', {}).get('app_id')
+            app_secret = config.get('feishu', {}).get('app_secret')
+            feishu_sheet = FeishuSheet(app_id, app_secret, dead_letters=DeadLetterQueue.from_config(config))
         
         # 飞书表格配置（用于写入数据）
         app_token = config.get('bitable', {}).get('app_token')
         table_id = config.get('bitable', {}).get('table_id')
         
         # 初始化飞书表格实例（用于读取handle数据）
-        app_id_r = config.get('feishu_r', {}).get('app_id')
-        app_secret_r = config.get('feishu_r', {}).get('app_secret')
-        feishu_sheet_r = FeishuSheet(app_id_r, app_secret_r)
+        if feishu_sheet_r is None:
+            app_id_r = config.get('feishu_r', {}).get('app_id')
+            app_secret_r = config.get('feishu_r', {}).get('app_secret')
+            feishu_sheet_r = FeishuSheet(app_id_r, app_secret_r)
         
         # 飞书表格配置（用于读取handle数据）
         app_token_r = config.get('bitable_r', {}).get('app_token')
@@ -241,151 +443,70 @@ async def update_titkok_video():
         table_id_r = "your_table_id"
         print("使用默认配置")
     
-    # 从飞书表格读取handle数据
-    handles = []
-    try:
-        print("\n=== 从飞书表格读取handle数据 ===")
-        # 读取表格数据
-        sheet_data = feishu_sheet_r.get_sheet_data(app_token_r, table_id_r)
-        if sheet_data:
-            # 提取handle数据
-            records = sheet_data.get('data', {}).get('items', [])
-            print(f"从表格中读取到 {len(records)} 条记录")
-            
-            for record in records:
-                # 尝试从fields中获取handle字段
-                fields = record.get('fields', {})
-                # 查找可能的handle字段名
-                handle = None
-                for key, value in fields.items():
-                    if 'handle' in key.lower() or 'uniqueid' in key.lower():
-                        handle = value
-                        break
-                # 直接检查handle字段
-                if not handle:
-                    handle = fields.get('handle')
-                if handle:
-                    handles.append(handle)
-                    print(f"获取到handle: {handle}")
-            
-            print(f"成功提取 {len(handles)} 个handle")
-        else:
-            print("读取表格数据失败")
-    except Exception as e:
-        print(f"读取handle数据异常: {str(e)}")
-    
-    # 生成URL列表
-    url_list = []
-    if handles:
-        # 如果提供了handles，生成对应的URL
-        base_url = "https://www.tiktok.com/@"
-        for handle in handles:
-            url = f"{base_url}{handle}"
-            url_list.append(url)
-        print(f"\n生成了 {len(url_list)} 个URL")
-        for url in url_list:
-            print(f"- {url}")
+    # 每个任务使用新的飞书重试预算
+    feishu_sheet.reset_retry_budget()
+
+    # 导航节奏控制（替代原来的 slow_mo）
+    pacer = PacingScheduler.from_config(config, "monitor")
+    capture_wait = (config or {}).get("monitor", {}).get("capture_wait", 5)
+    capture_buffer = (config or {}).get("monitor", {}).get("capture_buffer", 0)
+
+    # 生成URL列表：未指定 urls 时从飞书表格读取 handle
+    if urls is None:
+        if progress:
+            progress.set_phase("读取handle")
+        url_list = read_handle_urls(feishu_sheet_r, app_token_r, table_id_r, config)
     elif isinstance(urls, list):
-        # 如果提供了URL列表，直接使用
+        # 如果提供了URL列表，直接使用（如分片任务分配的账号）
         url_list = urls
     else:
         # 如果只提供了单个URL，转为列表
         url_list = [urls]
     
-    # 根据操作系统获取 Chrome profile 路径和可执行文件路径
-    system = platform.system()
-    
-    if system == "Windows":
-        # Windows 系统
-        profile_path = os.path.expanduser("~\\AppData\\Local\\Google\\Chrome\\User Data\\Profile 4")
-        chrome_paths = [
-            "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
-            "C:\\Program Files (x86)\\Google\\Chrome\\Application\\chrome.exe",
-            os.path.expanduser("~\\AppData\\Local\\Google\\Chrome\\Application\\chrome.exe")
-        ]
-    elif system == "Darwin":
-        # macOS 系统
-        profile_path = os.path.expanduser("~/Library/Application Support/Google/Chrome/Profile 4")
-        chrome_paths = [
-            "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-        ]
-    elif system == "Linux":
-        # Linux 系统
-        profile_path = os.path.expanduser("~/.config/google-chrome/Profile 4")
-        chrome_paths = [
-            "/usr/bin/google-chrome",
-            "/usr/bin/chromium-browser",
-            "/usr/bin/chromium"
-        ]
-    else:
-        # 其他系统
-        profile_path = os.path.expanduser("~/.config/google-chrome/Profile 4")
-        chrome_paths = []
-    
-    print(f"当前操作系统: {system}")
-    print(f"使用指定的 Chrome profile: {profile_path}")
-    
-    async with async_playwright() as p:
-        # 启动浏览器（尝试使用系统已安装的 Chrome）
-        print("\n=== 启动浏览器 ===")
-        try:
-            # 尝试使用系统已安装的 Chrome
-            chrome_exe = None
-            for path in chrome_paths:
-                if os.path.exists(path):
-                    chrome_exe = path
-                    break
-            
-            if chrome_exe:
-                print(f"使用系统 Chrome: {chrome_exe}")
-                # 使用系统 Chrome 创建持久上下文
-                context = await p.chromium.launch_persistent_context(
-                    profile_path,
-                    headless=False,
-                    slow_mo=100,
-                    executable_path=chrome_exe,
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36",
-                    viewport={"width": 1920, "height": 1080},
-                    accept_downloads=True,
-                    locale="en-US",
-                    args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=IsolateOrigins,site-per-process'
-                    ],
-        
-                )
-                page = context.pages[0] if context.pages else await context.new_page()
-                print("浏览器启动成功")
-            else:
-                print("未找到系统 Chrome 浏览器")
-                raise Exception("未找到可用的 Chrome 浏览器")
-        except Exception as e:
-            print(f"浏览器启动失败: {str(e)}")
-            raise
-        
+    if context is not None:
+        # 使用调用方传入的浏览器上下文，任务结束只关闭本次打开的页面，上下文由调用方关闭
+        page = await context.new_page()
         try:
-            # 顺序处理每个URL
-            print(f"\n=== 开始处理 {len(url_list)} 个URL ===")
-            for i, url in enumerate(url_list, 1):
-                print(f"\n=== 处理第 {i} 个URL: {url} ===")
-                try:
-                    # 拦截请求
-                    await intercept_requests(page, url, feishu_sheet, app_token, table_id)
-                    print(f"URL {url} 处理成功")
-                except Exception as e:
-                    print(f"URL {url} 处理失败: {str(e)}")
-                    # 记录错误信息
-                    print(f"错误详情: {str(e)}")
-                    # 继续处理下一个URL
-                    continue
+            await crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, capture_buffer, config, on_created)
         finally:
-            # 关闭浏览器
-            print("\n=== 关闭浏览器 ===")
-            if 'context' in locals():
+            await page.close()
+    elif cdp_endpoint:
+        async with async_playwright() as p:
+            # 连接常驻浏览器服务，复用已登录的 profile；退出时只断开连接，不关闭浏览器
+            print(f"\n=== 连接常驻浏览器: {cdp_endpoint} ===")
+            browser = await p.chromium.connect_over_cdp(cdp_endpoint)
+            context = browser.contexts[0] if browser.contexts else await browser.new_context()
+            page = await context.new_page()
+            try:
+                await crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, capture_buffer, config, on_created)
+            finally:
+                await page.close()
+    else:
+        async with async_playwright() as p:
+            # 启动浏览器（尝试使用系统已安装的 Chrome）
+            context = await launch_monitor_context(p)
+            page = context.pages[0] if context.pages else await context.new_page()
+            try:
+                await crawl_accounts(page, url_list, feishu_sheet, app_token, table_id, progress, pacer, capture_wait, capture_buffer, config, on_created)
+            finally:
+                # 关闭浏览器
+                print("\n=== 关闭浏览器 ===")
                 await context.close()
 
+    if not delete_duplicates:
+        return
+    
     # 删除重复项
+    delete_duplicate_rows(feishu_sheet, app_token, table_id, progress)
+
+
+def delete_duplicate_rows(feishu_sheet, app_token, table_id, progress=None):
+    """
+    删除监控写入的重复记录（重复字段为“重复”的行），失败时只打印错误
+    """
     print("\n=== 删除重复记录 ===")
+    if progress:
+        progress.set_phase("删除重复记录")
     try:
         deleted = feishu_sheet.delete_duplicate_records(app_token, table_id)
         print(f"删除重复记录完成，共删除 {deleted} 条")
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TikTok 离线回放：用保存的 HTML/JSON 模板渲染产品详情页、安全验证页、账号主页和 item_list 接口，
+既可以通过本地 HTTP 服务访问，也可以通过 Playwright 路由直接注入页面，用于可复现的爬虫压测
+"""
+
+import copy
+import json
+import re
+import threading
+import zlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "tiktok"
+
+# 拦截所有请求，未知地址返回 404，保证回放时不访问外网
+ROUTE_PATTERN = "**/*"
+
+_PDP_PATH = re.compile(r"^/shop/pdp/product/(\d+)")
+_ACCOUNT_PATH = re.compile(r"^/@([^/?]+)")
+_IMAGE_PATH = re.compile(r"^/img/")
+
+# 最小的 1x1 JPEG，供图片请求和下载使用
+_JPEG_BYTES = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c19"
+    "12130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b08"
+    "0001000101011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b51000"
+    "02010303020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f0"
+    "2433627282090a161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768"
+    "696a737475767778797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3"
+    "c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fb"
+    "d3ffd9"
+)
+
+
+class TikTokFixtures:
+    def __init__(self, root=FIXTURE_DIR, videos_per_account=3, product_pool=1000, images_per_product=5,
+                 sku_per_product=3, security_checks=None, image_base_url="https://cdn.fixture.local"):
+        """
+        :param root: 模板目录
+        :param videos_per_account: 每个账号 item_list 返回的视频数
+        :param product_pool: 视频关联产品ID的取值范围，越小重复的产品越多
+        :param images_per_product: 每个产品详情页的主图数量
+        :param sku_per_product: 每个产品详情页的SKU图片数量
+        :param security_checks: {product_id: 次数}，前几次访问该产品时返回安全验证页
+        :param image_base_url: 图片地址前缀，使用本地 HTTP 服务时设置为服务地址以便 requests 下载
+        """
+        self.root = Path(root)
+        self.videos_per_account = videos_per_account
+        self.product_pool = product_pool
+        self.images_per_product = images_per_product
+        self.sku_per_product = sku_per_product
+        self.security_checks = dict(security_checks or {})
+        self.image_base_url = image_base_url.rstrip("/")
+        self.hits = defaultdict(int)
+        self._lock = threading.Lock()
+        self._pdp_template = (self.root / "pdp.html").read_text(encoding="utf-8")
+        self._account_template = (self.root / "account.html").read_text(encoding="utf-8")
+        self._security_page = (self.root / "security_check.html").read_bytes()
+        sample = json.loads((self.root / "item_list_sample.json").read_text(encoding="utf-8"))
+        self._item_list_envelope = {k: v for k, v in sample.items() if k != "itemList"}
+        self._item_template = sample["itemList"][0]
+
+    # ---------- 数据生成 ----------
+
+    def product_ids_for(self, handle):
+        """
+        账号视频关联的产品ID，由 handle 确定，保证多次运行结果一致
+        """
+        return [str(1729000000000000000 + zlib.crc32(f"{handle}:{k}".encode()) % self.product_pool)
+                for k in range(self.videos_per_account)]
+
+    def item_list(self, handle):
+        """
+        以保存的 item_list 样本为模板，为指定账号生成视频列表
+        """
+        items = []
+        for k, product_id in enumerate(self.product_ids_for(handle)):
+            item = copy.deepcopy(self._item_template)
+            video_id = str(7400000000000000000 + zlib.crc32(f"{handle}:video:{k}".encode()))
+            item["id"] = video_id
+            item["video"]["id"] = video_id
+            item["createTime"] = 1717000000 + k * 3600
+            item["desc"] = f"{handle} video {k} #tiktokmademebuyit"
+            item["author"]["uniqueId"] = handle
+            anchor = json.loads(item["anchors"][0]["extra"])
+            inner = json.loads(anchor[0]["extra"])
+            inner["product_id"] = product_id
+            inner["title"] = f"Fixture product {product_id}"
+            inner["img"] = [f"{self.image_base_url}/img/{product_id}/thumb.jpg"]
+            anchor[0]["id"] = product_id
+            anchor[0]["keyword"] = f"Fixture product {product_id}"[:30]
+            anchor[0]["extra"] = json.dumps(inner, ensure_ascii=False)
+            item["anchors"][0]["extra"] = json.dumps(anchor, ensure_ascii=False)
+            item["anchors"][0]["id"] = product_id
+            items.append(item)
+        return dict(self._item_list_envelope, itemList=items)
+
+    def pdp_html(self, product_id):
+        """
+        渲染产品详情页，页面结构与爬虫使用的选择器一致
+        """
+        override = self.root / "pdp" / f"{product_id}.html"
+        if override.exists():
+            return override.read_text(encoding="utf-8")
+        main_images = "\n".join(
+            f'      <img class="object-cover" src="{self.image_base_url}/img/{product_id}/main_{n}.jpg">'
+            for n in range(self.images_per_product)
+        )
+        sku_images = "\n".join(
+            f'      <div class="items-center border-solid cursor-pointer"><img title="Color {n}" '
+            f'src="{self.image_base_url}/img/{product_id}/sku_{n}~tplv-resize:200:200.jpg"></div>'
+            for n in range(self.sku_per_product)
+        )
+        return self._pdp_template.format(
+            title=f"Fixture product {product_id}",
+            description=f"Fixture description for product {product_id}. " * 5,
+            main_images=main_images,
+            sku_images=sku_images,
+        )
+
+    # ---------- 请求处理 ----------
+
+    def _hit(self, kind):
+        with self._lock:
+            self.hits[kind] += 1
+
+    def render(self, url):
+        """
+        根据 URL 返回 (状态码, Content-Type, 响应体)
+        """
+        parsed = urlparse(url)
+        path = parsed.path
+
+        match = _PDP_PATH.match(path)
+        if match:
+            product_id = match.group(1)
+            with self._lock:
+                remaining = self.security_checks.get(product_id, 0)
+                if remaining:
+                    self.security_checks[product_id] = remaining - 1
+            if remaining:
+                self._hit("security_check")
+                return 200, "text/html; charset=utf-8", self._security_page
+            self._hit("pdp")
+            return 200, "text/html; charset=utf-8", self.pdp_html(product_id).encode("utf-8")
+
+        if path.startswith("/api/post/item_list"):
+            handle = parse_qs(parsed.query).get("uniqueId", [""])[0]
+            self._hit("item_list")
+            body = json.dumps(self.item_list(handle), ensure_ascii=False).encode("utf-8")
+            return 200, "application/json; charset=utf-8", body
+
+        match = _ACCOUNT_PATH.match(path)
+        if match:
+            self._hit("account")
+            return 200, "text/html; charset=utf-8", self._account_template.format(handle=match.group(1)).encode("utf-8")
+
+        if _IMAGE_PATH.match(path):
+            self._hit("image")
+            return 200, "image/jpeg", _JPEG_BYTES
+
+        self._hit("not_found")
+        return 404, "text/plain", b""
+
+
+def install_routes(target, fixtures):
+    """
+    为同步 Playwright 的 page 或 context 安装回放路由
+    """
+    def handler(route):
+        status, content_type, body = fixtures.render(route.request.url)
+        route.fulfill(status=status, content_type=content_type, body=body)
+
+    target.route(ROUTE_PATTERN, handler)
+
+
+async def install_routes_async(target, fixtures):
+    """
+    为异步 Playwright 的 page 或 context 安装回放路由
+    """
+    async def handler(route):
+        status, content_type, body = fixtures.render(route.request.url)
+        await route.fulfill(status=status, content_type=content_type, body=body)
+
+    await target.route(ROUTE_PATTERN, handler)
+
+
+class TikTokFixtureServer:
+    def __init__(self, fixtures, host="127.0.0.1", port=0):
+        """
+        本地 HTTP 服务，提供与路由相同的回放内容，图片下载等不经过浏览器的请求使用它
+        """
+        self.fixtures = fixtures
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        fixtures = self.fixtures
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, content_type, body = fixtures.render(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                         name="tiktok-fixtures", daemon=True).start()
+        self.fixtures.image_base_url = self.base_url
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
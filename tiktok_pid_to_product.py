@@ -9,25 +9,87 @@ import csv
 import json
 from urllib.parse import urljoin
 from pathlib import Path
-from feishu_sheet import FeishuSheet
+from concurrency import AdaptiveConcurrency
+from dead_letter import DeadLetterQueue
+from feishu_sheet import FeishuSheet, Field, partitions_from_config
+from fingerprints import DEFAULT_PATH as DEFAULT_FINGERPRINT_PATH, FingerprintStore
+from models import ImageRef, ProductRecord, ScrapeResult
+from pacing import PacingScheduler
+from product_cache import ProductCache
+from product_writes import ProductUpdateBatcher
+from metrics import (
+    IMAGE_DOWNLOAD_BYTES, IMAGE_DOWNLOAD_LATENCY, IMAGE_DOWNLOAD_SIZE, IMAGE_DOWNLOADS,
+    JOB_DURATION, JOB_RUNS, PLAYWRIGHT_PHASE, timed,
+)
+from resilience import Backoff, CircuitBreaker, RetryBudget, RetryPolicy, is_retryable_status
+from security_check import SecurityCheckCoordinator, SecurityCheckPending
+
+# 各目标的重试退避：产品页失败多为页面加载超时，间隔较长；图片 CDN 间隔较短
+RETRY_BACKOFF = {
+    "tiktok_pdp": Backoff(base=3.0, max_delay=30.0),
+    "cdn": Backoff(base=1.0, max_delay=10.0),
+}
+# 同一产品因安全验证放回队列的最多次数，超过后记为失败
+MAX_SECURITY_REQUEUES = 3
+
+
+def group_by_product(tasks):
+    """
+    按 product_id 合并待处理记录，保持首次出现的顺序
+    :param tasks: 记录字典列表，每个包含 product_id 和 record_id；已合并的任务（含 records）原样保留
+    :return: 每个产品一个任务，records 为对应的全部记录
+    """
+    groups = {}
+    for task in tasks:
+        records = task.get("records") or [task]
+        product_id = str(task["product_id"])
+        if product_id in groups:
+            groups[product_id]["records"].extend(records)
+        else:
+            groups[product_id] = dict(task, records=list(records))
+    return list(groups.values())
 
 
 class TikTokProductScraperPlaywright:
-    def __init__(self, headless=False, user_data_dir=None, profile_name=None, max_tabs=5):
+    def __init__(self, headless=False, user_data_dir=None, profile_name=None, max_tabs=5, cdp_endpoint=None, pacer=None,
+                 page_setup=None, settle_ms=5000, security_wait_ms=30000, breakers=None, retry_budget=None,
+                 security=None, concurrency=None, cache=None):
         """
         初始化TikTok产品爬虫 (Playwright版)
         :param headless: 是否以无头模式运行浏览器
         :param user_data_dir: Chrome用户数据目录路径
         :param profile_name: Chrome配置文件名称
         :param max_tabs: 最大并发tab数量
+        :param cdp_endpoint: 常驻浏览器服务的CDP地址，传入时连接该浏览器而不是启动新浏览器
+        :param pacer: PacingScheduler实例，导航前按域名控制访问间隔，所有并发tab共享
+        :param page_setup: 新建页面后调用的函数 page_setup(page)，可用于安装路由（如离线回放）
+        :param settle_ms: 页面加载后等待渲染完成的毫秒数
+        :param security_wait_ms: 遇到安全验证页时第一次等待用户完成验证的毫秒数
+        :param breakers: {"tiktok_pdp": CircuitBreaker, "cdn": CircuitBreaker}，可选，并发任务的各个实例共用
+        :param retry_budget: RetryBudget实例，可选，每次批量任务开始时重新创建
+        :param security: SecurityCheckCoordinator实例，可选，并发任务的各个实例共用，遇到安全验证时暂停所有页面
+        :param concurrency: AdaptiveConcurrency实例，可选，传入时按运行指标调整并发数（上下限由其配置决定），否则固定为max_tabs
+        :param cache: ProductCache实例，可选，批量抓取时先查缓存，命中的产品不再访问产品页
         """
         self.headless = headless
         self.user_data_dir = user_data_dir
         self.profile_name = profile_name
         self.max_tabs = max_tabs
+        self.cdp_endpoint = cdp_endpoint
+        self.pacer = pacer
+        self.page_setup = page_setup
+        self.settle_ms = settle_ms
+        self.security_wait_ms = security_wait_ms
+        self.breakers = breakers or {target: CircuitBreaker(target) for target in RETRY_BACKOFF}
+        self.retry_budget = retry_budget or RetryBudget()
+        self.security = security or SecurityCheckCoordinator(wait_ms=security_wait_ms)
+        self.concurrency = concurrency
+        self.cache = cache
+        self.security_hits = 0  # 本实例遇到并已通过的安全验证次数
         self.browser = None
         self.playwright = None
         self.context = None
+        self.shared_browser = False  # 是否连接的是常驻浏览器（关闭时只断开连接）
         self.pages = []  # 存储所有页面
         self.active_tasks = {}  # 存储每个页面正在处理的任务
         self.task_queue = []  # 任务队列
@@ -44,6 +106,19 @@ class TikTokProductScraperPlaywright:
         
         self.playwright = sync_playwright().start()
         
+        # 优先连接常驻浏览器服务
+        if self.cdp_endpoint:
+            try:
+                self.browser = self.playwright.chromium.connect_over_cdp(self.cdp_endpoint)
+                self.context = self.browser.contexts[0] if self.browser.contexts else self.browser.new_context()
+                self.shared_browser = True
+                print(f"已连接常驻浏览器: {self.cdp_endpoint}")
+                return
+            except Exception as e:
+                print(f"连接常驻浏览器失败，改为启动新的浏览器: {e}")
+                self.browser = None
+                self.context = None
+        
         # 如果指定了用户数据目录，则使用持久化上下文
         if self.user_data_dir:
             try:
@@ -79,6 +154,8 @@ class TikTokProductScraperPlaywright:
         page.set_extra_http_headers({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         })
+        if self.page_setup:
+            self.page_setup(page)
         
         self.pages.append(page)
         return page
@@ -114,13 +191,19 @@ class TikTokProductScraperPlaywright:
                     pass
             self.pages = []
             
-            if self.context:
+            # 常驻浏览器由浏览器服务管理，这里只断开连接
+            message = "已断开浏览器连接" if self.shared_browser else "浏览器已关闭"
+            if self.context and not self.shared_browser:
                 self.context.close()
-            if self.browser:
+            if self.browser and not self.shared_browser:
                 self.browser.close()
             if self.playwright:
                 self.playwright.stop()
-            print("浏览器已关闭")
+            self.context = None
+            self.browser = None
+            self.playwright = None
+            self.shared_browser = False
+            print(message)
         except Exception as e:
             print(f"关闭浏览器时出错: {e}")
     
@@ -148,181 +231,23 @@ class TikTokProductScraperPlaywright:
     
     def get_product_images_sync(self, product_id):
         """
-        同步方式访问TikTok产品页面并抓取产品多个主图
+        同步方式访问TikTok产品页面并抓取产品多个主图，使用实例自己的页面
+        安全验证与批量抓取一样由 self.security 协调器处理
         :param product_id: 产品ID
-        :return: 产品主图URL列表，如果未找到则返回空列表
+        :return: ProductRecord，获取失败或安全验证未通过时返回 None
         """
         # 确保浏览器已打开
         self.open_browser()
-        
-        url = f"https://www.tiktok.com/shop/pdp/product/{product_id}"
-        print(f"正在访问产品页面: {url}")
-        
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                # 访问页面 - 增加超时时间到60秒，使用networkidle等待策略
-                if not hasattr(self, 'page'):
-                    self.page = self.create_page()
-                
-                self.page.goto(url, wait_until="networkidle", timeout=60000)
-                
-                # 检查是否遇到安全验证页面
-                security_check_detected = False
-                try:
-                    # 检查是否存在安全验证元素
-                    # 检查页面title是否为"Security Check"
-                    page_title = self.page.title()
-                    if "Security Check" in page_title:
-                        print(f"  检测到安全验证页面（Title: Security Check），等待30秒让用户完成验证...")
-                        security_check_detected = True
-                    
-                    # 或者检查页面是否有"text=Verify to continue"
-                    if not security_check_detected:
-                        try:
-                            element = self.page.query_selector("text=Verify to continue")
-                            if element:
-                                print(f"  检测到安全验证页面（Text: Verify to continue），等待30秒让用户完成验证...")
-                                security_check_detected = True
-                        except:
-                            pass
-                    
-                    if security_check_detected:
-                        # 等待30秒让用户完成验证
-                        self.page.wait_for_timeout(30000)
-                        
-                        # 刷新页面以检查是否验证成功
-                        self.page.reload(wait_until="domcontentloaded")
-                        
-                        # 再次检查是否仍然在安全验证页面
-                        still_on_security_page = False
-                        
-                        # 检查页面title是否为"Security Check"
-                        page_title = self.page.title()
-                        if "Security Check" in page_title:
-                            still_on_security_page = True
-                        else:
-                            # 检查页面是否有"text=Verify to continue"
-                            try:
-                                element = self.page.query_selector("text=Verify to continue")
-                                if element:
-                                    still_on_security_page = True
-                            except:
-                                pass
-                        
-                        if still_on_security_page:
-                            print(f"  警告：安全验证似乎未完成，继续尝试获取图片...")
-                        else:
-                            print(f"  安全验证检测通过，继续处理页面...")
-                except Exception as sec_e:
-                    print(f"  检查安全验证时出错: {sec_e}")
-                
-                # 等待页面加载
-                self.page.wait_for_timeout(5000)  # 等待5秒让页面完全加载
-                
-                # 获取产品标题
-                product_title = ""
-                try:
-                    title_element = self.page.query_selector("div.overflow-y-auto h1 span.H2-Semibold")
-                    if title_element:
-                        product_title = title_element.inner_text().strip()
-                        print(f"  产品标题: {product_title}")
-                    else:
-                        print("  未找到产品标题")
-                except Exception as e:
-                    print(f"  获取产品标题时出错: {e}")
-                    product_title = ""
-                
-                # 获取产品描述
-                product_description = ""
-                try:
-                    desc_element = self.page.query_selector("div.relative div.overflow-hidden.duration-300")
-                    if desc_element:
-                        product_description = desc_element.inner_text().strip()
-                        print(f"  产品描述: {product_description[:100]}...")  # 只打印前100个字符
-                    else:
-                        print("  未找到产品描述")
-                except Exception as e:
-                    print(f"  获取产品描述时出错: {e}")
-                    product_description = ""
-                
-                # 首先尝试使用指定的选择器获取多个主图
-                image_urls = []
-                
-                # 新增：查找 div.items-center 下的 img.object-cover (主要主图)
-                try:
-                    img_elements = self.page.query_selector_all("div.items-center.overflow-x-scroll img.object-cover")
-                    for img_element in img_elements:
-                        src = img_element.get_attribute("src")
-                        if src and src.startswith(("http", "https")):
-                            # 确保URL是完整的
-                            if not src.startswith(("http://", "https://")):
-                                src = urljoin(url, src)
-                            # 将普通图片也以字典形式存储，保持一致性
-                            image_info = {
-                                "url": src,
-                                "title": "main_image",
-                                "type": "main"
-                            }
-                            # 避免重复
-                            if not any(isinstance(info, dict) and info["url"] == src for info in image_urls):
-                                image_urls.append(image_info)
-                    main_count = len([item for item in image_urls if isinstance(item, dict) and item["type"] == "main"])
-                    if main_count > 0:
-                        print(f"  找到 {main_count} 张主图使用选择器: div.items-center.overflow-x-scroll img.object-cover")
-                except Exception as e:
-                    print(f"  尝试使用指定选择器时出错: {e}")
-                    pass
-                
-                # 新增：查找 div.overflow-x-auto 下的 div.items-center 下的 img (SKU图片)
-                try:
-                    sku_img_elements = self.page.query_selector_all("div.overflow-x-auto.flex-wrap div.items-center.border-solid.cursor-pointer img")
-                    for img_element in sku_img_elements:
-                        src = img_element.get_attribute("src")
-                        title = img_element.get_attribute("title")
-                        if src and src.startswith(("http", "https")):
-                            # 将src中的200:200替换为800:800
-                            if "200:200" in src:
-                                src = src.replace("200:200", "800:800")
-                            # 确保URL是完整的
-                            if not src.startswith(("http://", "https://")):
-                                src = urljoin(url, src)
-                            # 使用标题作为标识符添加到URL列表中
-                            image_info = {
-                                "url": src,
-                                "title": title,
-                                "type": "sku"
-                            }
-                            # 避免重复
-                            if not any(isinstance(info, dict) and info["url"] == src for info in image_urls):
-                                image_urls.append(image_info)
-                    sku_count = len([item for item in image_urls if isinstance(item, dict) and item["type"] == "sku"])
-                    if sku_count > 0:
-                        print(f"  找到 {sku_count} 张SKU图片使用选择器: div.overflow-x-auto div.items-center img")
-                except Exception as e:
-                    print(f"  尝试获取SKU图片时出错: {e}")
-                    pass
-                
-                return {
-                    "image_urls": image_urls,
-                    "product_title": product_title,
-                    "product_description": product_description
-                }
-                
-            except Exception as e:
-                retry_count += 1
-                if "Timeout" in str(e) and retry_count < max_retries:
-                    print(f"  超时，正在第 {retry_count}/{max_retries} 次重试...")
-                    # 等待一段时间后重试
-                    time.sleep(5)
-                    continue
-                else:
-                    print(f"获取产品 {product_id} 的图片时出错: {e}")
-                    return []
+        if not hasattr(self, 'page'):
+            self.page = self.create_page()
+        try:
+            return self._get_product_images_with_page(self.page, product_id)
+        except SecurityCheckPending:
+            print(f"获取产品 {product_id} 的图片时遇到安全验证，验证未通过")
+            return None
     
-    def scrape_products(self, product_ids, feishu_sheet=None, app_token=None, table_id=None, download_images=False, images_folder=None, batch_size=10):
+    def scrape_products(self, product_ids, feishu_sheet=None, app_token=None, table_id=None, download_images=False, images_folder=None, batch_size=10, progress=None, fingerprints=None,
+                        processes=1, tabs_per_process=None):
         """
         批量抓取产品图片并更新多维表格
         :param product_ids: 产品信息字典数组，每个字典包含product_id和record_id
@@ -331,13 +256,26 @@ class TikTokProductScraperPlaywright:
         :param table_id: 多维表格ID
         :param download_images: 是否下载图片到本地
         :param images_folder: 图片保存文件夹
-        :param batch_size: 批量处理大小
-        :return: 结果字典列表
+        :param batch_size: 批量更新多维表格的记录数
+        :param progress: JobProgress实例，可选，用于上报任务进度
+        :param fingerprints: FingerprintStore实例，可选，跳过字段未变化的记录
+        :param processes: 工作进程数，大于1时按进程分片处理（见 process_pool），不支持下载图片
+        :param tabs_per_process: 多进程模式下每个进程的并发tab数，默认把max_tabs平均分给各进程
+        :return: ScrapeResult 列表
         """
+        if processes and processes > 1 and download_images:
+            print(f"下载图片不支持多进程，改为单进程处理（配置的进程数 {processes}）")
+        elif processes and processes > 1:
+            from process_pool import scrape_products_in_processes
+            return scrape_products_in_processes(self, product_ids, feishu_sheet, app_token, table_id, processes=processes,
+                                                tabs_per_process=tabs_per_process, batch_size=batch_size,
+                                                progress=progress, fingerprints=fingerprints)
         # 调用并发版本
-        return self.scrape_products_concurrent(product_ids, feishu_sheet, app_token, table_id, download_images, images_folder)
+        return self.scrape_products_concurrent(product_ids, feishu_sheet, app_token, table_id, download_images, images_folder,
+                                               progress=progress, batch_size=batch_size, fingerprints=fingerprints)
     
-    def scrape_products_concurrent(self, product_ids, feishu_sheet=None, app_token=None, table_id=None, download_images=False, images_folder=None):
+    def scrape_products_concurrent(self, product_ids, feishu_sheet=None, app_token=None, table_id=None, download_images=False, images_folder=None, progress=None, batch_size=10, fingerprints=None,
+                                   on_result=None, incoming=None):
         """
         并发批量抓取产品图片并更新多维表格
         :param product_ids: 产品信息字典数组，每个字典包含product_id和record_id
@@ -346,8 +284,14 @@ class TikTokProductScraperPlaywright:
         :param table_id: 多维表格ID
         :param download_images: 是否下载图片到本地
         :param images_folder: 图片保存文件夹
-        :return: 结果字典列表
+        :param progress: JobProgress实例，可选，用于上报任务进度
+        :param batch_size: 批量更新多维表格的记录数
+        :param fingerprints: FingerprintStore实例，可选，记录写入指纹，跳过字段未变化的记录
+        :param on_result: 每得到一条结果时调用 on_result(ScrapeResult)，可选，多进程模式用于把结果发回主进程
+        :param incoming: queue.Queue，可选，流式模式：运行期间继续从中接收新记录（product_id、record_id），收到 None 后处理完剩余任务结束
+        :return: ScrapeResult 列表
         """
+        import queue
         import threading
         from concurrent.futures import ThreadPoolExecutor
         
@@ -370,7 +314,7 @@ class TikTokProductScraperPlaywright:
                 continue
             valid_product_ids.append(item)
         
-        if not valid_product_ids:
+        if not valid_product_ids and incoming is None:
             print("没有找到有效的产品信息")
             return []
         
@@ -384,10 +328,38 @@ class TikTokProductScraperPlaywright:
         
         # 初始化结果列表
         self.results = []
+        # 每次任务使用新的重试预算，熔断器跨任务保留
+        self.retry_budget = RetryBudget()
+        
+        # 多条记录对应同一产品时只访问一次产品页，结果分发给每条记录
+        product_tasks = group_by_product(valid_product_ids)
+        counts = {"records": len(valid_product_ids), "products": len(product_tasks)}
         
-        print(f"\n=== 开始并发处理 {len(valid_product_ids)} 个产品 ===")
-        print(f"最大并发数: {self.max_tabs}")
+        print(f"\n=== 开始并发处理 {len(product_tasks)} 个产品（{len(valid_product_ids)} 条记录） ===")
+        if self.concurrency:
+            print(f"自适应并发数: 初始 {self.concurrency.limit}，范围 {self.concurrency.min_limit}-{self.concurrency.max_limit}")
+        else:
+            print(f"最大并发数: {self.max_tabs}")
+        if progress:
+            progress.set_phase("抓取产品")
+            progress.add_total(len(valid_product_ids))
         
+        # 待写入的更新，攒够 batch_size 条后批量提交
+        writer = ProductUpdateBatcher(feishu_sheet, app_token, table_id, batch_size, fingerprints, progress,
+                                      on_write=self.concurrency.record_writes if self.concurrency else None)
+        results_lock = threading.Lock()
+
+        def add_results(task, status, product=None, error=None):
+            """
+            同一产品的结果分发给对应的每条记录
+            """
+            for record in task["records"]:
+                result = ScrapeResult(task["product_id"], record["record_id"], status, product, error)
+                with results_lock:
+                    self.results.append(result)
+                if on_result:
+                    on_result(result)
+
         # 3. 使用线程池并发处理
         def process_task_wrapper(task):
             """
@@ -396,120 +368,186 @@ class TikTokProductScraperPlaywright:
             # 为每个任务创建一个新的浏览器实例
             # 注意：Playwright不支持在多个线程中共享同一个浏览器实例
             # 因此我们需要为每个线程创建一个新的浏览器实例
-            scraper = TikTokProductScraperPlaywright(
+            scraper = type(self)(
                 headless=self.headless,
                 user_data_dir=self.user_data_dir,
-                profile_name=self.profile_name
+                profile_name=self.profile_name,
+                cdp_endpoint=self.cdp_endpoint,
+                pacer=self.pacer,
+                page_setup=self.page_setup,
+                settle_ms=self.settle_ms,
+                security_wait_ms=self.security_wait_ms,
+                breakers=self.breakers,
+                retry_budget=self.retry_budget,
+                security=self.security
             )
             
+            requeued = False
             try:
                 # 处理任务
                 product_id = task["product_id"]
-                record_id = task["record_id"]
                 
                 print(f"\n正在处理产品: {product_id}")
-                print(f"对应的记录ID: {record_id}")
-                
-                # 打开浏览器
-                scraper.open_browser()
-                # 创建页面
-                page = scraper.create_page()
+                print(f"对应的记录ID: {', '.join(r['record_id'] for r in task['records'])}")
                 
-                # 获取产品数据
-                product_data = scraper._get_product_images_with_page(page, product_id)
+                # 先查产品缓存，命中时不打开浏览器
+                product = self.cache.get(product_id) if self.cache is not None else None
+                if product is not None:
+                    print(f"  产品缓存命中，图片数量: {len(product.images)}")
+                    if progress:
+                        progress.incr("cache_hits")
+                else:
+                    # 打开浏览器
+                    scraper.open_browser()
+                    # 创建页面
+                    page = scraper.create_page()
+                    
+                    # 获取产品数据
+                    page_start = time.perf_counter()
+                    try:
+                        product = scraper._get_product_images_with_page(page, product_id)
+                    except SecurityCheckPending:
+                        if self.concurrency:
+                            self.concurrency.record_page(time.perf_counter() - page_start, security=True)
+                        raise
+                    if self.concurrency:
+                        self.concurrency.record_page(time.perf_counter() - page_start, failed=product is None,
+                                                     security=scraper.security_hits > 0)
+                    if product is not None and self.cache is not None:
+                        self.cache.put(product)
                 
-                if not isinstance(product_data, dict):
-                    print(f"  错误：获取产品数据失败，返回类型不正确")
-                    result = {
-                        'product_id': product_id,
-                        'record_id': record_id,
-                        'status': 'failed',
-                        'error': '获取产品数据失败'
-                    }
-                    self.results.append(result)
+                if product is None:
+                    print(f"  错误：获取产品数据失败")
+                    add_results(task, 'failed', error='获取产品数据失败')
+                    if progress:
+                        progress.incr("failures", len(task["records"]))
                     return
                 
-                image_urls = product_data.get("image_urls", [])
-                product_title = product_data.get("product_title", "")
-                product_description = product_data.get("product_description", "")
-                
-                # 准备更新数据
-                # 处理image_urls，转换为字符串
-                image_urls_str = ""
-                if image_urls:
-                    urls_list = []
-                    for img_data in image_urls:
-                        if isinstance(img_data, dict):
-                            urls_list.append(img_data.get('url', ''))
-                        else:
-                            urls_list.append(str(img_data))
-                    image_urls_str = '\n'.join(urls_list)
+                if progress:
+                    progress.incr("items", len(product.images))
                 
-                # 更新多维表格
-                if feishu_sheet and app_token and table_id:
-                    update_fields = {
-                        "product_desc": product_description,
-                        "product_source_imgs": image_urls_str
-                    }
-                    
-                    update_result = feishu_sheet.update_record(app_token, table_id, record_id, update_fields)
-                    if update_result:
-                        print(f"  多维表格更新成功")
-                    else:
-                        print(f"  警告：多维表格更新失败")
+                # 更新多维表格：同一产品的所有记录一起加入批量更新
+                if writer.enabled:
+                    writer.queue_all(task["records"], product.to_feishu_fields())
                 
                 # 下载图片（如果需要）
-                if download_images and image_urls:
-                    scraper.download_images(image_urls, product_id, images_folder, product_title=product_title, product_description=product_description)
+                if download_images and product.images:
+                    scraper.download_images(product.images, product_id, images_folder, product_title=product.product_title, product_description=product.product_description)
                 
                 # 记录结果
-                status = 'success' if image_urls else 'failed'
-                result = {
-                    'product_id': product_id,
-                    'record_id': record_id,
-                    'product_title': product_title,
-                    'product_description': product_description,
-                    'image_urls': image_urls,
-                    'status': status,
-                    'count': len(image_urls) if image_urls else 0
-                }
-                self.results.append(result)
+                status = 'success' if product.images else 'failed'
+                add_results(task, status, product)
                 
                 if status == 'success':
-                    print(f"  产品 {product_id} 处理成功，图片数量: {len(image_urls) if image_urls else 0}")
+                    print(f"  产品 {product_id} 处理成功，图片数量: {len(product.images)}，更新记录 {len(task['records'])} 条")
                 else:
                     print(f"  产品 {product_id} 处理失败，未找到图片")
                 
+            except SecurityCheckPending as e:
+                # 其他页面正在处理安全验证，放回队列等验证通过后重试
+                requeues = task.get("security_requeues", 0)
+                if requeues < MAX_SECURITY_REQUEUES:
+                    requeued = True
+                    tasks.put(dict(task, security_requeues=requeues + 1))
+                    print(f"  产品 {task['product_id']} 遇到安全验证，放回队列（第 {requeues + 1} 次）")
+                    if progress:
+                        progress.incr("requeued")
+                else:
+                    print(f"  产品 {task['product_id']} 多次遇到安全验证，放弃")
+                    add_results(task, 'error', error=str(e))
+                    if progress:
+                        progress.incr("failures", len(task["records"]))
             except Exception as e:
                 # 错误处理
-                product_id = task["product_id"]
-                record_id = task["record_id"]
-                print(f"  处理产品 {product_id} 时出错: {str(e)}")
-                result = {
-                    'product_id': product_id,
-                    'record_id': record_id,
-                    'status': 'error',
-                    'error': str(e)
-                }
-                self.results.append(result)
+                print(f"  处理产品 {task['product_id']} 时出错: {str(e)}")
+                add_results(task, 'error', error=str(e))
+                if progress:
+                    progress.incr("failures", len(task["records"]))
             finally:
                 # 关闭浏览器
                 scraper.close()
+                if progress and not requeued:
+                    progress.incr("processed", len(task["records"]))
         
-        # 使用线程池处理任务
-        with ThreadPoolExecutor(max_workers=self.max_tabs) as executor:
-            executor.map(process_task_wrapper, valid_product_ids)
+        # 使用线程池处理任务：各线程从队列取任务，遇到安全验证的产品放回队列
+        tasks = queue.Queue()
+        for task in product_tasks:
+            tasks.put(task)
+        
+        def worker():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                try:
+                    if self.concurrency:
+                        # 线程按并发上限创建，超出当前并发数的线程在这里等待
+                        with self.concurrency.slot():
+                            process_task_wrapper(task)
+                    else:
+                        process_task_wrapper(task)
+                    # 流式模式下没有排队的任务时立即写出已攒的更新，不等凑够 batch_size
+                    if incoming is not None and tasks.empty():
+                        writer.flush(force=True)
+                finally:
+                    tasks.task_done()
+        
+        def feed():
+            """
+            流式模式：取出 incoming 中已到达的全部记录，按产品合并后加入任务队列，收到 None 时结束
+            """
+            while True:
+                items = [incoming.get()]
+                while items[-1] is not None:
+                    try:
+                        items.append(incoming.get_nowait())
+                    except queue.Empty:
+                        break
+                records = [item for item in items if item is not None]
+                if records:
+                    units = group_by_product(records)
+                    counts["records"] += len(records)
+                    counts["products"] += len(units)
+                    if progress:
+                        progress.add_total(len(records))
+                    for unit in units:
+                        tasks.put(unit)
+                if items[-1] is None:
+                    return
+        
+        workers = self.concurrency.max_limit if self.concurrency else self.max_tabs
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers):
+                executor.submit(worker)
+            if incoming is not None:
+                # 先等输入结束再等待任务队列清空，期间新到的记录和已有任务一起并发处理
+                feed()
+            tasks.join()
+            for _ in range(workers):
+                tasks.put(None)
+        if writer.enabled:
+            writer.close()
         
         # 4. 等待所有任务完成
         print("\n=== 所有任务处理完成 ===")
-        print(f"总处理产品数: {len(valid_product_ids)}")
+        print(f"总处理产品数: {counts['products']}，记录数: {counts['records']}，"
+              f"合并重复产品节省页面访问 {counts['records'] - counts['products']} 次")
         
         # 统计结果
-        total_success = sum(1 for r in self.results if r.get('status') == 'success')
-        total_failed = sum(1 for r in self.results if r.get('status') in ['failed', 'error'])
+        total_success = sum(1 for r in self.results if r.status == 'success')
+        total_failed = sum(1 for r in self.results if r.status in ['failed', 'error'])
         
         print(f"成功: {total_success}")
         print(f"失败: {total_failed}")
+        print(f"多维表格更新: 提交 {writer.stats['sent']} 条，失败 {writer.stats['failed']} 条，未变化跳过 {writer.stats['skipped']} 条")
+        if self.pacer:
+            print(f"节奏统计: {self.pacer.stats()}")
+        print(f"重试统计: {self.retry_budget.stats()}，熔断器: { {t: b.stats() for t, b in self.breakers.items()} }")
+        print(f"安全验证统计: {self.security.stats()}")
+        if self.concurrency:
+            print(f"并发控制统计: {self.concurrency.stats()}")
+        if self.cache is not None:
+            print(f"产品缓存统计: {self.cache.stats()}，缓存产品数: {len(self.cache)}")
         
         if download_images:
             print(f"图片已保存到: {images_folder}")
@@ -539,79 +577,37 @@ class TikTokProductScraperPlaywright:
         
         try:
             # 处理产品数据
-            product_data = self._get_product_images_with_page(page, product_id)
-            if not isinstance(product_data, dict):
-                print(f"  错误：获取产品数据失败，返回类型不正确")
-                result = {
-                    'product_id': product_id,
-                    'record_id': record_id,
-                    'status': 'failed',
-                    'error': '获取产品数据失败'
-                }
-                self.results.append(result)
+            product = self._get_product_images_with_page(page, product_id)
+            if product is None:
+                print(f"  错误：获取产品数据失败")
+                self.results.append(ScrapeResult(product_id, record_id, 'failed', error='获取产品数据失败'))
                 return
             
-            image_urls = product_data.get("image_urls", [])
-            product_title = product_data.get("product_title", "")
-            product_description = product_data.get("product_description", "")
-            
-            # 准备更新数据
-            # 处理image_urls，转换为字符串
-            image_urls_str = ""
-            if image_urls:
-                urls_list = []
-                for img_data in image_urls:
-                    if isinstance(img_data, dict):
-                        urls_list.append(img_data.get('url', ''))
-                    else:
-                        urls_list.append(str(img_data))
-                image_urls_str = '\n'.join(urls_list)
-            
             # 更新多维表格
             if feishu_sheet and app_token and table_id:
-                update_fields = {
-                    "product_desc": product_description,
-                    "product_source_imgs": image_urls_str
-                }
-                
-                update_result = feishu_sheet.update_record(app_token, table_id, record_id, update_fields)
+                update_result = feishu_sheet.update_record(app_token, table_id, record_id, product.to_feishu_fields())
                 if update_result:
                     print(f"  多维表格更新成功")
                 else:
                     print(f"  警告：多维表格更新失败")
             
             # 下载图片（如果需要）
-            if download_images and image_urls:
-                self.download_images(image_urls, product_id, images_folder, product_title=product_title, product_description=product_description)
+            if download_images and product.images:
+                self.download_images(product.images, product_id, images_folder, product_title=product.product_title, product_description=product.product_description)
             
             # 记录结果
-            status = 'success' if image_urls else 'failed'
-            result = {
-                'product_id': product_id,
-                'record_id': record_id,
-                'product_title': product_title,
-                'product_description': product_description,
-                'image_urls': image_urls,
-                'status': status,
-                'count': len(image_urls) if image_urls else 0
-            }
+            result = ScrapeResult(product_id, record_id, 'success' if product.images else 'failed', product)
             self.results.append(result)
             
-            if status == 'success':
-                print(f"  产品 {product_id} 处理成功，图片数量: {len(image_urls) if image_urls else 0}")
+            if result.status == 'success':
+                print(f"  产品 {product_id} 处理成功，图片数量: {result.count}")
             else:
                 print(f"  产品 {product_id} 处理失败，未找到图片")
             
         except Exception as e:
             # 错误处理
             print(f"  处理产品 {product_id} 时出错: {str(e)}")
-            result = {
-                'product_id': product_id,
-                'record_id': record_id,
-                'status': 'error',
-                'error': str(e)
-            }
-            self.results.append(result)
+            self.results.append(ScrapeResult(product_id, record_id, 'error', error=str(e)))
         finally:
             # 任务完成后关闭页面
             self.close_page(page)
@@ -621,172 +617,132 @@ class TikTokProductScraperPlaywright:
         使用指定页面访问TikTok产品页面并抓取产品多个主图
         :param page: 页面实例
         :param product_id: 产品ID
-        :return: 产品主图URL列表，如果未找到则返回空列表
+        :return: ProductRecord，获取失败时返回 None
         """
         url = f"https://www.tiktok.com/shop/pdp/product/{product_id}"
         print(f"正在访问产品页面: {url}")
         
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                # 增加超时时间到60秒，使用networkidle等待策略
+        def load():
+            # 其他页面正在处理安全验证时先等待，避免继续访问加重风控
+            self.security.wait_until_clear()
+            # 增加超时时间到60秒，使用networkidle等待策略
+            if self.pacer:
+                self.pacer.wait(url)
+            with PLAYWRIGHT_PHASE.time(job="product", phase="navigation"):
                 page.goto(url, wait_until="networkidle", timeout=60000)
-                
-                # 检查是否遇到安全验证页面
-                security_check_detected = False
-                try:
-                    # 检查是否存在安全验证元素
-                    # 检查页面title是否为"Security Check"
-                    page_title = page.title()
-                    if "Security Check" in page_title:
-                        print(f"  检测到安全验证页面（Title: Security Check），等待30秒让用户完成验证...")
-                        security_check_detected = True
-                    
-                    # 或者检查页面是否有"text=Verify to continue"
-                    if not security_check_detected:
-                        try:
-                            element = page.query_selector("text=Verify to continue")
-                            if element:
-                                print(f"  检测到安全验证页面（Text: Verify to continue），等待30秒让用户完成验证...")
-                                security_check_detected = True
-                        except:
-                            pass
-                    
-                    if security_check_detected:
-                        # 等待30秒让用户完成验证
-                        page.wait_for_timeout(30000)
-                        
-                        # 刷新页面以检查是否验证成功
-                        page.reload(wait_until="domcontentloaded")
-                        
-                        # 再次检查是否仍然在安全验证页面
-                        still_on_security_page = False
-                        
-                        # 检查页面title是否为"Security Check"
-                        page_title = page.title()
-                        if "Security Check" in page_title:
-                            still_on_security_page = True
-                        else:
-                            # 检查页面是否有"text=Verify to continue"
-                            try:
-                                element = page.query_selector("text=Verify to continue")
-                                if element:
-                                    still_on_security_page = True
-                            except:
-                                pass
-                        
-                        if still_on_security_page:
-                            print(f"  警告：安全验证似乎未完成，继续尝试获取图片...")
-                        else:
-                            print(f"  安全验证检测通过，继续处理页面...")
-                except Exception as sec_e:
-                    print(f"  检查安全验证时出错: {sec_e}")
-                
-                # 等待页面加载
-                page.wait_for_timeout(5000)  # 等待5秒让页面完全加载
-                
-                # 获取产品标题
+            
+            # 检查是否遇到安全验证页面：由协调器暂停其他页面并探测，需要稍后重试时抛出 SecurityCheckPending
+            security_check_start = time.perf_counter()
+            try:
+                if self.security.check(page, product_id):
+                    self.security_hits += 1
+            finally:
+                PLAYWRIGHT_PHASE.observe(time.perf_counter() - security_check_start, job="product", phase="security_check")
+            
+            # 等待页面加载
+            with PLAYWRIGHT_PHASE.time(job="product", phase="settle"):
+                page.wait_for_timeout(self.settle_ms)  # 等待页面完全加载（默认5秒）
+            extract_start = time.perf_counter()
+            
+            # 获取产品标题
+            product_title = ""
+            try:
+                title_element = page.query_selector("div.overflow-y-auto h1 span.H2-Semibold")
+                if title_element:
+                    product_title = title_element.inner_text().strip()
+                    print(f"  产品标题: {product_title}")
+                else:
+                    print("  未找到产品标题")
+            except Exception as e:
+                print(f"  获取产品标题时出错: {e}")
                 product_title = ""
-                try:
-                    title_element = page.query_selector("div.overflow-y-auto h1 span.H2-Semibold")
-                    if title_element:
-                        product_title = title_element.inner_text().strip()
-                        print(f"  产品标题: {product_title}")
-                    else:
-                        print("  未找到产品标题")
-                except Exception as e:
-                    print(f"  获取产品标题时出错: {e}")
-                    product_title = ""
-                
-                # 获取产品描述
+            
+            # 获取产品描述
+            product_description = ""
+            try:
+                desc_element = page.query_selector("div.relative div.overflow-hidden.duration-300")
+                if desc_element:
+                    product_description = desc_element.inner_text().strip()
+                    print(f"  产品描述: {product_description[:100]}...")  # 只打印前100个字符
+                else:
+                    print("  未找到产品描述")
+            except Exception as e:
+                print(f"  获取产品描述时出错: {e}")
                 product_description = ""
-                try:
-                    desc_element = page.query_selector("div.relative div.overflow-hidden.duration-300")
-                    if desc_element:
-                        product_description = desc_element.inner_text().strip()
-                        print(f"  产品描述: {product_description[:100]}...")  # 只打印前100个字符
-                    else:
-                        print("  未找到产品描述")
-                except Exception as e:
-                    print(f"  获取产品描述时出错: {e}")
-                    product_description = ""
-                
-                # 首先尝试使用指定的选择器获取多个主图
-                image_urls = []
-                
-                # 新增：查找 div.items-center 下的 img.object-cover (主要主图)
-                try:
-                    img_elements = page.query_selector_all("div.items-center.overflow-x-scroll img.object-cover")
-                    for img_element in img_elements:
-                        src = img_element.get_attribute("src")
-                        if src and src.startswith(("http", "https")):
-                            # 确保URL是完整的
-                            if not src.startswith(("http://", "https://")):
-                                src = urljoin(url, src)
-                            # 将普通图片也以字典形式存储，保持一致性
-                            image_info = {
-                                "url": src,
-                                "title": "main_image",
-                                "type": "main"
-                            }
-                            # 避免重复
-                            if not any(isinstance(info, dict) and info["url"] == src for info in image_urls):
-                                image_urls.append(image_info)
-                    main_count = len([item for item in image_urls if isinstance(item, dict) and item["type"] == "main"])
-                    if main_count > 0:
-                        print(f"  找到 {main_count} 张主图使用选择器: div.items-center.overflow-x-scroll img.object-cover")
-                except Exception as e:
-                    print(f"  尝试使用指定选择器时出错: {e}")
-                    pass
-                
-                # 新增：查找 div.overflow-x-auto 下的 div.items-center 下的 img (SKU图片)
-                try:
-                    sku_img_elements = page.query_selector_all("div.overflow-x-auto.flex-wrap div.items-center.border-solid.cursor-pointer img")
-                    for img_element in sku_img_elements:
-                        src = img_element.get_attribute("src")
-                        title = img_element.get_attribute("title")
-                        if src and src.startswith(("http", "https")):
-                            # 将src中的200:200替换为800:800
-                            if "200:200" in src:
-                                src = src.replace("200:200", "800:800")
-                            # 确保URL是完整的
-                            if not src.startswith(("http://", "https://")):
-                                src = urljoin(url, src)
-                            # 使用标题作为标识符添加到URL列表中
-                            image_info = {
-                                "url": src,
-                                "title": title,
-                                "type": "sku"
-                            }
-                            # 避免重复
-                            if not any(isinstance(info, dict) and info["url"] == src for info in image_urls):
-                                image_urls.append(image_info)
-                    sku_count = len([item for item in image_urls if isinstance(item, dict) and item["type"] == "sku"])
-                    if sku_count > 0:
-                        print(f"  找到 {sku_count} 张SKU图片使用选择器: div.overflow-x-auto div.items-center img")
-                except Exception as e:
-                    print(f"  尝试获取SKU图片时出错: {e}")
-                    pass
-                
-                return {
-                    "image_urls": image_urls,
-                    "product_title": product_title,
-                    "product_description": product_description
-                }
-                
+            
+            # 首先尝试使用指定的选择器获取多个主图
+            product = ProductRecord(product_id, product_title, product_description)
+            
+            # 新增：查找 div.items-center 下的 img.object-cover (主要主图)
+            try:
+                img_elements = page.query_selector_all("div.items-center.overflow-x-scroll img.object-cover")
+                for img_element in img_elements:
+                    src = img_element.get_attribute("src")
+                    if src and src.startswith(("http", "https")):
+                        # 确保URL是完整的
+                        if not src.startswith(("http://", "https://")):
+                            src = urljoin(url, src)
+                        # 避免重复
+                        if not product.has_image(src):
+                            product.images.append(ImageRef(src, "main_image", "main"))
+                main_count = sum(1 for image in product.images if image.type == "main")
+                if main_count > 0:
+                    print(f"  找到 {main_count} 张主图使用选择器: div.items-center.overflow-x-scroll img.object-cover")
             except Exception as e:
-                retry_count += 1
-                if "Timeout" in str(e) and retry_count < max_retries:
-                    print(f"  超时，正在第 {retry_count}/{max_retries} 次重试...")
-                    # 等待一段时间后重试
-                    time.sleep(5)
-                    continue
-                else:
-                    print(f"获取产品 {product_id} 的图片时出错: {e}")
-                    return []
+                print(f"  尝试使用指定选择器时出错: {e}")
+                pass
+            
+            # 新增：查找 div.overflow-x-auto 下的 div.items-center 下的 img (SKU图片)
+            try:
+                sku_img_elements = page.query_selector_all("div.overflow-x-auto.flex-wrap div.items-center.border-solid.cursor-pointer img")
+                for img_element in sku_img_elements:
+                    src = img_element.get_attribute("src")
+                    title = img_element.get_attribute("title")
+                    if src and src.startswith(("http", "https")):
+                        # 将src中的200:200替换为800:800
+                        if "200:200" in src:
+                            src = src.replace("200:200", "800:800")
+                        # 确保URL是完整的
+                        if not src.startswith(("http://", "https://")):
+                            src = urljoin(url, src)
+                        # 使用标题作为标识符添加到图片列表中，避免重复
+                        if not product.has_image(src):
+                            product.images.append(ImageRef(src, title, "sku"))
+                sku_count = sum(1 for image in product.images if image.type == "sku")
+                if sku_count > 0:
+                    print(f"  找到 {sku_count} 张SKU图片使用选择器: div.overflow-x-auto div.items-center img")
+            except Exception as e:
+                print(f"  尝试获取SKU图片时出错: {e}")
+                pass
+            PLAYWRIGHT_PHASE.observe(time.perf_counter() - extract_start, job="product", phase="extraction")
+            
+            return product
+
+        try:
+            # 超时和网络错误按退避重试，产品页持续失败时熔断，剩余产品快速失败
+            return self._policy("tiktok_pdp").call(load)
+        except SecurityCheckPending:
+            raise
+        except Exception as e:
+            print(f"获取产品 {product_id} 的图片时出错: {e}")
+            return None
     
+    def _policy(self, target):
+        """
+        target 为 tiktok_pdp 或 cdn，同一任务的所有页面共用重试预算和熔断器
+        """
+        return RetryPolicy(target, attempts=3, backoff=RETRY_BACKOFF[target], budget=self.retry_budget,
+                           breaker=self.breakers[target])
+
+    def _fetch_image(self, image_url):
+        """
+        请求一张图片，重试用完后返回最后一次的响应
+        """
+        def get():
+            with IMAGE_DOWNLOAD_LATENCY.time():
+                return requests.get(image_url, timeout=60)
+        return self._policy("cdn").call(get, retry_result=lambda response: is_retryable_status(response.status_code))
+
     def download_image(self, image_url, product_id, folder):
         """
         下载图片到本地
@@ -794,50 +750,44 @@ class TikTokProductScraperPlaywright:
         :param product_id: 产品ID，用于命名文件
         :param folder: 保存文件夹路径
         """
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                response = requests.get(image_url, timeout=60)
-                if response.status_code == 200:
-                    # 从URL获取文件扩展名
-                    ext = '.jpg'  # 默认扩展名
-                    if '?' in image_url:
-                        clean_url = image_url.split('?')[0]
-                    else:
-                        clean_url = image_url
-                    if '.' in clean_url.split('/')[-1]:
-                        ext = '.' + clean_url.split('.')[-1]
-                        if ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                            ext = '.jpg'  # 默认使用jpg
-                    
-                    filename = f"{product_id}{ext}"
-                    filepath = os.path.join(folder, filename)
-                    
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                    
-                    print(f"    图片已下载: {filename}")
-                    return True
-                else:
-                    print(f"    下载图片失败，状态码: {response.status_code}")
-                    return False
-            except Exception as e:
-                retry_count += 1
-                if "timeout" in str(e).lower() and retry_count < max_retries:
-                    print(f"    下载超时，正在第 {retry_count}/{max_retries} 次重试...")
-                    # 等待一段时间后重试
-                    time.sleep(3)
-                    continue
+        try:
+            response = self._fetch_image(image_url)
+            if response.status_code == 200:
+                IMAGE_DOWNLOADS.inc(status="success")
+                IMAGE_DOWNLOAD_BYTES.inc(len(response.content))
+                IMAGE_DOWNLOAD_SIZE.observe(len(response.content))
+                # 从URL获取文件扩展名
+                ext = '.jpg'  # 默认扩展名
+                if '?' in image_url:
+                    clean_url = image_url.split('?')[0]
                 else:
-                    print(f"    下载图片时出错: {e}")
-                    return False
+                    clean_url = image_url
+                if '.' in clean_url.split('/')[-1]:
+                    ext = '.' + clean_url.split('.')[-1]
+                    if ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
+                        ext = '.jpg'  # 默认使用jpg
+                
+                filename = f"{product_id}{ext}"
+                filepath = os.path.join(folder, filename)
+                
+                with open(filepath, 'wb') as f:
+                    f.write(response.content)
+                
+                print(f"    图片已下载: {filename}")
+                return True
+            else:
+                IMAGE_DOWNLOADS.inc(status=str(response.status_code))
+                print(f"    下载图片失败，状态码: {response.status_code}")
+                return False
+        except Exception as e:
+            IMAGE_DOWNLOADS.inc(status="error")
+            print(f"    下载图片时出错: {e}")
+            return False
 
-    def download_images(self, image_urls, product_id, base_folder, product_title="", product_description=""):
+    def download_images(self, images, product_id, base_folder, product_title="", product_description=""):
         """
         下载多个图片到本地，每个产品一个文件夹
-        :param image_urls: 图片URL列表，包含字典格式(带标题和类型)
+        :param images: ImageRef 列表
         :param product_id: 产品ID，用于命名文件夹
         :param base_folder: 基础保存文件夹路径
         :param product_title: 产品标题，用于保存到文本文件
@@ -873,39 +823,26 @@ class TikTokProductScraperPlaywright:
             with open(image_csv_path, 'w', newline='', encoding='utf-8') as csv_file:
                 writer = csv.writer(csv_file)
                 writer.writerow(['Index', 'Image_URL', 'Title', 'Type'])  # 写入表头
-                for idx, image_data in enumerate(image_urls):
-                    if isinstance(image_data, dict):
-                        writer.writerow([idx+1, image_data['url'], image_data['title'], image_data.get('type', 'main')])
-                    else:
-                        writer.writerow([idx+1, image_data, 'image', 'main'])
+                for idx, image in enumerate(images):
+                    writer.writerow([idx+1, image.url, image.title, image.type])
             print(f"    图片URL已保存到CSV: {image_csv_path}")
         except Exception as e:
             print(f"    保存图片URL到CSV时出错: {e}")
         
-        for idx, image_data in enumerate(image_urls):
+        for idx, image in enumerate(images):
             try:
-                # 处理图片URL，现在都是字典格式
-                if isinstance(image_data, dict):
-                    # 根据类型处理图片
-                    image_url = image_data['url']
-                    title = image_data['title']
-                    img_type = image_data.get('type', 'main')
-                    
-                    # 清理标题作为文件名
-                    # 移除文件名中不允许的字符
-                    clean_title = re.sub(r'[<>:"/\\|?*]', '_', title)
-                    clean_title = clean_title[:50]  # 限制长度
-                    
-                    if img_type == 'sku':
-                        # SKU图片，使用标题作为文件名的一部分
-                        filename = f"sku_{clean_title}_{idx+1:02d}"
-                    else:
-                        # 普通主图
-                        filename = f"main_{idx+1:02d}"
+                image_url = image.url
+                # 清理标题作为文件名
+                # 移除文件名中不允许的字符
+                clean_title = re.sub(r'[<>:"/\\|?*]', '_', image.title or '')
+                clean_title = clean_title[:50]  # 限制长度
+                
+                if image.type == 'sku':
+                    # SKU图片，使用标题作为文件名的一部分
+                    filename = f"sku_{clean_title}_{idx+1:02d}"
                 else:
-                    # 处理旧格式（字符串）
-                    image_url = image_data
-                    filename = f"{product_id}_main_{idx+1:02d}"
+                    # 普通主图
+                    filename = f"main_{idx+1:02d}"
                 
                 # 获取文件扩展名
                 ext = '.jpg'  # 默认扩展名
@@ -921,48 +858,50 @@ class TikTokProductScraperPlaywright:
                 filename += ext
                 filepath = os.path.join(product_folder, filename)
                 
-                # 添加超时和重试机制
-                max_retries = 3
-                retry_count = 0
-                success = False
-                
-                while retry_count < max_retries and not success:
-                    try:
-                        response = requests.get(image_url, timeout=60)
-                        if response.status_code == 200:
-                            with open(filepath, 'wb') as f:
-                                f.write(response.content)
-                            
-                            print(f"    图片已下载: {filename}")
-                            success = True
-                        else:
-                            print(f"    下载图片失败，状态码: {response.status_code}")
-                            break
-                    except Exception as e:
-                        retry_count += 1
-                        if "timeout" in str(e).lower() and retry_count < max_retries:
-                            print(f"    下载超时，正在第 {retry_count}/{max_retries} 次重试...")
-                            # 等待一段时间后重试
-                            time.sleep(3)
-                            continue
-                        else:
-                            print(f"    下载图片时出错: {e}")
-                            break
+                # 超时、连接错误和 5xx 按 cdn 策略重试
+                try:
+                    response = self._fetch_image(image_url)
+                    if response.status_code == 200:
+                        IMAGE_DOWNLOADS.inc(status="success")
+                        IMAGE_DOWNLOAD_BYTES.inc(len(response.content))
+                        IMAGE_DOWNLOAD_SIZE.observe(len(response.content))
+                        with open(filepath, 'wb') as f:
+                            f.write(response.content)
+                        
+                        print(f"    图片已下载: {filename}")
+                    else:
+                        IMAGE_DOWNLOADS.inc(status=str(response.status_code))
+                        print(f"    下载图片失败，状态码: {response.status_code}")
+                except Exception as e:
+                    IMAGE_DOWNLOADS.inc(status="error")
+                    print(f"    下载图片时出错: {e}")
             except Exception as e:
                 print(f"    处理图片数据时出错: {e}")
                 continue
 
 
-def get_empty_product_source_imgs_records(config_path='config.json'):
+def _cell_text(value):
+    """
+    多行文本单元格可能以 [{"text": ..., "type": "text"}] 的形式返回，转换为字符串
     """
-    根据配置文件读取表格，返回product_source_imgs为None的product_id和record_id
+    if isinstance(value, list):
+        return ''.join(seg.get('text', '') if isinstance(seg, dict) else str(seg) for seg in value)
+    return value
+
+
+def get_empty_product_source_imgs_records(config_path='config.json', config=None, feishu_sheet=None):
+    """
+    根据配置文件读取表格，返回product_source_imgs为None的product_id、record_id和当前字段值
     :param config_path: 配置文件路径
-    :return: dict数组，每个字典包含product_id和record_id
+    :param config: 已加载的配置，可选，为空时读取config_path
+    :param feishu_sheet: 共享的FeishuSheet实例，可选
+    :return: dict数组，每个字典包含product_id、record_id和fields（product_desc、product_source_imgs 当前值）
     """
     # 1. 读取配置文件
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        if config is None:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
         
         # 2. 提取配置信息
         feishu_config = config.get('feishu', {})
@@ -983,29 +922,38 @@ def get_empty_product_source_imgs_records(config_path='config.json'):
     
     # 3. 初始化FeishuSheet实例
     try:
-        feishu_sheet = FeishuSheet(app_id, app_secret)
+        if feishu_sheet is None:
+            feishu_sheet = FeishuSheet(app_id, app_secret, dead_letters=DeadLetterQueue.from_config(config))
     except Exception as e:
         print(f"初始化FeishuSheet失败: {str(e)}")
         return []
     
     # 4. 使用过滤条件查询product_source_imgs为空的记录
     try:
-        # 使用指定的JSON格式过滤条件
-        filter_formula = {
-            "conjunction": "and",
-            "conditions": [{
-                "field_name": "product_source_imgs",
-                "operator": "isEmpty",
-                "value": []
-            }]
-        }
+        filter_formula = Field("product_source_imgs").is_empty()
+        field_names = ['product_id', 'product_desc', 'product_source_imgs']
+        product_config = config.get('product', {})
+        # 配置了 read_partitions 时按分区并发读取，否则顺序翻页读取
+        partitions = partitions_from_config(product_config.get('read_partitions'))
         
-        result = feishu_sheet.get_records_by_filter(
-            app_token=app_token,
-            table_id=table_id,
-            filter_formula=filter_formula,  # 过滤条件：product_source_imgs为空
-            get_all=True
-        )
+        if partitions:
+            result = feishu_sheet.get_records_partitioned(
+                app_token, table_id, partitions,
+                where=filter_formula,
+                field_names=field_names,
+                page_size=500,
+                max_workers=product_config.get('read_workers', 4)
+            )
+        else:
+            result = feishu_sheet.get_records_by_filter(
+                app_token=app_token,
+                table_id=table_id,
+                filter_formula=filter_formula,  # 过滤条件：product_source_imgs为空
+                get_all=True,
+                # 只取需要的列，返回体变小后每页取满 500 条
+                page_size=500,
+                field_names=field_names
+            )
         
         if not result:
             print("查询记录失败")
@@ -1041,7 +989,9 @@ def get_empty_product_source_imgs_records(config_path='config.json'):
         if product_id and record_id:
             empty_product_source_imgs_records.append({
                 'product_id': product_id,
-                'record_id': record_id
+                'record_id': record_id,
+                # 表格当前值，写入前用于判断字段是否变化
+                'fields': {name: _cell_text(fields.get(name)) for name in ('product_desc', 'product_source_imgs')}
             })
     
     print(f"找到 {len(empty_product_source_imgs_records)} 条product_source_imgs为None的记录")
@@ -1079,8 +1029,8 @@ def main():
         results = scraper.scrape_products(sample_input, download_images=True)
         
         # 打印汇总信息
-        successful = sum(1 for r in results if r['status'] == 'success')
-        total_images = sum(r['count'] for r in results)
+        successful = sum(1 for r in results if r.status == 'success')
+        total_images = sum(r.count for r in results)
         print(f"\n完成! 成功获取 {successful}/{len(results)} 个产品的图片，共下载 {total_images} 张图片")
         
     except KeyboardInterrupt:
@@ -1107,25 +1057,23 @@ def main_get_empty_product_source_imgs():
     
     return records
 
-def main_process_empty_product_source_imgs():
+@timed(JOB_DURATION, JOB_RUNS, job="product")
+def main_process_empty_product_source_imgs(progress=None, config=None, feishu_sheet=None, scraper=None):
     """
     获取product_source_imgs为空的记录并调用scrape_products方法处理
+    :param progress: JobProgress实例，可选，用于上报任务进度
+    :param config: 已加载的配置，可选，为空时读取config.json
+    :param feishu_sheet: 共享的FeishuSheet实例，可选
+    :param scraper: 共享的TikTokProductScraperPlaywright实例，可选，传入时任务结束后不关闭
+    配置错误、初始化失败或处理记录时出错会抛出异常，任务指标和 webhook 回调据此记为失败
     """
     print("=== 开始处理product_source_imgs为空的记录 ===")
     
-    # 1. 获取product_source_imgs为空的记录
-    empty_records = get_empty_product_source_imgs_records()
-    
-    if not empty_records:
-        print("没有找到需要处理的记录")
-        return
-    
-    print(f"找到 {len(empty_records)} 条需要处理的记录")
-    
-    # 2. 读取配置文件获取必要参数
+    # 1. 读取配置文件获取必要参数
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        if config is None:
+            with open('config.json', 'r', encoding='utf-8') as f:
+                config = json.load(f)
         
         feishu_config = config.get('feishu', {})
         bitable_config = config.get('bitable', {})
@@ -1137,27 +1085,51 @@ def main_process_empty_product_source_imgs():
         
         if not all([app_id, app_secret, app_token, table_id]):
             print("错误：配置文件缺少必要的参数")
-            return
+            raise ValueError("配置文件缺少必要的参数")
         
     except Exception as e:
         print(f"读取配置文件失败: {str(e)}")
-        return
+        raise RuntimeError(f"读取配置文件失败: {str(e)}") from e
     
-    # 3. 初始化FeishuSheet实例
+    # 2. 初始化FeishuSheet实例
     try:
-        feishu_sheet = FeishuSheet(app_id, app_secret)
+        if feishu_sheet is None:
+            feishu_sheet = FeishuSheet(app_id, app_secret, dead_letters=DeadLetterQueue.from_config(config))
+        # 每个任务使用新的飞书重试预算
+        feishu_sheet.reset_retry_budget()
         print("成功初始化FeishuSheet实例")
     except Exception as e:
         print(f"初始化FeishuSheet失败: {str(e)}")
+        raise RuntimeError(f"初始化FeishuSheet失败: {str(e)}") from e
+    
+    # 3. 获取product_source_imgs为空的记录
+    if progress:
+        progress.set_phase("查询待处理记录")
+    empty_records = get_empty_product_source_imgs_records(config=config, feishu_sheet=feishu_sheet)
+    
+    if not empty_records:
+        print("没有找到需要处理的记录")
         return
     
+    print(f"找到 {len(empty_records)} 条需要处理的记录")
+    
     # 4. 创建TikTokProductScraperPlaywright实例
+    owns_scraper = scraper is None
     try:
-        scraper = TikTokProductScraperPlaywright()
+        if owns_scraper:
+            scraper = TikTokProductScraperPlaywright()
+        if scraper.pacer is None:
+            scraper.pacer = PacingScheduler.from_config(config, "product")
+        if scraper.cache is None:
+            scraper.cache = ProductCache.from_config(config)
+        if scraper.concurrency is None and config.get('concurrency', {}).get('product', {}).get('enabled'):
+            scraper.concurrency = AdaptiveConcurrency.from_config(config, "product")
         print("成功初始化TikTokProductScraperPlaywright实例")
     except Exception as e:
         print(f"初始化TikTokProductScraperPlaywright失败: {str(e)}")
-        return
+        if owns_scraper and scraper is not None:
+            scraper.close()
+        raise RuntimeError(f"初始化TikTokProductScraperPlaywright失败: {str(e)}") from e
     
     # 5. 调用scrape_products方法处理记录
     print("\n=== 开始处理记录 ===")
@@ -1170,30 +1142,36 @@ def main_process_empty_product_source_imgs():
             app_token=app_token,
             table_id=table_id,
             download_images=False,
-            batch_size=10
+            batch_size=config.get('product', {}).get('write_batch_size', 10),
+            progress=progress,
+            fingerprints=FingerprintStore(config.get('product', {}).get('fingerprint_path', DEFAULT_FINGERPRINT_PATH)),
+            processes=config.get('product', {}).get('processes', 1),
+            tabs_per_process=config.get('product', {}).get('tabs_per_process')
         )
         
         # 6. 打印处理结果
         print("\n=== 处理结果 ===")
-        successful = sum(1 for r in results if r.get('status') == 'success')
-        failed = sum(1 for r in results if r.get('status') == 'error')
+        successful = sum(1 for r in results if r.status == 'success')
+        failed = sum(1 for r in results if r.status == 'error')
         
         print(f"处理完成! 成功: {successful}, 失败: {failed}, 总计: {len(results)}")
         
         if failed > 0:
             print("\n失败的记录:")
             for i, r in enumerate(results):
-                if r.get('status') == 'error':
-                    print(f"  {i+1}. product_id: {r.get('product_id')}, 错误: {r.get('error')}")
+                if r.status == 'error':
+                    print(f"  {i+1}. product_id: {r.product_id}, 错误: {r.error}")
         
     except Exception as e:
         print(f"处理记录时发生错误: {str(e)}")
+        raise
     finally:
-        # 关闭scraper实例
-        try:
-            scraper.close()
-        except:
-            pass
+        # 关闭scraper实例（共享实例由调用方负责关闭）
+        if owns_scraper:
+            try:
+                scraper.close()
+            except:
+                pass
 
 
 if __name__ == "__main__":
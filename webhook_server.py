@@ -1,64 +1,305 @@
 import asyncio
+import functools
 import json
+from contextlib import asynccontextmanager
+
 import httpx
 from fastapi import FastAPI, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse
-
-from tiktok_account_monitor import update_titkok_video
-from tiktok_pid_to_product import main_process_empty_product_source_imgs
-from feishu_sheet import FeishuSheet
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-app = FastAPI()
+from browser_service import BrowserService
+from tiktok_account_monitor import read_handle_urls, update_titkok_video
+from tiktok_pid_to_product import (
+    TikTokProductScraperPlaywright, get_empty_product_source_imgs_records, main_process_empty_product_source_imgs,
+)
+from dead_letter import DeadLetterQueue
+from feishu_sheet import FeishuSheet, create_session
+from job_progress import JobRegistry
+from pipeline import run_pipeline
+from shard_coordinator import ShardCoordinator, create_router
+import metrics
 
 with open("config.json") as f:
     _config = json.load(f)
 
 CALLBACK_URLS = _config.get("n8n_callback_urls", {})
 
+
+class AppResources:
+    """
+    应用生命周期内共享的资源：飞书客户端、HTTP 连接池、常驻浏览器
+    服务启动时创建一次，之后每次触发的任务直接复用
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.session = None
+        self.feishu_sheet = None
+        self.feishu_sheet_r = None
+        self.http_client = None
+        self.scraper = None
+        self.browser_service = None
+
+    async def start(self):
+        # 连接池大小需覆盖产品任务的并发线程数
+        self.session = create_session(pool_size=self.config.get("http_pool_size", 20))
+        feishu_cfg = self.config.get("feishu", {})
+        feishu_r_cfg = self.config.get("feishu_r", {})
+        self.feishu_sheet = FeishuSheet(feishu_cfg.get("app_id"), feishu_cfg.get("app_secret"), session=self.session,
+                                        dead_letters=DeadLetterQueue.from_config(self.config))
+        self.feishu_sheet_r = FeishuSheet(feishu_r_cfg.get("app_id"), feishu_r_cfg.get("app_secret"), session=self.session)
+        self.http_client = httpx.AsyncClient(timeout=10)
+        loop = asyncio.get_event_loop()
+        # 预先获取 token，第一次触发时无需等待鉴权
+        await loop.run_in_executor(None, self.feishu_sheet.ensure_token)
+        browser_cfg = self.config.get("browser_service", {})
+        if browser_cfg.get("enabled", True):
+            service = BrowserService(
+                port=browser_cfg.get("port", 9222),
+                headless=browser_cfg.get("headless", False),
+                health_interval=browser_cfg.get("health_interval", 10),
+            )
+            try:
+                await loop.run_in_executor(None, service.start)
+                self.browser_service = service
+            except Exception as e:
+                print(f"常驻浏览器启动失败，任务运行时将临时启动浏览器: {str(e)}")
+        self.scraper = TikTokProductScraperPlaywright(cdp_endpoint=self.cdp_endpoint())
+
+    def cdp_endpoint(self):
+        """
+        返回常驻浏览器的 CDP 地址，浏览器不可用时尝试重启，仍失败则返回 None
+        """
+        if self.browser_service is None:
+            return None
+        try:
+            self.browser_service.ensure_running()
+            return self.browser_service.endpoint
+        except Exception as e:
+            print(f"常驻浏览器不可用: {str(e)}")
+            return None
+
+    async def stop(self):
+        if self.browser_service is not None:
+            await asyncio.get_event_loop().run_in_executor(None, self.browser_service.stop)
+            self.browser_service = None
+        if self.scraper is not None:
+            self.scraper.close()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        if self.session is not None:
+            self.session.close()
+
+
+resources = AppResources(_config)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await resources.start()
+    try:
+        yield
+    finally:
+        await resources.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
 _monitor_lock = asyncio.Lock()
 _product_lock = asyncio.Lock()
 
+_jobs = JobRegistry()
+
+# SSE 推送间隔（秒）
+JOB_EVENT_INTERVAL = 1.0
+
 
-async def _run_and_callback(job: str, lock: asyncio.Lock, coro_or_func):
-    async with lock:
-        payload = {"job": job, "status": "success"}
+async def _acquire_or_409(*locks):
+    """
+    在返回 202 之前取得任务锁，由后台任务结束时释放；任一锁已被占用时返回 409，不占用任何锁。
+    锁空闲时 acquire 不会让出事件循环，检查和取得之间不会有其他请求插入
+    """
+    if any(lock.locked() for lock in locks):
+        raise HTTPException(status_code=409, detail="job already running")
+    for lock in locks:
+        await lock.acquire()
+
+
+async def _run_and_callback(job: str, locks, coro_or_func, progress):
+    """
+    运行任务并回调 n8n，locks 为路由中已经取得的任务锁，结束后释放
+    """
+    try:
+        payload = {"job": job, "job_id": progress.job_id, "status": "success"}
         try:
             if asyncio.iscoroutinefunction(coro_or_func):
-                await coro_or_func()
+                await coro_or_func(progress=progress)
             else:
                 loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, coro_or_func)
+                await loop.run_in_executor(None, functools.partial(coro_or_func, progress=progress))
+            progress.finish("success")
         except Exception as e:
-            payload = {"job": job, "status": "error", "error": str(e)}
+            payload = {"job": job, "job_id": progress.job_id, "status": "error", "error": str(e)}
+            progress.finish("error", str(e))
         url = CALLBACK_URLS.get(job, "")
         if url:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, json=payload, timeout=10)
+            await resources.http_client.post(url, json=payload, timeout=10)
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+async def _monitor_job(progress=None):
+    cdp_endpoint = await asyncio.get_event_loop().run_in_executor(None, resources.cdp_endpoint)
+    await update_titkok_video(
+        progress=progress,
+        config=resources.config,
+        feishu_sheet=resources.feishu_sheet,
+        feishu_sheet_r=resources.feishu_sheet_r,
+        cdp_endpoint=cdp_endpoint,
+    )
+
+
+def _product_job(progress=None):
+    resources.scraper.cdp_endpoint = resources.cdp_endpoint()
+    main_process_empty_product_source_imgs(
+        progress=progress,
+        config=resources.config,
+        feishu_sheet=resources.feishu_sheet,
+        scraper=resources.scraper,
+    )
+
+
+def _pipeline_job(product_progress):
+    """
+    监控任务发现的新产品直接交给产品抓取，运行期间占用监控和产品两个任务锁（由路由取得），不能单独触发两个任务
+    """
+    async def job(progress=None):
+        cdp_endpoint = await asyncio.get_event_loop().run_in_executor(None, resources.cdp_endpoint)
+        resources.scraper.cdp_endpoint = cdp_endpoint
+        try:
+            await run_pipeline(
+                progress=progress,
+                product_progress=product_progress,
+                config=resources.config,
+                feishu_sheet=resources.feishu_sheet,
+                feishu_sheet_r=resources.feishu_sheet_r,
+                scraper=resources.scraper,
+                cdp_endpoint=cdp_endpoint,
+            )
+            product_progress.finish("success")
+        except Exception as e:
+            product_progress.finish("error", str(e))
+            raise
+    return job
+
+
+def _monitor_items():
+    bitable_r_cfg = resources.config.get("bitable_r", {})
+    return read_handle_urls(resources.feishu_sheet_r, bitable_r_cfg.get("app_token"), bitable_r_cfg.get("table_id"),
+                            resources.config)
+
+
+def _product_items():
+    return get_empty_product_source_imgs_records(config=resources.config, feishu_sheet=resources.feishu_sheet)
+
+
+def _shards_done(status):
+    """
+    分片任务结束：账号任务由各工作端写入，全部完成后统一删除重复记录
+    """
+    print(f"[分片] {status['kind']} 任务 {status['job_id']} 结束: {status['shards']}")
+    if status["kind"] == "monitor":
+        bitable_cfg = resources.config.get("bitable", {})
+        try:
+            deleted = resources.feishu_sheet.delete_duplicate_records(bitable_cfg.get("app_token"), bitable_cfg.get("table_id"))
+            print(f"删除重复记录完成，共删除 {deleted} 条")
+        except Exception as e:
+            print(f"删除重复记录失败: {str(e)}")
+
+
+# 多机分片：POST /shards/jobs/{monitor|product} 创建任务，工作端运行 shard_worker.py 领取分片
+_shards = ShardCoordinator.from_config(_config, on_done=_shards_done)
+app.include_router(create_router(_shards, {"monitor": _monitor_items, "product": _product_items}))
 
 
 @app.post("/run/monitor", status_code=202)
 async def run_monitor(background_tasks: BackgroundTasks):
-    if _monitor_lock.locked():
-        raise HTTPException(status_code=409, detail="monitor already running")
-    background_tasks.add_task(_run_and_callback, "monitor", _monitor_lock, update_titkok_video)
-    return {"status": "started", "job": "monitor"}
+    await _acquire_or_409(_monitor_lock)
+    progress = _jobs.create("monitor")
+    background_tasks.add_task(_run_and_callback, "monitor", [_monitor_lock], _monitor_job, progress)
+    return {"status": "started", "job": "monitor", "job_id": progress.job_id}
 
 
 @app.post("/run/product", status_code=202)
 async def run_product(background_tasks: BackgroundTasks):
-    if _product_lock.locked():
-        raise HTTPException(status_code=409, detail="product already running")
-    background_tasks.add_task(_run_and_callback, "product", _product_lock, main_process_empty_product_source_imgs)
-    return {"status": "started", "job": "product"}
+    await _acquire_or_409(_product_lock)
+    progress = _jobs.create("product")
+    background_tasks.add_task(_run_and_callback, "product", [_product_lock], _product_job, progress)
+    return {"status": "started", "job": "product", "job_id": progress.job_id}
+
+
+@app.post("/run/pipeline", status_code=202)
+async def run_pipeline_job(background_tasks: BackgroundTasks):
+    await _acquire_or_409(_monitor_lock, _product_lock)
+    progress = _jobs.create("monitor")
+    product_progress = _jobs.create("product")
+    background_tasks.add_task(_run_and_callback, "pipeline", [_monitor_lock, _product_lock], _pipeline_job(product_progress), progress)
+    return {"status": "started", "job": "pipeline", "job_id": progress.job_id, "product_job_id": product_progress.job_id}
+
+
+@app.get("/browser/health")
+def browser_health():
+    if resources.browser_service is None:
+        return {"enabled": False}
+    status = resources.browser_service.status()
+    status["enabled"] = True
+    status["healthy"] = resources.browser_service.is_healthy()
+    return status
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": [p.snapshot() for p in _jobs.list()]}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    progress = _jobs.get(job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="job not found")
+    return progress.snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    progress = _jobs.get(job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="job not found")
+
+    async def event_stream():
+        # 每隔 JOB_EVENT_INTERVAL 秒推送一次快照，任务结束后推送最终状态并关闭
+        while True:
+            snapshot = progress.snapshot()
+            event = "done" if progress.done else "progress"
+            yield f"event: {event}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if progress.done:
+                break
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
 
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 
 @app.get("/run/delete-duplicates")
 def run_delete_duplicates(duplicate_field: str = "重复", duplicate_value: str = "重复"):
-    feishu_cfg = _config["feishu"]
     bitable_cfg = _config["bitable"]
-    sheet = FeishuSheet(feishu_cfg["app_id"], feishu_cfg["app_secret"])
-    deleted = sheet.delete_duplicate_records(
+    deleted = resources.feishu_sheet.delete_duplicate_records(
         bitable_cfg["app_token"],
         bitable_cfg["table_id"],
         duplicate_field,
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入缓冲：监控任务解析出的视频先放入有界队列，由后台任务攒批调用批量创建接口写入飞书表格，
+抓取和写入可以同时进行，不再每解析一条就同步等待一次写入
+"""
+
+import asyncio
+import functools
+import time
+
+# 关闭时放入队列的结束标记，后台任务收到后立即写出已收集的记录并退出
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    def __init__(self, feishu_sheet, app_token, table_id, batch_size=100, flush_interval=1.0, max_queue=1000, progress=None,
+                 on_created=None):
+        """
+        :param batch_size: 攒够多少条写入一次（接口上限 1000）
+        :param flush_interval: 第一条进入队列后最多等待多少秒就写入，不足 batch_size 也写
+        :param max_queue: 队列容量，写满后 put 会等待，避免写入跟不上时内存无限增长
+        :param progress: JobProgress 实例，可选，写入完成后上报 writes/failures
+        :param on_created: 每批创建成功后调用 on_created(字段列表, record_id 列表)，两个列表一一对应，可选
+        """
+        self.feishu_sheet = feishu_sheet
+        self.app_token = app_token
+        self.table_id = table_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.progress = progress
+        self.on_created = on_created
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+        self._task = None
+
+    @classmethod
+    def from_config(cls, config, feishu_sheet, app_token, table_id, progress=None, on_created=None):
+        """
+        从 config.json 的 monitor 部分读取 write_batch_size、write_flush_interval、write_queue_size
+        """
+        monitor = (config or {}).get("monitor", {})
+        return cls(feishu_sheet, app_token, table_id,
+                   batch_size=monitor.get("write_batch_size", 100),
+                   flush_interval=monitor.get("write_flush_interval", 1.0),
+                   max_queue=monitor.get("write_queue_size", 1000),
+                   progress=progress,
+                   on_created=on_created)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def put(self, fields):
+        """
+        放入一条待写入记录，队列已满时等待后台写入腾出空间
+        """
+        if self.queue.full():
+            start = time.perf_counter()
+            await self.queue.put(fields)
+            self.blocked_seconds += time.perf_counter() - start
+        else:
+            self.queue.put_nowait(fields)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def _next_batch(self):
+        """
+        等待第一条记录，然后在 flush_interval 内继续收集，最多 batch_size 条
+        :return: (记录列表, 是否收到结束标记)
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if deadline is None:
+                item = await self.queue.get()
+                deadline = time.monotonic() + self.flush_interval
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, stop = await self._next_batch()
+            if batch:
+                await self._write(loop, batch)
+            if stop:
+                return
+
+    async def _write(self, loop, batch):
+        try:
+            # 写入是同步 HTTP 请求，放到线程池执行，不阻塞事件循环处理响应
+            created = await loop.run_in_executor(None, functools.partial(
+                self.feishu_sheet.batch_create_records, self.app_token, self.table_id, batch, len(batch)))
+        except Exception as e:
+            print(f"批量写入飞书表格异常: {str(e)}")
+            created = []
+        self.batches += 1
+        ok = len(created)
+        self.written += ok
+        self.failed += len(batch) - ok
+        if ok < len(batch):
+            print(f"批量写入飞书表格失败 {len(batch) - ok} 条")
+        if self.progress:
+            self.progress.incr("writes", ok)
+            self.progress.incr("failures", len(batch) - ok)
+        # 同一批内要么全部成功要么全部失败，成功时 record_id 与字段按顺序对应
+        if self.on_created and created and ok == len(batch):
+            try:
+                self.on_created(batch, created)
+            except Exception as e:
+                print(f"处理新建记录回调异常: {str(e)}")
+
+    async def close(self):
+        """
+        不再等待 flush_interval，立即写完队列中剩余的记录后停止后台任务，任务结束或服务关闭时调用
+        """
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def stats(self):
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "max_depth": self.max_depth,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+        }